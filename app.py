@@ -1,34 +1,1266 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Blueprint, current_app, g, request, jsonify, send_from_directory, stream_with_context
+import click
 import sqlite3
 import time
 import json
 import os
+import shutil
 import requests
 import hashlib
-from datetime import datetime, timedelta
-from collections import defaultdict
+import csv
+import zlib
+from datetime import datetime, timedelta, timezone
+from dataclasses import dataclass
+from collections import defaultdict, OrderedDict
 import uuid
-from PIL import Image
+from PIL import Image, ImageOps
 import io
 from urllib.parse import urlparse
-from werkzeug.utils import secure_filename
+from email.utils import parsedate_to_datetime
+from werkzeug.utils import secure_filename, safe_join
+from werkzeug.exceptions import NotFound
 import mimetypes
+from concurrent.futures import ThreadPoolExecutor
+import re
+import bisect
+import base64
+import queue
+import threading
+import resource
+import cProfile
+import pstats
+import hmac
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 
-app = Flask(__name__)
+# Routes et commandes CLI, enregistrées sur l'application par create_app()
+api = Blueprint('api', __name__, cli_group=None)
 
 # Configuration de base
 MEDIA_FOLDER = 'media'
 if not os.path.exists(MEDIA_FOLDER):
     os.makedirs(MEDIA_FOLDER)
 
+# Pagination par clé (keyset)
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Lignes supprimées par transaction lors de la suppression d'un utilisateur
+USER_DELETE_CHUNK_SIZE = int(os.environ.get('USER_DELETE_CHUNK_SIZE', 1000))
+
+def encode_cursor(values):
+    """Encoder la clé du dernier élément d'une page en curseur opaque"""
+    payload = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Décoder un curseur opaque (ValueError si invalide)"""
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(cursor + padding))
+    except Exception:
+        raise ValueError('Curseur invalide')
+    if not isinstance(values, list):
+        raise ValueError('Curseur invalide')
+    return values
+
+# Horodatages : millisecondes depuis l'epoch Unix (UTC). La chaîne ISO d'origine
+# n'est conservée que pour l'affichage.
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MS_PER_DAY = 86400000
+
+def to_epoch_ms(value):
+    """Date ISO 8601 -> millisecondes epoch (UTC si aucun fuseau n'est précisé) ; ValueError si invalide"""
+    try:
+        moment = datetime.fromisoformat(value)
+    except TypeError:
+        raise ValueError(f'Date invalide: {value!r}')
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return (moment - EPOCH) // timedelta(milliseconds=1)
+
+def epoch_ms_now():
+    return time.time_ns() // 1000000
+
+# Métriques (format texte Prometheus). Chaque processus tient son registre en
+# mémoire ; sous gunicorn, chaque worker en écrit un instantané dans
+# METRICS_DIR et /metrics additionne ceux de tous les workers.
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+DOWNLOAD_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class Metric:
+    """Compteur, jauge ou histogramme, une valeur par combinaison d'étiquettes"""
+    
+    def __init__(self, kind, name, help_text, labels=(), buckets=None):
+        self.kind = kind
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets) if buckets else None
+        self._lock = threading.Lock()
+        self._values = {}
+    
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+    
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+    
+    def set(self, value, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+    
+    def observe(self, value, *label_values):
+        # Compteurs par tranche (non cumulés), puis somme en avant-dernière position
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(label_values)
+            if counts is None:
+                counts = self._values[label_values] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+    
+    def samples(self):
+        with self._lock:
+            return [[list(key), list(value) if isinstance(value, list) else value]
+                    for key, value in self._values.items()]
+    
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+class MetricsRegistry:
+    """Registre des métriques du processus
+    
+    Les instantanés (metrics_<pid>.json) sont écrits par un thread toutes les
+    METRICS_FLUSH_INTERVAL secondes et à chaque lecture de /metrics : les
+    chiffres d'un autre worker ont au plus cet âge. Les compteurs et
+    histogrammes d'un worker arrêté sont versés dans metrics_archive.json
+    pour rester monotones ; ses jauges disparaissent.
+    """
+    
+    def __init__(self, directory=None, flush_interval=5.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._metrics = {}
+        self._collectors = []
+        self._file_lock = threading.Lock()
+        self._flusher = None
+        self._flusher_pid = None
+    
+    def _register(self, kind, name, help_text, labels=(), buckets=None):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = Metric(kind, name, help_text, labels, buckets)
+        return metric
+    
+    def counter(self, name, help_text, labels=()):
+        return self._register('counter', name, help_text, labels)
+    
+    def gauge(self, name, help_text, labels=()):
+        return self._register('gauge', name, help_text, labels)
+    
+    def histogram(self, name, help_text, labels=(), buckets=HTTP_BUCKETS):
+        return self._register('histogram', name, help_text, labels, buckets)
+    
+    def add_collector(self, collect):
+        """collect() met à jour des jauges juste avant chaque instantané"""
+        if collect not in self._collectors:
+            self._collectors.append(collect)
+    
+    def reset(self):
+        """Repartir de zéro (worker fraîchement forké : les chiffres du maître ne sont pas les siens)"""
+        for metric in self._metrics.values():
+            metric.clear()
+    
+    def snapshot(self):
+        for collect in self._collectors:
+            try:
+                collect()
+            except Exception as e:
+                print(f"Erreur lors de la collecte des métriques: {e}")
+        return {
+            name: {
+                'kind': metric.kind,
+                'help': metric.help,
+                'labels': metric.labels,
+                'buckets': metric.buckets,
+                'samples': metric.samples()
+            }
+            for name, metric in self._metrics.items()
+        }
+    
+    def _path(self, pid):
+        return os.path.join(self.directory, f'metrics_{pid}.json')
+    
+    @staticmethod
+    def _write(path, snapshot):
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+    
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+    
+    def flush(self):
+        """Écrire l'instantané du processus dans METRICS_DIR"""
+        if self.directory:
+            with self._file_lock:
+                self._write(self._path(os.getpid()), self.snapshot())
+    
+    def start_flusher(self):
+        """Démarrer l'écriture périodique (une fois par processus)"""
+        if not self.directory or self._flusher_pid == os.getpid():
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._flusher_pid = os.getpid()
+        self._flusher = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+        self._flusher.start()
+    
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Erreur lors de l'écriture des métriques: {e}")
+    
+    @staticmethod
+    def merge(target, snapshot, include_gauges=True):
+        """Additionner un instantané dans target (mêmes étiquettes : valeurs sommées)"""
+        for name, family in snapshot.items():
+            if family['kind'] == 'gauge' and not include_gauges:
+                continue
+            merged = target.setdefault(name, dict(family, samples={}))
+            for labels, value in family['samples']:
+                key = tuple(labels)
+                current = merged['samples'].get(key)
+                if current is None:
+                    merged['samples'][key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    merged['samples'][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    merged['samples'][key] = current + value
+        return target
+    
+    def collect(self):
+        """Familles de métriques de tous les processus, additionnées"""
+        if not self.directory:
+            return self.merge({}, self.snapshot())
+        
+        self.flush()
+        families = {}
+        for filename in sorted(os.listdir(self.directory)):
+            if filename.startswith('metrics_') and filename.endswith('.json'):
+                self.merge(families, self._read(os.path.join(self.directory, filename)))
+        return families
+    
+    def mark_process_dead(self, pid):
+        """Verser les compteurs d'un worker arrêté dans l'archive (hook child_exit)"""
+        if not self.directory:
+            return
+        path = self._path(pid)
+        if not os.path.exists(path):
+            return
+        archive_path = os.path.join(self.directory, 'metrics_archive.json')
+        with self._file_lock:
+            archive = self.merge({}, self._read(archive_path))
+            self.merge(archive, self._read(path), include_gauges=False)
+            self._write(archive_path, {
+                name: dict(family, samples=[[list(key), value] for key, value in family['samples'].items()])
+                for name, family in archive.items()
+            })
+            os.remove(path)
+    
+    def render(self):
+        """Exposition au format texte Prometheus 0.0.4"""
+        lines = []
+        for name, family in sorted(self.collect().items()):
+            lines.append(f"# HELP {name} {family['help']}")
+            lines.append(f"# TYPE {name} {family['kind']}")
+            for key, value in sorted(family['samples'].items()):
+                labels = list(zip(family['labels'], key))
+                if family['kind'] != 'histogram':
+                    lines.append(f"{name}{format_labels(labels)} {format_metric_value(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(list(family['buckets']) + ['+Inf'], value[:-2]):
+                    cumulative += count
+                    le = bound if bound == '+Inf' else format_metric_value(bound)
+                    lines.append(f"{name}_bucket{format_labels(labels + [('le', le)])} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(labels)} {format_metric_value(value[-2])}")
+                lines.append(f"{name}_count{format_labels(labels)} {value[-1]}")
+        return '\n'.join(lines) + '\n'
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        f'{key}="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+def format_metric_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+metrics = MetricsRegistry(METRICS_DIR, METRICS_FLUSH_INTERVAL)
+
+http_requests = metrics.counter('http_requests_total', 'Requêtes HTTP traitées', ('endpoint', 'method', 'status'))
+http_duration = metrics.histogram(
+    'http_request_duration_seconds', 'Durée des requêtes HTTP', ('endpoint', 'method'), HTTP_BUCKETS
+)
+http_in_flight = metrics.gauge('http_requests_in_flight', 'Requêtes HTTP en cours')
+sql_duration = metrics.histogram(
+    'sqlite_query_duration_seconds', "Durée des requêtes SQLite (jusqu'à la première ligne)",
+    ('operation', 'table'), SQL_BUCKETS
+)
+image_download_duration = metrics.histogram(
+    'image_download_duration_seconds', 'Durée des téléchargements d\'images', ('source', 'outcome'),
+    DOWNLOAD_BUCKETS
+)
+
+# Étiquettes (opération, table) d'une requête SQL, mises en cache par texte SQL
+SQL_TABLE_RE = re.compile(r'\b(?:FROM|INTO|UPDATE|TABLE|JOIN)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?"?(\w+)', re.IGNORECASE)
+SQL_LABELS_CACHE_SIZE = 2048
+_sql_labels = {}
+
+def sql_labels(sql):
+    labels = _sql_labels.get(sql)
+    if labels is None:
+        words = sql.split(None, 1)
+        operation = words[0].upper() if words else ''
+        if operation == 'WITH':
+            operation = 'SELECT'
+        match = SQL_TABLE_RE.search(sql)
+        labels = (operation, match.group(1) if match else '')
+        if len(_sql_labels) < SQL_LABELS_CACHE_SIZE:
+            _sql_labels[sql] = labels
+    return labels
+
+class TimedCursor(sqlite3.Cursor):
+    """Curseur qui mesure chaque requête dans sqlite_query_duration_seconds"""
+    
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            sql_duration.observe(time.perf_counter() - started, *sql_labels(sql))
+    
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            sql_duration.observe(time.perf_counter() - started, *sql_labels(sql))
+
+class TracingCursor(TimedCursor):
+    """Curseur d'une requête profilée : chaque instruction est notée avec sa
+    durée (exécution et lecture des lignes) et le nombre de lignes lues ou modifiées
+    """
+    
+    def _trace(self, sql, started):
+        self._trace_entry = {'sql': ' '.join(sql.split()), 'duration_ms': 0.0, 'rows': max(self.rowcount, 0)}
+        self._add_time(started)
+        _sql_trace.statements.append(self._trace_entry)
+    
+    def _add_time(self, started, rows=0):
+        entry = getattr(self, '_trace_entry', None)
+        if entry is not None:
+            entry['duration_ms'] += (time.perf_counter() - started) * 1000
+            entry['rows'] += rows
+    
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        super().execute(sql, parameters)
+        self._trace(sql, started)
+        return self
+    
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        self._trace(sql, started)
+        return self
+    
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._add_time(started, row is not None)
+        return row
+    
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._add_time(started, len(rows))
+        return rows
+    
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._add_time(started, len(rows))
+        return rows
+    
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._add_time(started)
+            raise
+        self._add_time(started, 1)
+        return row
+
+# Trace SQL du thread courant (requête profilée) ; le compteur global évite
+# toute lecture du thread-local tant qu'aucune requête n'est profilée
+_sql_trace = threading.local()
+_sql_traces_active = 0
+_sql_traces_lock = threading.Lock()
+
+def start_sql_trace():
+    global _sql_traces_active
+    _sql_trace.statements = []
+    with _sql_traces_lock:
+        _sql_traces_active += 1
+
+def stop_sql_trace():
+    """Arrêter la trace du thread et retourner ses instructions"""
+    global _sql_traces_active
+    statements = getattr(_sql_trace, 'statements', None)
+    if statements is None:
+        return []
+    _sql_trace.statements = None
+    with _sql_traces_lock:
+        _sql_traces_active -= 1
+    return statements
+
+class TimedConnection(sqlite3.Connection):
+    """Connexion dont les curseurs, y compris ceux de execute(), sont des TimedCursor"""
+    
+    def cursor(self, factory=TimedCursor):
+        if _sql_traces_active and factory is TimedCursor and getattr(_sql_trace, 'statements', None) is not None:
+            factory = TracingCursor
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+    
+    # Portées imbriquées ouvertes par PooledConnection : un point de sauvegarde
+    # (ou None si aucune transaction n'était ouverte) par niveau
+    nested = ()
+    
+    def commit(self):
+        """Sans effet dans une portée imbriquée : seule la portée externe valide"""
+        if self.nested:
+            return
+        super().commit()
+    
+    def rollback(self):
+        """Dans une portée imbriquée, n'annuler que le travail de cette portée"""
+        if self.nested and self.nested[-1]:
+            self.cursor().execute(f"ROLLBACK TO {self.nested[-1]}")
+            return
+        super().rollback()
+
+class PoolTimeoutError(Exception):
+    """Aucune connexion disponible dans le délai imparti"""
+    pass
+
+class ConnectionPool:
+    """Pool borné de connexions SQLite partagé entre les threads
+    
+    Chaque connexion est configurée une seule fois à sa création. Un thread
+    qui détient déjà une connexion la réutilise pour les appels imbriqués au
+    lieu d'en emprunter une seconde.
+    """
+    
+    PRAGMAS = (
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA busy_timeout=5000",
+        "PRAGMA foreign_keys=ON",
+        "PRAGMA mmap_size=268435456",
+        "PRAGMA cache_size=-16000",
+    )
+    
+    def __init__(self, db_name, max_size=8, timeout=10.0):
+        self.db_name = db_name
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._created = 0
+        self._in_use = 0
+        self._checkouts = 0
+        self._reuses = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+    
+    def _create_connection(self):
+        conn = sqlite3.connect(self.db_name, timeout=self.timeout, check_same_thread=False,
+                               factory=TimedConnection)
+        for pragma in self.PRAGMAS:
+            conn.execute(pragma)
+        return conn
+    
+    def acquire(self):
+        """Emprunter une connexion (en attendant si le pool est plein)"""
+        conn = None
+        create = False
+        with self._lock:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                if self._created < self.max_size:
+                    self._created += 1
+                    create = True
+        
+        if create:
+            try:
+                conn = self._create_connection()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        elif conn is None:
+            started = time.perf_counter()
+            try:
+                conn = self._idle.get(timeout=self.timeout)
+            except queue.Empty:
+                with self._lock:
+                    self._timeouts += 1
+                raise PoolTimeoutError(
+                    f"Aucune connexion disponible après {self.timeout}s "
+                    f"(pool de {self.max_size} connexions)"
+                )
+            waited = time.perf_counter() - started
+            with self._lock:
+                self._waits += 1
+                self._total_wait += waited
+                self._max_wait = max(self._max_wait, waited)
+        
+        with self._lock:
+            self._checkouts += 1
+            self._in_use += 1
+        return conn
+    
+    def release(self, conn):
+        """Rendre une connexion au pool"""
+        with self._lock:
+            self._in_use -= 1
+        self._idle.put(conn)
+    
+    def connection(self):
+        return PooledConnection(self)
+    
+    def close_all(self):
+        """Fermer les connexions inactives (ex: après un fork)"""
+        with self._lock:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+                self._created -= 1
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'max_size': self.max_size,
+                'size': self._created,
+                'idle': self._created - self._in_use,
+                'in_use': self._in_use,
+                'checkouts': self._checkouts,
+                'thread_reuses': self._reuses,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'total_wait_ms': round(self._total_wait * 1000, 3),
+                'max_wait_ms': round(self._max_wait * 1000, 3)
+            }
+
+class PooledConnection:
+    """Gestionnaire de contexte qui emprunte une connexion du pool
+    
+    Valide la transaction en sortie (annule en cas d'exception) puis rend la
+    connexion. Les utilisations imbriquées dans un même thread partagent la
+    connexion du niveau le plus externe : elles s'exécutent dans un SAVEPOINT
+    si une transaction est déjà ouverte, et leurs commit() sont sans effet,
+    pour ne jamais valider une transaction externe inachevée.
+    """
+    
+    def __init__(self, pool):
+        self.pool = pool
+    
+    def __enter__(self):
+        local = self.pool._local
+        conn = getattr(local, 'conn', None)
+        if conn is not None:
+            savepoint = None
+            if conn.in_transaction:
+                savepoint = f'pool_nested_{local.depth}'
+                conn.execute(f"SAVEPOINT {savepoint}")
+            conn.nested = conn.nested + (savepoint,)
+            local.depth += 1
+            with self.pool._lock:
+                self.pool._reuses += 1
+            return conn
+        
+        local.conn = self.pool.acquire()
+        local.depth = 1
+        return local.conn
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        local = self.pool._local
+        local.depth -= 1
+        if local.depth > 0:
+            conn = local.conn
+            savepoint = conn.nested[-1]
+            conn.nested = conn.nested[:-1]
+            if savepoint is not None and conn.in_transaction:
+                if exc_type is not None:
+                    conn.execute(f"ROLLBACK TO {savepoint}")
+                conn.execute(f"RELEASE {savepoint}")
+            elif exc_type is not None:
+                # Transaction ouverte dans cette portée : elle ne contient que son travail
+                conn.rollback()
+            return False
+        
+        conn = local.conn
+        local.conn = None
+        try:
+            if exc_type is None:
+                conn.commit()
+            else:
+                conn.rollback()
+        finally:
+            self.pool.release(conn)
+        return False
+
+def migrate_legacy_food_images(cursor):
+    """Convertir l'ancien schéma de food_images (image_url, image_path...)"""
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(food_images)")]
+    if 'file_path' in columns:
+        return
+
+    cursor.execute("ALTER TABLE food_images RENAME TO food_images_legacy")
+    cursor.execute('''
+        CREATE TABLE food_images (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            food_id INTEGER NOT NULL,
+            file_path TEXT NOT NULL,
+            original_url TEXT,
+            is_primary BOOLEAN DEFAULT 0,
+            file_size INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (food_id) REFERENCES foods (id) ON DELETE CASCADE
+        )
+    ''')
+    cursor.execute('''
+        INSERT INTO food_images (id, food_id, file_path, original_url, is_primary, file_size, created_at)
+        SELECT id, food_id, image_path, image_url, COALESCE(is_primary, 0),
+               COALESCE(file_size, 0), COALESCE(downloaded_at, CURRENT_TIMESTAMP)
+        FROM food_images_legacy
+        WHERE food_id IS NOT NULL AND image_path IS NOT NULL
+    ''')
+    cursor.execute("DROP TABLE food_images_legacy")
+
+def create_food_search_index(cursor):
+    """Index plein texte FTS5 du catalogue, synchronisé par triggers"""
+    try:
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS foods_fts USING fts5(
+                name, category, ingredients,
+                content='foods', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        # SQLite compilé sans FTS5 : la recherche reste sur LIKE
+        print(f"FTS5 indisponible, recherche par LIKE: {e}")
+        return
+    
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_foods_fts_insert AFTER INSERT ON foods BEGIN
+            INSERT INTO foods_fts (rowid, name, category, ingredients)
+            VALUES (new.id, new.name, new.category, new.ingredients);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_foods_fts_delete AFTER DELETE ON foods BEGIN
+            INSERT INTO foods_fts (foods_fts, rowid, name, category, ingredients)
+            VALUES ('delete', old.id, old.name, old.category, old.ingredients);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_foods_fts_update AFTER UPDATE ON foods BEGIN
+            INSERT INTO foods_fts (foods_fts, rowid, name, category, ingredients)
+            VALUES ('delete', old.id, old.name, old.category, old.ingredients);
+            INSERT INTO foods_fts (rowid, name, category, ingredients)
+            VALUES (new.id, new.name, new.category, new.ingredients);
+        END
+    ''')
+    cursor.execute("INSERT INTO foods_fts (foods_fts) VALUES ('rebuild')")
+
+def add_column(table, column, definition):
+    """Étape de migration : ajouter une colonne si elle n'existe pas encore"""
+    def step(cursor):
+        columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")]
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return step
+
+def superseded_by(version, step):
+    """Étape de migration sautée quand la migration version s'applique dans la même
+    passe (base neuve ou ancienne) : celle-ci supprime ou remplace ce qu'elle crée
+    """
+    def run(cursor):
+        if callable(step):
+            return step(cursor)
+        cursor.execute(step)
+    run.superseded_by = version
+    return run
+
+def cascade_on_delete(table, *parents):
+    """Étape de migration : reconstruire une table pour que ses clés étrangères
+    vers parents deviennent ON DELETE CASCADE
+    
+    SQLite ne sait pas modifier une contrainte existante : la table est recréée
+    à partir de son schéma actuel, recopiée, puis ses index et triggers sont
+    recréés. Les lignes dont le parent n'existe plus (que la cascade aurait
+    supprimées) ne sont pas recopiées ; leur nombre est affiché. Doit
+    s'exécuter avec foreign_keys=OFF.
+    """
+    def step(cursor):
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+        create_sql = cursor.fetchone()[0]
+        new_sql = create_sql
+        for parent in parents:
+            new_sql = re.sub(rf"REFERENCES {parent} \(id\)(?! ON DELETE)",
+                             f"REFERENCES {parent} (id) ON DELETE CASCADE", new_sql)
+        if new_sql == create_sql:
+            return
+        
+        cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+            (table,)
+        )
+        dependents = [row[0] for row in cursor.fetchall()]
+        columns = ', '.join(row[1] for row in cursor.execute(f"PRAGMA table_info({table})"))
+        orphans = [
+            f"{column} IS NULL OR {column} IN (SELECT id FROM {parent})"
+            for _, _, parent, column, *_ in cursor.execute(f"PRAGMA foreign_key_list({table})").fetchall()
+            if parent in parents
+        ]
+        kept = ' AND '.join(f'({condition})' for condition in orphans) or '1 = 1'
+        cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE NOT ({kept})")
+        dropped = cursor.fetchone()[0]
+        if dropped:
+            print(f"{table} : {dropped} ligne(s) sans {' ni '.join(parents)} existant, non recopiée(s)")
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,))
+        sequence = cursor.fetchone()
+        
+        rebuilt = f"{table}_rebuild"
+        cursor.execute(re.sub(rf"^CREATE TABLE \"?{table}\"?", f"CREATE TABLE {rebuilt}", new_sql))
+        cursor.execute(f"INSERT INTO {rebuilt} ({columns}) SELECT {columns} FROM {table} WHERE {kept}")
+        cursor.execute(f"DROP TABLE {table}")
+        # Renommage sans réécrire les triggers des autres tables qui citent déjà {table}
+        cursor.execute("PRAGMA legacy_alter_table=ON")
+        try:
+            cursor.execute(f"ALTER TABLE {rebuilt} RENAME TO {table}")
+        finally:
+            cursor.execute("PRAGMA legacy_alter_table=OFF")
+        if sequence:
+            # Conserver le compteur AUTOINCREMENT (identifiants jamais réutilisés)
+            cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (sequence[0], table))
+        for sql in dependents:
+            cursor.execute(sql)
+    return step
+
+def symptom_window_sql(symptom_jd, meal_jd):
+    return f"ROUND(({symptom_jd} - {meal_jd}) * 86400000) BETWEEN 7200000 AND 172800000"
+
+def julianday_risk_store_fill_sql(where=''):
+    """Remplissage du store de risque d'origine (migration 7, dates julianday)"""
+    return [
+        f"""
+        INSERT INTO meal_risk_state (meal_id, user_id, food_id, meal_jd, hit)
+        SELECT m.id, m.user_id, m.food_id, julianday(m.meal_time),
+               EXISTS (SELECT 1 FROM symptoms s
+                       WHERE s.user_id = m.user_id
+                       AND {symptom_window_sql('julianday(s.occurrence_time)', 'julianday(m.meal_time)')})
+        FROM meals m
+        WHERE julianday(m.meal_time) IS NOT NULL {where.replace('user_id', 'm.user_id')}
+        """,
+        f"""
+        INSERT INTO user_food_risk (user_id, food_id, consumption_count, hit_count)
+        SELECT user_id, food_id, COUNT(*), SUM(hit)
+        FROM meal_risk_state
+        WHERE expired = 0 {where}
+        GROUP BY user_id, food_id
+        """,
+    ]
+
+def create_risk_store(cursor):
+    """Store matérialisé des scores de risque, maintenu par triggers (migration 7, dates julianday)"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS meal_risk_state (
+            meal_id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            food_id INTEGER NOT NULL,
+            meal_jd REAL NOT NULL,
+            hit INTEGER NOT NULL DEFAULT 0,
+            expired INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_meal_risk_state_user_time ON meal_risk_state (user_id, meal_jd)")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_food_risk (
+            user_id INTEGER NOT NULL,
+            food_id INTEGER NOT NULL,
+            consumption_count INTEGER NOT NULL DEFAULT 0,
+            hit_count INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, food_id)
+        ) WITHOUT ROWID
+    ''')
+    
+    # Nouveau repas : un symptôme existe-t-il déjà dans les 2h-48h qui suivent ?
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_meals_risk_insert AFTER INSERT ON meals
+        WHEN julianday(NEW.meal_time) IS NOT NULL
+        BEGIN
+            INSERT INTO meal_risk_state (meal_id, user_id, food_id, meal_jd, hit)
+            VALUES (NEW.id, NEW.user_id, NEW.food_id, julianday(NEW.meal_time),
+                    EXISTS (SELECT 1 FROM symptoms s
+                            WHERE s.user_id = NEW.user_id
+                            AND {symptom_window_sql('julianday(s.occurrence_time)', 'julianday(NEW.meal_time)')}));
+            INSERT INTO user_food_risk (user_id, food_id, consumption_count, hit_count)
+            SELECT user_id, food_id, 1, hit FROM meal_risk_state WHERE meal_id = NEW.id
+            ON CONFLICT (user_id, food_id) DO UPDATE SET
+                consumption_count = consumption_count + 1,
+                hit_count = hit_count + excluded.hit_count,
+                updated_at = CURRENT_TIMESTAMP;
+        END
+    """)
+    
+    # Nouveau symptôme : marquer les repas des 2h-48h précédentes qui n'avaient pas encore de symptôme
+    def matching_meals(alias):
+        return f"""
+            {alias}.user_id = NEW.user_id AND {alias}.hit = 0
+            AND {alias}.meal_jd BETWEEN julianday(NEW.occurrence_time) - 2.001 AND julianday(NEW.occurrence_time) - 0.083
+            AND {symptom_window_sql('julianday(NEW.occurrence_time)', f'{alias}.meal_jd')}
+        """
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_symptoms_risk_insert AFTER INSERT ON symptoms
+        WHEN julianday(NEW.occurrence_time) IS NOT NULL
+        BEGIN
+            UPDATE user_food_risk SET
+                hit_count = hit_count + (SELECT COUNT(*) FROM meal_risk_state m
+                                         WHERE {matching_meals('m')} AND m.expired = 0
+                                         AND m.food_id = user_food_risk.food_id),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE user_id = NEW.user_id
+            AND food_id IN (SELECT m.food_id FROM meal_risk_state m WHERE {matching_meals('m')} AND m.expired = 0);
+            UPDATE meal_risk_state SET hit = 1 WHERE {matching_meals('meal_risk_state')};
+        END
+    """)
+    
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_meals_risk_delete AFTER DELETE ON meals
+        BEGIN
+            UPDATE user_food_risk SET
+                consumption_count = consumption_count - 1,
+                hit_count = hit_count - (SELECT hit FROM meal_risk_state WHERE meal_id = OLD.id),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE (user_id, food_id) IN (SELECT user_id, food_id FROM meal_risk_state
+                                         WHERE meal_id = OLD.id AND expired = 0);
+            DELETE FROM meal_risk_state WHERE meal_id = OLD.id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_users_risk_delete AFTER DELETE ON users
+        BEGIN
+            DELETE FROM user_food_risk WHERE user_id = OLD.id;
+            DELETE FROM meal_risk_state WHERE user_id = OLD.id;
+        END
+    ''')
+    
+    # Remplissage initial à partir de l'historique existant
+    cursor.execute("DELETE FROM user_food_risk")
+    cursor.execute("DELETE FROM meal_risk_state")
+    for query in julianday_risk_store_fill_sql():
+        cursor.execute(query)
+
+# Fenêtre symptôme/repas du moteur (2h à 48h), en millisecondes
+SYMPTOM_WINDOW_MIN_MS = 2 * 3600 * 1000
+SYMPTOM_WINDOW_MAX_MS = 48 * 3600 * 1000
+
+def symptoms_after_meal_sql(meal_ts):
+    """Condition (sur symptoms s) : symptôme dans les 2h-48h qui suivent le repas, par plage d'index"""
+    return (f"s.occurrence_ts BETWEEN {meal_ts} + {SYMPTOM_WINDOW_MIN_MS} "
+            f"AND {meal_ts} + {SYMPTOM_WINDOW_MAX_MS}")
+
+def meals_before_symptom_sql(alias, user_id, occurrence_ts):
+    """Condition (sur meal_risk_state) : repas sans symptôme dans les 2h-48h qui précèdent le symptôme"""
+    return f"""
+            {alias}.user_id = {user_id} AND {alias}.hit = 0
+            AND {alias}.meal_ts BETWEEN {occurrence_ts} - {SYMPTOM_WINDOW_MAX_MS}
+                                    AND {occurrence_ts} - {SYMPTOM_WINDOW_MIN_MS}
+        """
+
+# Instant présent en ms epoch, calculé par SQLite (triggers et reconstruction du store)
+NOW_MS_SQL = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+
+def add_epoch_columns(cursor):
+    """Colonnes meal_ts / occurrence_ts (ms epoch UTC) calculées depuis les dates ISO existantes
+
+    Une date sans fuseau est lue comme UTC, et non plus dans le fuseau local du serveur.
+    """
+    for table, column, source, index in (
+        ('meals', 'meal_ts', 'meal_time', 'idx_meals_user_ts'),
+        ('symptoms', 'occurrence_ts', 'occurrence_time', 'idx_symptoms_user_ts'),
+    ):
+        add_column(table, column, 'INTEGER')(cursor)
+        cursor.execute(f"SELECT id, {source} FROM {table} WHERE {column} IS NULL AND {source} IS NOT NULL")
+        updates = []
+        for row_id, value in cursor.fetchall():
+            try:
+                updates.append((to_epoch_ms(value), row_id))
+            except ValueError:
+                # Date illisible : la ligne reste hors des filtres par période
+                pass
+        cursor.executemany(f"UPDATE {table} SET {column} = ? WHERE id = ?", updates)
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {index} ON {table} (user_id, {column})")
+
+def risk_store_fill_sql(where=''):
+    """Requêtes de reconstruction du store de risque (toutes les données ou un utilisateur)"""
+    return [
+        f"""
+        INSERT INTO meal_risk_state (meal_id, user_id, food_id, meal_ts, hit)
+        SELECT m.id, m.user_id, m.food_id, m.meal_ts,
+               EXISTS (SELECT 1 FROM symptoms s
+                       WHERE s.user_id = m.user_id AND {symptoms_after_meal_sql('m.meal_ts')}
+                       AND s.occurrence_ts <= {NOW_MS_SQL})
+        FROM meals m
+        WHERE m.meal_ts <= {NOW_MS_SQL} {where.replace('user_id', 'm.user_id')}
+        """,
+        f"""
+        INSERT INTO user_food_risk (user_id, food_id, consumption_count, hit_count)
+        SELECT user_id, food_id, COUNT(*), SUM(hit)
+        FROM meal_risk_state
+        WHERE expired = 0 {where}
+        GROUP BY user_id, food_id
+        """,
+    ]
+
+def create_epoch_risk_store(cursor):
+    """Tables du store matérialisé des scores de risque sur meal_ts / occurrence_ts"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS meal_risk_state (
+            meal_id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            food_id INTEGER NOT NULL,
+            meal_ts INTEGER NOT NULL,
+            hit INTEGER NOT NULL DEFAULT 0,
+            expired INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_meal_risk_state_user_time ON meal_risk_state (user_id, meal_ts)")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_food_risk (
+            user_id INTEGER NOT NULL,
+            food_id INTEGER NOT NULL,
+            consumption_count INTEGER NOT NULL DEFAULT 0,
+            hit_count INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, food_id)
+        ) WITHOUT ROWID
+    ''')
+    
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_meals_risk_delete AFTER DELETE ON meals
+        BEGIN
+            UPDATE user_food_risk SET
+                consumption_count = consumption_count - 1,
+                hit_count = hit_count - (SELECT hit FROM meal_risk_state WHERE meal_id = OLD.id),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE (user_id, food_id) IN (SELECT user_id, food_id FROM meal_risk_state
+                                         WHERE meal_id = OLD.id AND expired = 0);
+            DELETE FROM meal_risk_state WHERE meal_id = OLD.id;
+        END
+    ''')
+
+def create_epoch_risk_triggers(cursor):
+    """Triggers d'insertion du store de risque et remplissage initial (remplacés par la migration 17)"""
+    # Nouveau repas : un symptôme existe-t-il déjà dans les 2h-48h qui suivent ?
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_meals_risk_insert AFTER INSERT ON meals
+        WHEN NEW.meal_ts IS NOT NULL
+        BEGIN
+            INSERT INTO meal_risk_state (meal_id, user_id, food_id, meal_ts, hit)
+            VALUES (NEW.id, NEW.user_id, NEW.food_id, NEW.meal_ts,
+                    EXISTS (SELECT 1 FROM symptoms s
+                            WHERE s.user_id = NEW.user_id AND {symptoms_after_meal_sql('NEW.meal_ts')}));
+            INSERT INTO user_food_risk (user_id, food_id, consumption_count, hit_count)
+            SELECT user_id, food_id, 1, hit FROM meal_risk_state WHERE meal_id = NEW.id
+            ON CONFLICT (user_id, food_id) DO UPDATE SET
+                consumption_count = consumption_count + 1,
+                hit_count = hit_count + excluded.hit_count,
+                updated_at = CURRENT_TIMESTAMP;
+        END
+    """)
+    
+    # Nouveau symptôme : marquer les repas des 2h-48h précédentes qui n'avaient pas encore de symptôme
+    def matching_meals(alias):
+        return meals_before_symptom_sql(alias, 'NEW.user_id', 'NEW.occurrence_ts')
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_symptoms_risk_insert AFTER INSERT ON symptoms
+        WHEN NEW.occurrence_ts IS NOT NULL
+        BEGIN
+            UPDATE user_food_risk SET
+                hit_count = hit_count + (SELECT COUNT(*) FROM meal_risk_state m
+                                         WHERE {matching_meals('m')} AND m.expired = 0
+                                         AND m.food_id = user_food_risk.food_id),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE user_id = NEW.user_id
+            AND food_id IN (SELECT m.food_id FROM meal_risk_state m WHERE {matching_meals('m')} AND m.expired = 0);
+            UPDATE meal_risk_state SET hit = 1 WHERE {matching_meals('meal_risk_state')};
+        END
+    """)
+    
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_users_risk_delete AFTER DELETE ON users
+        BEGIN
+            DELETE FROM user_food_risk WHERE user_id = OLD.id;
+            DELETE FROM meal_risk_state WHERE user_id = OLD.id;
+        END
+    ''')
+    
+    # Remplissage initial à partir de l'historique existant
+    cursor.execute("DELETE FROM user_food_risk")
+    cursor.execute("DELETE FROM meal_risk_state")
+    for query in risk_store_fill_sql():
+        cursor.execute(query)
+
+def recreate_risk_store(cursor):
+    """Recréer les tables du store de risque (changement de schéma)"""
+    for trigger in ('trg_meals_risk_insert', 'trg_symptoms_risk_insert', 'trg_meals_risk_delete', 'trg_users_risk_delete'):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    cursor.execute("DROP TABLE IF EXISTS meal_risk_state")
+    cursor.execute("DROP TABLE IF EXISTS user_food_risk")
+    create_epoch_risk_store(cursor)
+
+def risk_store_pending_sql(where=''):
+    """Requêtes notant, par utilisateur, le prochain repas ou symptôme daté dans le futur"""
+    return [
+        f"""
+        INSERT OR IGNORE INTO risk_store_pending (user_id, due_ts)
+        SELECT user_id, MIN({column}) FROM {table}
+        WHERE {column} > {NOW_MS_SQL} {where}
+        GROUP BY user_id
+        """
+        for table, column in (('meals', 'meal_ts'), ('symptoms', 'occurrence_ts'))
+    ]
+
+def skip_future_rows_in_risk_store(cursor):
+    """Le store ignore les repas et symptômes futurs, repris par RiskStoreDAO.maintain à leur échéance"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS risk_store_pending (
+            user_id INTEGER NOT NULL,
+            due_ts INTEGER NOT NULL,
+            PRIMARY KEY (user_id, due_ts)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_risk_store_pending_due ON risk_store_pending (due_ts)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_meal_risk_state_active ON meal_risk_state (meal_ts) WHERE expired = 0")
+    for trigger in ('trg_meals_risk_insert', 'trg_symptoms_risk_insert', 'trg_users_risk_delete'):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    
+    cursor.execute(f"""
+        CREATE TRIGGER trg_meals_risk_insert AFTER INSERT ON meals
+        WHEN NEW.meal_ts <= {NOW_MS_SQL}
+        BEGIN
+            INSERT INTO meal_risk_state (meal_id, user_id, food_id, meal_ts, hit)
+            VALUES (NEW.id, NEW.user_id, NEW.food_id, NEW.meal_ts,
+                    EXISTS (SELECT 1 FROM symptoms s
+                            WHERE s.user_id = NEW.user_id AND {symptoms_after_meal_sql('NEW.meal_ts')}
+                            AND s.occurrence_ts <= {NOW_MS_SQL}));
+            INSERT INTO user_food_risk (user_id, food_id, consumption_count, hit_count)
+            SELECT user_id, food_id, 1, hit FROM meal_risk_state WHERE meal_id = NEW.id
+            ON CONFLICT (user_id, food_id) DO UPDATE SET
+                consumption_count = consumption_count + 1,
+                hit_count = hit_count + excluded.hit_count,
+                updated_at = CURRENT_TIMESTAMP;
+        END
+    """)
+    
+    def matching_meals(alias):
+        return meals_before_symptom_sql(alias, 'NEW.user_id', 'NEW.occurrence_ts')
+    cursor.execute(f"""
+        CREATE TRIGGER trg_symptoms_risk_insert AFTER INSERT ON symptoms
+        WHEN NEW.occurrence_ts <= {NOW_MS_SQL}
+        BEGIN
+            UPDATE user_food_risk SET
+                hit_count = hit_count + (SELECT COUNT(*) FROM meal_risk_state m
+                                         WHERE {matching_meals('m')} AND m.expired = 0
+                                         AND m.food_id = user_food_risk.food_id),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE user_id = NEW.user_id
+            AND food_id IN (SELECT m.food_id FROM meal_risk_state m WHERE {matching_meals('m')} AND m.expired = 0);
+            UPDATE meal_risk_state SET hit = 1 WHERE {matching_meals('meal_risk_state')};
+        END
+    """)
+    
+    # Repas ou symptôme futur : pris en compte par la maintenance quand il arrive à échéance
+    for table, column in (('meals', 'meal_ts'), ('symptoms', 'occurrence_ts')):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_risk_pending AFTER INSERT ON {table}
+            WHEN NEW.{column} > {NOW_MS_SQL}
+            BEGIN
+                INSERT OR IGNORE INTO risk_store_pending (user_id, due_ts) VALUES (NEW.user_id, NEW.{column});
+            END
+        """)
+    cursor.execute('''
+        CREATE TRIGGER trg_users_risk_delete AFTER DELETE ON users
+        BEGIN
+            DELETE FROM user_food_risk WHERE user_id = OLD.id;
+            DELETE FROM meal_risk_state WHERE user_id = OLD.id;
+            DELETE FROM risk_store_pending WHERE user_id = OLD.id;
+        END
+    ''')
+    
+    cursor.execute("DELETE FROM user_food_risk")
+    cursor.execute("DELETE FROM meal_risk_state")
+    for query in risk_store_fill_sql() + risk_store_pending_sql():
+        cursor.execute(query)
+
+def require_epoch_timestamps(cursor):
+    """meal_ts / occurrence_ts obligatoires : anciennes dates illisibles ramenées à 0, NULL refusé ensuite"""
+    for table, column in (('meals', 'meal_ts'), ('symptoms', 'occurrence_ts')):
+        # 0 (1970) garde ces lignes dans la pagination et l'export, hors de toute période d'analyse
+        cursor.execute(f"UPDATE {table} SET {column} = 0 WHERE {column} IS NULL")
+        if cursor.rowcount:
+            print(f"{cursor.rowcount} ligne(s) de {table} sans date lisible, {column} fixé à 0")
+        for event in ('INSERT', f'UPDATE OF {column}'):
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.split()[0].lower()}_require_ts
+                BEFORE {event} ON {table}
+                WHEN NEW.{column} IS NULL
+                BEGIN SELECT RAISE(ABORT, '{column} obligatoire'); END
+            """)
+
+def create_media_store(cursor):
+    """Store de médias adressé par contenu (sha256) avec récupération des fichiers orphelins"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_food_images_content_hash ON food_images (content_hash)")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS media_orphans (
+            content_hash TEXT PRIMARY KEY,
+            file_path TEXT NOT NULL,
+            orphaned_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    # Le nombre de références d'un fichier est le nombre de lignes de food_images
+    # portant son empreinte (index idx_food_images_content_hash)
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_food_images_delete_media
+        AFTER DELETE ON food_images
+        WHEN OLD.content_hash IS NOT NULL
+             AND NOT EXISTS (SELECT 1 FROM food_images WHERE content_hash = OLD.content_hash)
+        BEGIN
+            INSERT OR REPLACE INTO media_orphans (content_hash, file_path)
+            VALUES (OLD.content_hash, OLD.file_path);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_food_images_insert_media
+        AFTER INSERT ON food_images
+        WHEN NEW.content_hash IS NOT NULL
+        BEGIN
+            DELETE FROM media_orphans WHERE content_hash = NEW.content_hash;
+        END
+    ''')
+    
+    # Copier les fichiers existants dans le store. Les originaux ne sont supprimés
+    # qu'après le commit (fonction retournée à apply_migrations) : un rollback
+    # laisse les anciens chemins intacts.
+    store = ImageManager(MEDIA_FOLDER)
+    adopted = {}
+    replaced = set()
+    missing = 0
+    cursor.execute("SELECT id, file_path FROM food_images WHERE content_hash IS NULL")
+    legacy_images = cursor.fetchall()
+    if legacy_images and not any(os.scandir(MEDIA_FOLDER)):
+        raise RuntimeError(
+            f"{len(legacy_images)} image(s) à migrer mais {os.path.abspath(MEDIA_FOLDER)} est vide : "
+            "lancer l'application depuis le répertoire qui contient le dossier media"
+        )
+    
+    for image_id, file_path in legacy_images:
+        if file_path not in adopted:
+            if not os.path.isfile(file_path):
+                missing += 1
+                continue
+            adopted[file_path] = store.adopt_file(file_path)
+        new_path, content_hash = adopted[file_path]
+        if os.path.abspath(new_path) != os.path.abspath(file_path):
+            replaced.add(file_path)
+        cursor.execute(
+            "UPDATE food_images SET file_path = ?, content_hash = ? WHERE id = ?",
+            (new_path, content_hash, image_id)
+        )
+        
+        cursor.execute("SELECT id, size, format, file_path FROM food_image_variants WHERE image_id = ?", (image_id,))
+        for variant_id, size, image_format, variant_path in cursor.fetchall():
+            new_variant_path = ImageManager.variant_path(new_path, size, image_format)
+            if os.path.isfile(variant_path) and variant_path != new_variant_path:
+                ImageManager.copy_file(variant_path, new_variant_path)
+                replaced.add(variant_path)
+            cursor.execute(
+                "UPDATE food_image_variants SET file_path = ? WHERE id = ?",
+                (new_variant_path, variant_id)
+            )
+    if missing:
+        print(f"{missing} image(s) introuvable(s) sous {os.path.abspath(MEDIA_FOLDER)}, laissée(s) hors du store")
+    
+    def remove_originals():
+        for path in replaced:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    return remove_originals
+
 # DAO Pattern - Data Access Objects
 class DatabaseDAO:
-    def __init__(self, db_name='allergy_detection.db'):
-        self.db_name = db_name
+    def __init__(self, db_name=None, pool_size=None):
+        self.db_name = db_name or os.environ.get('DATABASE_PATH', 'allergy_detection.db')
+        self.pool = ConnectionPool(
+            self.db_name,
+            max_size=pool_size or int(os.environ.get('DB_POOL_SIZE', 8)),
+            timeout=float(os.environ.get('DB_POOL_TIMEOUT', 10))
+        )
         self.init_database()
     
     def get_connection(self):
-        return sqlite3.connect(self.db_name)
+        return self.pool.connection()
     
     def init_database(self):
         with self.get_connection() as conn:
@@ -135,6 +1367,367 @@ class DatabaseDAO:
         ''')
             
             conn.commit()
+        
+        self.apply_migrations()
+    
+    # Migrations de schéma appliquées dans l'ordre au démarrage : (version, description, étapes).
+    # Une étape est une requête SQL ou une fonction recevant le curseur ; toutes doivent
+    # rester idempotentes.
+    MIGRATIONS = [
+        (1, "Normalisation de l'ancienne table food_images", [
+            migrate_legacy_food_images,
+        ]),
+        (2, "Index secondaires des requêtes fréquentes", [
+            superseded_by(14, "CREATE INDEX IF NOT EXISTS idx_meals_user_time ON meals (user_id, meal_time)"),
+            superseded_by(14, "CREATE INDEX IF NOT EXISTS idx_symptoms_user_time ON symptoms (user_id, occurrence_time)"),
+            "CREATE INDEX IF NOT EXISTS idx_food_images_food_primary ON food_images (food_id, is_primary)",
+            "CREATE INDEX IF NOT EXISTS idx_weekly_plans_user_week ON weekly_plans (user_id, week_start_date)",
+            "CREATE INDEX IF NOT EXISTS idx_buffet_foods_buffet ON buffet_foods (buffet_id)",
+            "CREATE INDEX IF NOT EXISTS idx_buffet_events_created_by ON buffet_events (created_by)",
+        ]),
+        (3, "Index du catalogue par catégorie", [
+            "CREATE INDEX IF NOT EXISTS idx_foods_category ON foods (category)",
+        ]),
+        (4, "Version du catalogue incrémentée à chaque modification", [
+            "CREATE TABLE IF NOT EXISTS catalog_state (id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL)",
+            "INSERT OR IGNORE INTO catalog_state (id, version) VALUES (1, 1)",
+        ] + [
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_catalog_version "
+            f"AFTER {event} ON {table} "
+            f"BEGIN UPDATE catalog_state SET version = version + 1 WHERE id = 1; END"
+            for table in ('foods', 'food_images')
+            for event in ('INSERT', 'UPDATE', 'DELETE')
+        ]),
+        (5, "Index plein texte FTS5 des aliments", [
+            create_food_search_index,
+        ]),
+        (6, "Clés d'idempotence des repas et symptômes", [
+            add_column('meals', 'idempotency_key', 'TEXT'),
+            add_column('symptoms', 'idempotency_key', 'TEXT'),
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_meals_idempotency ON meals (user_id, idempotency_key) "
+            "WHERE idempotency_key IS NOT NULL",
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_symptoms_idempotency ON symptoms (user_id, idempotency_key) "
+            "WHERE idempotency_key IS NOT NULL",
+        ]),
+        (7, "Store matérialisé des scores de risque par utilisateur et aliment", [
+            superseded_by(14, create_risk_store),
+        ]),
+        (8, "Version des données de chaque utilisateur", [
+            add_column('users', 'data_version', 'INTEGER NOT NULL DEFAULT 0'),
+        ] + [
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_user_version "
+            f"AFTER {event} ON {table} "
+            f"BEGIN UPDATE users SET data_version = data_version + 1 WHERE id = {row}.user_id; END"
+            for table in ('meals', 'symptoms')
+            for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD'))
+        ]),
+        (9, "File d'attente persistante des téléchargements d'images", [
+            '''
+            CREATE TABLE IF NOT EXISTS image_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                food_id INTEGER NOT NULL,
+                image_url TEXT NOT NULL,
+                is_primary BOOLEAN DEFAULT 0,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                image_id INTEGER,
+                available_at REAL NOT NULL DEFAULT 0,
+                lease_expires_at REAL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (food_id) REFERENCES foods (id) ON DELETE CASCADE
+            )
+            ''',
+            "CREATE INDEX IF NOT EXISTS idx_image_jobs_status ON image_jobs (status, available_at)",
+        ]),
+        (10, "Variantes redimensionnées des images d'aliments", [
+            '''
+            CREATE TABLE IF NOT EXISTS food_image_variants (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                image_id INTEGER NOT NULL,
+                size TEXT NOT NULL,
+                format TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                width INTEGER,
+                height INTEGER,
+                file_size INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE (image_id, size, format),
+                FOREIGN KEY (image_id) REFERENCES food_images (id) ON DELETE CASCADE
+            )
+            ''',
+        ]),
+        (11, "Store de médias adressé par contenu", [
+            add_column('food_images', 'content_hash', 'TEXT'),
+            create_media_store,
+        ]),
+        (12, "Index de pagination des utilisateurs", [
+            "CREATE INDEX IF NOT EXISTS idx_users_created_at ON users (created_at)",
+        ]),
+        (13, "Suppression en cascade des données d'un utilisateur", [
+            cascade_on_delete('meals', 'users'),
+            cascade_on_delete('symptoms', 'users'),
+            cascade_on_delete('weekly_plans', 'users'),
+            cascade_on_delete('buffet_events', 'users'),
+            cascade_on_delete('buffet_foods', 'buffet_events'),
+        ]),
+        (14, "Horodatages des repas et symptômes en millisecondes epoch", [
+            add_epoch_columns,
+            "DROP INDEX IF EXISTS idx_meals_user_time",
+            "DROP INDEX IF EXISTS idx_symptoms_user_time",
+            recreate_risk_store,
+            superseded_by(17, create_epoch_risk_triggers),
+        ]),
+        (15, "Rapports d'analyse d'allergies par lot", [
+            '''
+            CREATE TABLE IF NOT EXISTS analysis_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                status TEXT NOT NULL DEFAULT 'running',
+                threshold REAL NOT NULL,
+                days_back INTEGER NOT NULL,
+                reference_ts INTEGER NOT NULL,
+                users_analyzed INTEGER NOT NULL DEFAULT 0,
+                reports_count INTEGER NOT NULL DEFAULT 0,
+                elapsed_seconds REAL,
+                started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                finished_at TIMESTAMP
+            )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS allergy_reports (
+                run_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                food_id INTEGER NOT NULL,
+                risk_score REAL NOT NULL,
+                PRIMARY KEY (run_id, user_id, food_id),
+                FOREIGN KEY (run_id) REFERENCES analysis_runs (id) ON DELETE CASCADE,
+                FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+            ) WITHOUT ROWID
+            ''',
+            "CREATE INDEX IF NOT EXISTS idx_allergy_reports_user ON allergy_reports (user_id)",
+        ]),
+        (16, "Horodatages epoch obligatoires des repas et symptômes", [
+            require_epoch_timestamps,
+        ]),
+        (17, "Repas et symptômes futurs exclus du store de risque", [
+            skip_future_rows_in_risk_store,
+        ]),
+    ]
+    
+    def apply_migrations(self):
+        """Appliquer les migrations de schéma manquantes"""
+        with self.get_connection() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            conn.commit()
+            
+            # Clés étrangères désactivées le temps des migrations (reconstruction de
+            # tables) ; le pragma est sans effet à l'intérieur d'une transaction
+            conn.execute("PRAGMA foreign_keys=OFF")
+            applied = {row[0] for row in conn.execute("SELECT version FROM schema_version")}
+            pending = {version for version, _, _ in self.MIGRATIONS if version not in applied}
+            try:
+                for version, description, steps in self.MIGRATIONS:
+                    # BEGIN IMMEDIATE : un seul processus applique une migration donnée
+                    conn.execute("BEGIN IMMEDIATE")
+                    try:
+                        cursor = conn.cursor()
+                        cursor.execute("SELECT 1 FROM schema_version WHERE version = ?", (version,))
+                        # Une étape peut retourner une fonction à exécuter après le
+                        # commit (suppression de fichiers, irréversible)
+                        after_commit = []
+                        if cursor.fetchone() is None:
+                            for step in steps:
+                                if getattr(step, 'superseded_by', None) in pending:
+                                    continue
+                                if callable(step):
+                                    cleanup = step(cursor)
+                                    if callable(cleanup):
+                                        after_commit.append(cleanup)
+                                else:
+                                    cursor.execute(step)
+                            cursor.execute(
+                                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                                (version, description)
+                            )
+                        conn.commit()
+                    except Exception:
+                        conn.rollback()
+                        raise
+                    for cleanup in after_commit:
+                        try:
+                            cleanup()
+                        except OSError as e:
+                            print(f"Migration {version} : nettoyage incomplet ({e})")
+            finally:
+                conn.execute("PRAGMA foreign_keys=ON")
+    
+    def insert_many(self, table, columns, rows, references=None):
+        """Insérer des lignes avec executemany dans une seule transaction
+        
+        rows : dictionnaires contenant au moins les colonnes et un éventuel
+        'idempotency_key'. references : {colonne: table référencée} vérifiées
+        avant l'insertion. Retourne un (statut, id ou erreur) par ligne, où
+        statut vaut 'created', 'duplicate' (clé déjà enregistrée ou répétée
+        dans le lot : id de la ligne existante) ou 'invalid'.
+        """
+        results = [None] * len(rows)
+        
+        with self.get_connection() as conn:
+            # Verrou d'écriture dès le début : les vérifications restent valables jusqu'à l'insertion
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.cursor()
+            
+            # Références inexistantes (utilisateur, aliment...)
+            for column, referenced_table in (references or {}).items():
+                wanted = list({row[column] for row in rows})
+                found = set()
+                for start in range(0, len(wanted), 500):
+                    chunk = wanted[start:start + 500]
+                    cursor.execute(
+                        f"SELECT id FROM {referenced_table} WHERE id IN ({','.join('?' * len(chunk))})",
+                        chunk
+                    )
+                    found.update(row[0] for row in cursor.fetchall())
+                for index, row in enumerate(rows):
+                    if results[index] is None and row[column] not in found:
+                        results[index] = ('invalid', f'{column} inexistant: {row[column]}')
+            
+            # Clés d'idempotence déjà enregistrées (envoi répété du même lot)
+            keys_by_user = defaultdict(set)
+            for index, row in enumerate(rows):
+                if results[index] is None and row.get('idempotency_key'):
+                    keys_by_user[row['user_id']].add(row['idempotency_key'])
+            
+            existing = {}
+            for user_id, keys in keys_by_user.items():
+                keys = list(keys)
+                for start in range(0, len(keys), 500):
+                    chunk = keys[start:start + 500]
+                    cursor.execute(
+                        f"SELECT id, idempotency_key FROM {table} "
+                        f"WHERE user_id = ? AND idempotency_key IN ({','.join('?' * len(chunk))})",
+                        [user_id] + chunk
+                    )
+                    for row_id, key in cursor.fetchall():
+                        existing[(user_id, key)] = row_id
+            
+            # Lignes à insérer ; une clé répétée dans le lot renvoie à la première ligne qui la porte
+            to_insert = []
+            batch_keys = {}
+            repeats = []
+            for index, row in enumerate(rows):
+                if results[index] is not None:
+                    continue
+                key = (row['user_id'], row.get('idempotency_key'))
+                if key[1] and key in existing:
+                    results[index] = ('duplicate', existing[key])
+                elif key[1] and key in batch_keys:
+                    repeats.append((index, batch_keys[key]))
+                else:
+                    if key[1]:
+                        batch_keys[key] = index
+                    to_insert.append(index)
+            
+            # Un seul executemany. Sous le verrou d'écriture, AUTOINCREMENT attribue des
+            # identifiants croissants dans l'ordre d'insertion : les lignes d'id supérieur
+            # au maximum précédent, triées, correspondent à to_insert
+            insert_columns = list(columns) + ['idempotency_key']
+            cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}")
+            last_id = cursor.fetchone()[0]
+            cursor.executemany(
+                f"INSERT INTO {table} ({', '.join(insert_columns)}) "
+                f"VALUES ({', '.join('?' * len(insert_columns))})",
+                [tuple(rows[index].get(column) for column in insert_columns) for index in to_insert]
+            )
+            cursor.execute(f"SELECT id, user_id, idempotency_key FROM {table} WHERE id > ? ORDER BY id", (last_id,))
+            inserted = cursor.fetchall()
+            by_key = {(user_id, key): row_id for row_id, user_id, key in inserted if key}
+            unkeyed = iter(row_id for row_id, _, key in inserted if not key)
+            for index in to_insert:
+                key = (rows[index]['user_id'], rows[index].get('idempotency_key'))
+                results[index] = ('created', by_key[key] if key[1] else next(unkeyed))
+            for index, first_index in repeats:
+                results[index] = ('duplicate', results[first_index][1])
+        
+        return results
+    
+    def has_table(self, name):
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,))
+            return cursor.fetchone() is not None
+    
+    def get_schema_version(self):
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT MAX(version) FROM schema_version")
+            return cursor.fetchone()[0] or 0
+    
+    # Requêtes fréquentes qui doivent toujours passer par un index. Chaque entrée
+    # construit (requête, paramètres) à partir du SQL exécuté par le DAO ou la
+    # route concernés : le plan vérifié est celui de la requête réelle.
+    HOT_QUERIES = {
+        'user_meals_range': lambda: MealDAO.page_query(1, None, None, 1735689600000, 1767225599999),
+        'user_symptoms_range': lambda: SymptomDAO.page_query(1, None, None, 1735689600000, 1767225599999),
+        'user_meal_events': lambda: (MealDAO.EVENTS_SQL, (1, 1735689600000, 1767225599999)),
+        'user_symptom_times': lambda: (SymptomDAO.TIMES_SQL, (1, 1735689600000, 1767225599999)),
+        # Corps des triggers du store de risque (mêmes fragments SQL, NEW remplacé par des paramètres)
+        'meal_symptom_window': lambda: (
+            f"SELECT 1 FROM symptoms s WHERE s.user_id = ? AND {symptoms_after_meal_sql('?')}",
+            (1, 1735689600000, 1735689600000)
+        ),
+        'symptom_meal_window': lambda: (
+            f"SELECT m.food_id FROM meal_risk_state m WHERE {meals_before_symptom_sql('m', '?', '?')} "
+            "AND m.expired = 0",
+            (1, 1767225599999, 1767225599999)
+        ),
+        'user_risk_scores': lambda: (RiskStoreDAO.SCORES_SQL, (1, 1735689600000, 1)),
+        'risk_store_stale_check': lambda: (RiskStoreDAO.STALE_CHECK_SQL, (1735689600000,)),
+        'risk_store_stale_meals': lambda: (RiskStoreDAO.EXPIRE_COUNTS_SQL, (1735689600000,)),
+        'risk_store_expire_meals': lambda: (RiskStoreDAO.EXPIRE_MEALS_SQL, (1735689600000,)),
+        'risk_store_due_users': lambda: (RiskStoreDAO.DUE_USERS_SQL, (1735689600000,)),
+        'clear_primary_image': lambda: (ImageManager.CLEAR_PRIMARY_SQL, (1,)),
+        'insert_food_image': lambda: (ImageManager.INSERT_IMAGE_SQL, (1, 'a.jpg', None, False, 1, 0, None)),
+        'set_primary_image': lambda: (ImageManager.SET_PRIMARY_SQL, (1, 1, 1)),
+        'media_references': lambda: (ImageManager.REFERENCED_SQL, ('0' * 64,)),
+        'weekly_plan': lambda: weekly_plan_query(1, '2025-06-16'),
+        'buffet_foods': lambda: (BUFFET_FOODS_SQL, (1,)),
+        'food_catalog_category': lambda: FoodDAO.catalog_query('Plat principal', 0, 50),
+        'user_meals_page': lambda: MealDAO.page_query(1, after=(1767225599999, 100), limit=50),
+        'user_symptoms_page': lambda: SymptomDAO.page_query(1, after=(1767225599999, 100), limit=50),
+        'users_page': lambda: UserDAO.page_query(after=('2025-12-31', 100), limit=50),
+        'user_deletion_stats': lambda: (UserDAO.DELETION_STATS_SQL, (1,)),
+        'user_delete_chunk': lambda: (UserDAO.delete_chunk_sql('meals', 'user_id'), (1, 1000)),
+        # Recherche faite par SQLite pour ON DELETE CASCADE (buffet_events -> buffet_foods)
+        'user_cascade_buffet_foods': lambda: ("DELETE FROM buffet_foods WHERE buffet_id = ?", (1,)),
+    }
+    
+    def explain_hot_queries(self):
+        """Plan d'exécution (EXPLAIN QUERY PLAN) de chaque requête fréquente"""
+        report = []
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            for name, build_query in self.HOT_QUERIES.items():
+                query, params = build_query()
+                cursor.execute(f"EXPLAIN QUERY PLAN {query}", params)
+                plan = [row[3] for row in cursor.fetchall()]
+                # Parcourir le résultat d'une sous-requête matérialisée n'est pas parcourir une table
+                materialized = {step.split()[1] for step in plan if step.startswith('MATERIALIZE ')}
+                report.append({
+                    'name': name,
+                    'plan': plan,
+                    'full_scan': any(
+                        step.startswith('SCAN ') and step.split()[1] not in materialized for step in plan
+                    )
+                })
+        return report
 
 class UserDAO:
     def __init__(self, db_dao):
@@ -163,6 +1756,28 @@ class UserDAO:
             cursor = conn.cursor()
             cursor.execute("SELECT * FROM users")
             return cursor.fetchall()
+    
+    @staticmethod
+    def page_query(after=None, limit=DEFAULT_PAGE_SIZE, search=None):
+        """(requête, paramètres) d'une page d'utilisateurs ; partagée avec HOT_QUERIES"""
+        query = "SELECT id, username, email, created_at FROM users WHERE 1 = 1"
+        params = []
+        if search:
+            query += " AND (username LIKE ? OR email LIKE ?)"
+            params.extend([f"%{search}%", f"%{search}%"])
+        if after is not None:
+            query += " AND (created_at, id) < (?, ?)"
+            params.extend(after)
+        query += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+        return query, params
+    
+    def get_users_page(self, after=None, limit=DEFAULT_PAGE_SIZE, search=None):
+        """Utilisateurs du plus récent au plus ancien, après la clé (created_at, id) donnée"""
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(*self.page_query(after, limit, search))
+            return cursor.fetchall()
     def update_user(self, user_id, username=None, email=None):
         """Mettre à jour les informations d'un utilisateur"""
         with self.db.get_connection() as conn:
@@ -195,201 +1810,1332 @@ class UserDAO:
             except sqlite3.IntegrityError:
                 return False
 
-    def delete_user(self, user_id):
-        """Supprimer un utilisateur et toutes ses données associées"""
+    # Données d'un utilisateur supprimées par lots avant la ligne users : (table, colonne)
+    USER_DATA_TABLES = (
+        ('meals', 'user_id'),
+        ('symptoms', 'user_id'),
+        ('weekly_plans', 'user_id'),
+        ('buffet_events', 'created_by'),
+    )
+    
+    DELETION_STATS_SQL = """
+        SELECT u.username,
+               (SELECT COUNT(*) FROM meals WHERE user_id = u.id),
+               (SELECT COUNT(*) FROM symptoms WHERE user_id = u.id),
+               (SELECT COUNT(*) FROM weekly_plans WHERE user_id = u.id),
+               (SELECT COUNT(*) FROM buffet_events WHERE created_by = u.id),
+               (SELECT COUNT(*) FROM buffet_foods bf JOIN buffet_events be ON bf.buffet_id = be.id
+                WHERE be.created_by = u.id)
+        FROM users u
+        WHERE u.id = ?
+    """
+    
+    @staticmethod
+    def delete_chunk_sql(table, column):
+        """Suppression d'au plus LIMIT lignes d'un utilisateur dans une table"""
+        return f"DELETE FROM {table} WHERE id IN (SELECT id FROM {table} WHERE {column} = ? LIMIT ?)"
+    
+    def get_deletion_stats(self, user_id):
+        """Nom et volume des données d'un utilisateur en une requête (None s'il n'existe pas)"""
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.DELETION_STATS_SQL, (user_id,))
+            return cursor.fetchone()
+    
+    def delete_user(self, user_id, chunk_size=None):
+        """Supprimer un utilisateur et toutes ses données associées
+        
+        Les données sont supprimées par lots de chunk_size lignes, chacun dans
+        sa propre transaction, pour ne jamais garder le verrou d'écriture
+        longtemps. La suppression finale de la ligne users retire en cascade
+        (ON DELETE CASCADE) ce qui aurait été ajouté entre-temps, y compris
+        les aliments des buffets. Retourne le nombre de lignes supprimées par
+        table, ou None si l'utilisateur n'existe pas ou en cas d'erreur (un
+        nouvel appel reprend là où la suppression s'est arrêtée).
+        """
+        chunk_size = chunk_size or USER_DELETE_CHUNK_SIZE
+        deleted = {}
+        
         with self.db.get_connection() as conn:
             cursor = conn.cursor()
             
             try:
-                # Supprimer d'abord toutes les données associées
-                cursor.execute("DELETE FROM symptoms WHERE user_id = ?", (user_id,))
-                cursor.execute("DELETE FROM meals WHERE user_id = ?", (user_id,))
-                cursor.execute("DELETE FROM weekly_plans WHERE user_id = ?", (user_id,))
-                cursor.execute("DELETE FROM buffet_events WHERE created_by = ?", (user_id,))
+                for table, column in self.USER_DATA_TABLES:
+                    deleted[table] = 0
+                    while True:
+                        cursor.execute(self.delete_chunk_sql(table, column), (user_id, chunk_size))
+                        count = cursor.rowcount
+                        conn.commit()
+                        deleted[table] += count
+                        if count < chunk_size:
+                            break
                 
-                # Supprimer l'utilisateur
                 cursor.execute("DELETE FROM users WHERE id = ?", (user_id,))
-                
+                found = cursor.rowcount > 0
                 conn.commit()
-                return cursor.rowcount > 0
-            except Exception:
+                return deleted if found else None
+            except sqlite3.Error:
                 conn.rollback()
-                return False
+                return None
 
     def user_exists(self, user_id):
         """Vérifier si un utilisateur existe"""
         with self.db.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT 1 FROM users WHERE id = ?", (user_id,))
-            return cursor.fetchone() is not None
+            cursor.execute("SELECT 1 FROM users WHERE id = ?", (user_id,))
+            return cursor.fetchone() is not None
+
+class FoodDAO:
+    def __init__(self, db_dao):
+        self.db = db_dao
+        self.has_fts = None
+    
+    def create_food(self, name, category, ingredients, image_path=None, is_base_food=False):
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "INSERT INTO foods (name, category, ingredients, image_path, is_base_food) VALUES (?, ?, ?, ?, ?)",
+                (name, category, ingredients, image_path, is_base_food)
+            )
+            conn.commit()
+            return cursor.lastrowid
+    
+    def get_food(self, food_id):
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM foods WHERE id = ?", (food_id,))
+            return cursor.fetchone()
+    
+    def get_all_foods(self):
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM foods")
+            return cursor.fetchall()
+    
+    @staticmethod
+    def catalog_query(category=None, after_id=None, limit=None):
+        """(requête, paramètres) du catalogue ; partagée avec HOT_QUERIES"""
+        query = """
+            SELECT f.id, f.name, f.category, f.ingredients, f.image_path, f.is_base_food,
+                   (SELECT fi.file_path FROM food_images fi
+                    WHERE fi.food_id = f.id AND fi.is_primary = 1
+                    LIMIT 1) AS primary_image
+            FROM foods f
+            WHERE 1 = 1
+        """
+        params = []
+        
+        if category:
+            query += " AND f.category = ?"
+            params.append(category)
+        if after_id is not None:
+            query += " AND f.id > ?"
+            params.append(after_id)
+        
+        query += " ORDER BY f.id"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return query, params
+    
+    def get_catalog(self, category=None, after_id=None, limit=None):
+        """Récupérer les aliments avec le chemin de leur image principale en une requête"""
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(*self.catalog_query(category, after_id, limit))
+            return cursor.fetchall()
+    
+    def search_foods(self, query, limit=None, offset=0):
+        """Recherche plein texte (préfixes, sans accents) classée par pertinence bm25"""
+        if self.has_fts is None:
+            self.has_fts = self.db.has_table('foods_fts')
+        if not self.has_fts:
+            return self.search_foods_like(query, limit, offset)
+        
+        # Chaque mot devient un préfixe : "ndo poi" -> "ndo"* AND "poi"*
+        terms = re.findall(r'\w+', query)
+        if not terms:
+            return []
+        match = ' '.join(f'"{term}"*' for term in terms)
+        
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT f.* FROM foods_fts
+                JOIN foods f ON f.id = foods_fts.rowid
+                WHERE foods_fts MATCH ?
+                ORDER BY bm25(foods_fts, 10.0, 2.0, 1.0)
+                LIMIT ? OFFSET ?
+                """,
+                (match, limit if limit is not None else -1, offset)
+            )
+            return cursor.fetchall()
+    
+    def search_foods_like(self, query, limit=None, offset=0):
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT * FROM foods WHERE name LIKE ? OR category LIKE ? OR ingredients LIKE ? LIMIT ? OFFSET ?",
+                (f"%{query}%", f"%{query}%", f"%{query}%", limit if limit is not None else -1, offset)
+            )
+            return cursor.fetchall()
+
+# Enregistrements typés renvoyés par les DAO de repas et de symptômes
+@dataclass(slots=True)
+class Meal:
+    """Repas avec son aliment ; meal_time est la date ISO saisie, meal_ts sa valeur en ms epoch"""
+    id: int
+    user_id: int
+    food_id: int
+    meal_time: str
+    meal_ts: int
+    quantity: float
+    notes: str
+    food_name: str
+    ingredients: str
+
+@dataclass(slots=True)
+class Symptom:
+    """Symptôme ; occurrence_time est la date ISO saisie, occurrence_ts sa valeur en ms epoch"""
+    id: int
+    user_id: int
+    symptom_type: str
+    severity: int
+    occurrence_time: str
+    occurrence_ts: int
+    description: str
+
+def record_factory(record_type):
+    """row_factory SQLite qui construit directement l'enregistrement typé"""
+    return lambda cursor, row: record_type(*row)
+
+class MealDAO:
+    # Colonnes dans l'ordre des champs de Meal
+    COLUMNS = (
+        "m.id, m.user_id, m.food_id, m.meal_time, m.meal_ts, m.quantity, m.notes, "
+        "f.name as food_name, f.ingredients"
+    )
+    
+    def __init__(self, db_dao):
+        self.db = db_dao
+    
+    def create_meal(self, user_id, food_id, meal_time, quantity, notes=None):
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(
+                    "INSERT INTO meals (user_id, food_id, meal_time, meal_ts, quantity, notes) VALUES (?, ?, ?, ?, ?, ?)",
+                    (user_id, food_id, meal_time, to_epoch_ms(meal_time), quantity, notes)
+                )
+                conn.commit()
+                return cursor.lastrowid
+            except sqlite3.IntegrityError:
+                # Utilisateur ou aliment inexistant (foreign_keys=ON)
+                return None
+    
+    def create_meals_bulk(self, meals):
+        """Insérer un lot de repas validés (meal_ts calculé) en une transaction"""
+        return self.db.insert_many(
+            'meals',
+            ('user_id', 'food_id', 'meal_time', 'meal_ts', 'quantity', 'notes'),
+            meals,
+            references={'user_id': 'users', 'food_id': 'foods'}
+        )
+    
+    def get_user_meals(self, user_id, start_ts=None, end_ts=None):
+        """Repas du plus récent au plus ancien, éventuellement bornés en ms epoch (bornes incluses)"""
+        return self.get_user_meals_page(user_id, start_ts=start_ts, end_ts=end_ts, limit=None)
+    
+    @classmethod
+    def page_query(cls, user_id, after=None, limit=MAX_PAGE_SIZE, start_ts=None, end_ts=None):
+        """(requête, paramètres) d'une page de repas ; partagée avec HOT_QUERIES"""
+        query = f"""
+            SELECT {cls.COLUMNS}
+            FROM meals m
+            JOIN foods f ON m.food_id = f.id
+            WHERE m.user_id = ?
+        """
+        params = [user_id]
+        if start_ts is not None:
+            query += " AND m.meal_ts >= ?"
+            params.append(start_ts)
+        if end_ts is not None:
+            query += " AND m.meal_ts <= ?"
+            params.append(end_ts)
+        if after is not None:
+            query += " AND (m.meal_ts, m.id) < (?, ?)"
+            params.extend(after)
+        query += " ORDER BY m.meal_ts DESC, m.id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return query, params
+    
+    def get_user_meals_page(self, user_id, after=None, limit=MAX_PAGE_SIZE, start_ts=None, end_ts=None):
+        """Repas du plus récent au plus ancien, après la clé (meal_ts, id) donnée"""
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = record_factory(Meal)
+            cursor.execute(*self.page_query(user_id, after, limit, start_ts, end_ts))
+            return cursor.fetchall()
+    
+    EVENTS_SQL = "SELECT food_id, meal_ts FROM meals WHERE user_id = ? AND meal_ts BETWEEN ? AND ? ORDER BY meal_ts"
+    
+    def get_meal_events(self, user_id, start_ts, end_ts):
+        """(food_id, meal_ts) des repas de la période, dans l'ordre chronologique (moteur de détection)"""
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.EVENTS_SQL, (user_id, start_ts, end_ts))
+            return cursor.fetchall()
+
+class SymptomDAO:
+    # Colonnes dans l'ordre des champs de Symptom
+    COLUMNS = "id, user_id, symptom_type, severity, occurrence_time, occurrence_ts, description"
+    
+    def __init__(self, db_dao):
+        self.db = db_dao
+    
+    def create_symptom(self, user_id, symptom_type, severity, occurrence_time, description=None):
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(
+                    "INSERT INTO symptoms (user_id, symptom_type, severity, occurrence_time, occurrence_ts, description) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (user_id, symptom_type, severity, occurrence_time, to_epoch_ms(occurrence_time), description)
+                )
+                conn.commit()
+                return cursor.lastrowid
+            except sqlite3.IntegrityError:
+                return None
+    
+    def create_symptoms_bulk(self, symptoms):
+        """Insérer un lot de symptômes validés (occurrence_ts calculé) en une transaction"""
+        return self.db.insert_many(
+            'symptoms',
+            ('user_id', 'symptom_type', 'severity', 'occurrence_time', 'occurrence_ts', 'description'),
+            symptoms,
+            references={'user_id': 'users'}
+        )
+    
+    def get_user_symptoms(self, user_id, start_ts=None, end_ts=None):
+        """Symptômes du plus récent au plus ancien, éventuellement bornés en ms epoch (bornes incluses)"""
+        return self.get_user_symptoms_page(user_id, start_ts=start_ts, end_ts=end_ts, limit=None)
+    
+    @classmethod
+    def page_query(cls, user_id, after=None, limit=MAX_PAGE_SIZE, start_ts=None, end_ts=None):
+        """(requête, paramètres) d'une page de symptômes ; partagée avec HOT_QUERIES"""
+        query = f"SELECT {cls.COLUMNS} FROM symptoms WHERE user_id = ?"
+        params = [user_id]
+        if start_ts is not None:
+            query += " AND occurrence_ts >= ?"
+            params.append(start_ts)
+        if end_ts is not None:
+            query += " AND occurrence_ts <= ?"
+            params.append(end_ts)
+        if after is not None:
+            query += " AND (occurrence_ts, id) < (?, ?)"
+            params.extend(after)
+        query += " ORDER BY occurrence_ts DESC, id DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return query, params
+    
+    def get_user_symptoms_page(self, user_id, after=None, limit=MAX_PAGE_SIZE, start_ts=None, end_ts=None):
+        """Symptômes du plus récent au plus ancien, après la clé (occurrence_ts, id) donnée"""
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = record_factory(Symptom)
+            cursor.execute(*self.page_query(user_id, after, limit, start_ts, end_ts))
+            return cursor.fetchall()
+    
+    TIMES_SQL = (
+        "SELECT occurrence_ts FROM symptoms WHERE user_id = ? AND occurrence_ts BETWEEN ? AND ? "
+        "ORDER BY occurrence_ts"
+    )
+    
+    def get_symptom_times(self, user_id, start_ts, end_ts):
+        """occurrence_ts des symptômes de la période, triés (index couvrant)"""
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.TIMES_SQL, (user_id, start_ts, end_ts))
+            return [row[0] for row in cursor.fetchall()]
+
+class RiskStoreDAO:
+    """Lecture et maintenance du store matérialisé user_food_risk
+    
+    Les triggers sur meals et symptoms tiennent à jour, pour chaque repas,
+    l'indicateur "suivi d'un symptôme dans les 2h-48h" et les compteurs par
+    (utilisateur, aliment). La lecture n'écrit jamais : les repas sortis de la
+    fenêtre glissante sont déduits des compteurs à la volée, puis retirés
+    pour de bon par maintain(), lancée périodiquement. Comme le moteur, le
+    store ignore les repas et symptômes datés dans le futur ; maintain()
+    recalcule l'utilisateur quand ils arrivent à échéance.
+    """
+    
+    WINDOW_DAYS = 30
+    
+    STALE_CHECK_SQL = "SELECT 1 FROM meal_risk_state WHERE meal_ts < ? AND expired = 0 LIMIT 1"
+    
+    EXPIRE_COUNTS_SQL = '''
+        UPDATE user_food_risk SET
+            consumption_count = consumption_count - stale.meals,
+            hit_count = hit_count - stale.hits,
+            updated_at = CURRENT_TIMESTAMP
+        FROM (SELECT user_id, food_id, COUNT(*) AS meals, SUM(hit) AS hits
+              FROM meal_risk_state WHERE meal_ts < ? AND expired = 0
+              GROUP BY user_id, food_id) AS stale
+        WHERE user_food_risk.user_id = stale.user_id AND user_food_risk.food_id = stale.food_id
+    '''
+    
+    EXPIRE_MEALS_SQL = "UPDATE meal_risk_state SET expired = 1 WHERE meal_ts < ? AND expired = 0"
+    
+    DUE_USERS_SQL = "SELECT user_id FROM risk_store_pending WHERE due_ts <= ?"
+    
+    SCORES_SQL = '''
+        SELECT r.food_id,
+               r.consumption_count - COALESCE(stale.meals, 0),
+               r.hit_count - COALESCE(stale.hits, 0)
+        FROM user_food_risk r
+        LEFT JOIN (SELECT food_id, COUNT(*) AS meals, SUM(hit) AS hits
+                   FROM meal_risk_state WHERE user_id = ? AND meal_ts < ? AND expired = 0
+                   GROUP BY food_id) AS stale ON stale.food_id = r.food_id
+        WHERE r.user_id = ?
+    '''
+    
+    def __init__(self, db_dao, catalog_cache, maintenance_interval=60):
+        self.db = db_dao
+        self.catalog = catalog_cache
+        self.maintenance_interval = maintenance_interval
+        self._maintenance_pid = None
+        self._stop = threading.Event()
+    
+    def expire(self):
+        """Retirer des compteurs les repas antérieurs à la fenêtre glissante ; retourne leur nombre"""
+        cutoff = epoch_ms_now() - self.WINDOW_DAYS * MS_PER_DAY
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.STALE_CHECK_SQL, (cutoff,))
+            if cursor.fetchone() is None:
+                return 0
+            
+            conn.execute("BEGIN IMMEDIATE")
+            cursor.execute(self.EXPIRE_COUNTS_SQL, (cutoff,))
+            cursor.execute(self.EXPIRE_MEALS_SQL, (cutoff,))
+            return cursor.rowcount
+    
+    def maintain(self):
+        """Expirer les repas trop anciens et recalculer les utilisateurs dont un repas ou symptôme futur est échu"""
+        expired = self.expire()
+        with self.db.get_connection() as conn:
+            user_ids = {row[0] for row in conn.execute(self.DUE_USERS_SQL, (epoch_ms_now(),))}
+        for user_id in user_ids:
+            self.rebuild(user_id)
+        return expired, len(user_ids)
+    
+    def start_maintenance(self):
+        """Démarrer la maintenance périodique (une fois par processus)"""
+        if self.maintenance_interval <= 0 or self._maintenance_pid == os.getpid():
+            return
+        self._maintenance_pid = os.getpid()
+        self._stop.clear()
+        threading.Thread(target=self._maintenance_loop, name='risk-store-maintenance', daemon=True).start()
+    
+    def stop_maintenance(self):
+        self._stop.set()
+    
+    def _maintenance_loop(self):
+        while not self._stop.wait(self.maintenance_interval):
+            try:
+                self.maintain()
+            except sqlite3.Error as e:
+                print(f"Erreur lors de la maintenance du store de risque: {e}")
+    
+    def get_scores(self, user_id):
+        """Scores de risque {food_id: score} sur la fenêtre glissante, sans écriture"""
+        cutoff = epoch_ms_now() - self.WINDOW_DAYS * MS_PER_DAY
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.SCORES_SQL, (user_id, cutoff, user_id))
+            return {
+                food_id: round((hits / count) * 100, 2)
+                for food_id, count, hits in cursor.fetchall()
+                if count > 0
+            }
+    
+    def detect_potential_allergies(self, user_id, threshold=30):
+        """Même résultat que AllergyDetectionEngine.detect_potential_allergies, lu dans le store"""
+        _, foods = self.catalog.get_all()
+        scores = self.get_scores(user_id)
+        potential_allergies = []
+        
+        for food in foods:
+            score = scores.get(food[0], 0)
+            if score >= threshold:
+                potential_allergies.append({
+                    'food_id': food[0],
+                    'food_name': food[1],
+                    'risk_score': score,
+                    'recommendation': 'Éviter cet aliment et consulter un médecin'
+                })
+        
+        return sorted(potential_allergies, key=lambda x: x['risk_score'], reverse=True)
+    
+    def rebuild(self, user_id=None):
+        """Recalculer le store depuis les repas et symptômes bruts"""
+        where = 'AND user_id = ?' if user_id is not None else ''
+        params = (user_id,) if user_id is not None else ()
+        with self.db.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.cursor()
+            cursor.execute(f"DELETE FROM user_food_risk WHERE 1 = 1 {where}", params)
+            cursor.execute(f"DELETE FROM meal_risk_state WHERE 1 = 1 {where}", params)
+            cursor.execute(f"DELETE FROM risk_store_pending WHERE 1 = 1 {where}", params)
+            for query in risk_store_fill_sql(where) + risk_store_pending_sql(where):
+                cursor.execute(query, params)
+
+class AnalysisCache:
+    """Cache LRU/TTL des analyses d'allergies
+    
+    La clé inclut la version des données de l'utilisateur et celle du
+    catalogue, tenues par des triggers : toute écriture (repas, symptôme,
+    aliment), même hors de l'API, produit une nouvelle clé, de même que la
+    suppression de l'utilisateur (version NULL). Les anciennes entrées
+    sortent par LRU. Le TTL couvre l'expiration de la fenêtre glissante, qui
+    ne dépend que du temps.
+    """
+    
+    def __init__(self, db_dao, max_entries=1024, ttl=60):
+        self.db = db_dao
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def data_version(self, user_id):
+        """(version des données utilisateur, version du catalogue) en une requête"""
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT (SELECT data_version FROM users WHERE id = ?), "
+                "(SELECT version FROM catalog_state WHERE id = 1)",
+                (user_id,)
+            )
+            return cursor.fetchone()
+    
+    def get_or_compute(self, user_id, threshold, days_back, compute):
+        """Résultat mémorisé (partagé entre appelants : ne pas le modifier)"""
+        key = (user_id, threshold, days_back, self.data_version(user_id))
+        now = time.monotonic()
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        
+        value = compute()
+        
+        with self._lock:
+            self._entries[key] = (now + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+    
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else None
+            }
+
+class ImageManager:
+    """Dépôt des images d'aliments : fichiers du store et lignes de food_images
+    
+    Les listes d'images par aliment sont gardées en mémoire pour une version
+    du catalogue (catalog_state, incrémentée par les triggers de food_images) :
+    toutes sont chargées en une requête lorsque la version change.
+    """
+    
+    def __init__(self, media_folder='media', db_dao=None, catalog_cache=None):
+        self.media_folder = media_folder
+        self.db = db_dao
+        self.catalog_cache = catalog_cache
+        self.allowed_extensions = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+        self._lock = threading.Lock()
+        self._images_version = None
+        self._images_by_food = {}
+        
+    def download_and_save_image(self, image_url, food_id, food_name, is_primary=False):
+        """Télécharger une image depuis une URL et la sauvegarder dans le store par contenu
+        
+        Avec un food_id, l'image est validée, ses variantes générées et elle
+        est enregistrée dans food_images (image_id dans le résultat).
+        """
+        try:
+            # Télécharger l'image
+            headers = {
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+            }
+            started = time.perf_counter()
+            try:
+                response = requests.get(image_url, headers=headers, timeout=30)
+                response.raise_for_status()
+            except requests.RequestException:
+                image_download_duration.observe(time.perf_counter() - started, 'job', 'failed')
+                raise
+            image_download_duration.observe(time.perf_counter() - started, 'job', 'ok')
+            
+            # Déterminer l'extension du fichier
+            content_type = response.headers.get('content-type', '')
+            if 'image' not in content_type:
+                return {'success': False, 'error': 'URL ne pointe pas vers une image'}
+            
+            # Sauvegarder l'image (une seule copie pour un contenu donné)
+            file_path, content_hash = self.store_bytes(
+                response.content, self.extension_for(image_url, content_type)
+            )
+            result = {
+                'success': True,
+                'file_path': file_path,
+                'filename': os.path.basename(file_path),
+                'content_hash': content_hash,
+                'file_size': len(response.content),
+                'content_type': content_type
+            }
+            
+            if food_id is not None:
+                if not self.validate_image(file_path):
+                    self.discard_unreferenced(file_path, content_hash)
+                    return {'success': False, 'error': 'Fichier image invalide'}
+                result['image_id'] = self.register_image(
+                    food_id, file_path, image_url, is_primary, len(response.content),
+                    self.generate_variants(file_path), content_hash=content_hash
+                )
+                result['image_url'] = media_url(file_path)
+            
+            return result
+            
+        except requests.RequestException as e:
+            return {'success': False, 'error': f'Erreur de téléchargement: {str(e)}', 'retryable': True}
+        except Exception as e:
+            return {'success': False, 'error': f'Erreur: {str(e)}'}
+    
+    @staticmethod
+    def extension_for(image_url, content_type=''):
+        """Extension depuis l'URL, sinon depuis le content-type"""
+        file_extension = os.path.splitext(urlparse(image_url).path)[1].lower()
+        if file_extension == '.jpeg':
+            file_extension = '.jpg'
+        if file_extension.lstrip('.') in {'png', 'jpg', 'gif', 'webp'}:
+            return file_extension
+        
+        extension_map = {
+            'image/jpeg': '.jpg',
+            'image/png': '.png',
+            'image/gif': '.gif',
+            'image/webp': '.webp'
+        }
+        return extension_map.get(content_type.split(';')[0].strip(), '.jpg')
+    
+    def content_path(self, content_hash, extension):
+        """Chemin dans le store : media/ab/cd/<sha256><extension>"""
+        return os.path.join(self.media_folder, content_hash[:2], content_hash[2:4], content_hash + extension)
+    
+    def store_bytes(self, content, extension):
+        """Écrire un contenu dans le store s'il n'y est pas déjà ; retourne (chemin, sha256)
+        
+        L'extension est déduite du contenu quand Pillow le reconnaît, pour
+        qu'un même contenu ait toujours le même chemin.
+        """
+        content_hash = hashlib.sha256(content).hexdigest()
+        file_path = self.content_path(content_hash, self.sniff_extension(content, extension))
+        
+        if not os.path.exists(file_path):
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            # Écriture atomique : un lecteur ne voit jamais un fichier partiel
+            temp_path = f"{file_path}.{uuid.uuid4().hex}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(content)
+            os.replace(temp_path, file_path)
+        
+        return file_path, content_hash
+    
+    @staticmethod
+    def sniff_extension(content, default):
+        try:
+            with Image.open(io.BytesIO(content)) as img:
+                image_format = img.format
+        except Exception:
+            return default
+        return {'JPEG': '.jpg', 'PNG': '.png', 'GIF': '.gif', 'WEBP': '.webp'}.get(image_format, default)
+    
+    def adopt_file(self, path):
+        """Copier un fichier existant dans le store ; retourne (chemin, sha256)
+        
+        L'original n'est pas supprimé : l'appelant le fait une fois les lignes
+        qui y font référence mises à jour et validées.
+        """
+        with open(path, 'rb') as f:
+            content = f.read()
+        return self.store_bytes(content, self.extension_for(path))
+    
+    @staticmethod
+    def copy_file(source, target):
+        """Copier un fichier de façon atomique (fichier temporaire puis renommage)"""
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temp_path = f"{target}.{uuid.uuid4().hex}.tmp"
+        shutil.copyfile(source, temp_path)
+        os.replace(temp_path, target)
+    
+    REFERENCED_SQL = "SELECT 1 FROM food_images WHERE content_hash = ? LIMIT 1"
+    
+    def discard_unreferenced(self, file_path, content_hash):
+        """Supprimer un fichier du store s'il n'est référencé par aucune image"""
+        with self.db.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.cursor()
+            cursor.execute(self.REFERENCED_SQL, (content_hash,))
+            if cursor.fetchone() is None and os.path.exists(file_path):
+                os.remove(file_path)
+    
+    def reclaim_orphans(self):
+        """Supprimer les fichiers dont la dernière référence a disparu
+        
+        Les triggers de food_images alimentent media_orphans ; la vérification
+        et la suppression se font sous verrou d'écriture pour ne pas effacer
+        un fichier réenregistré entre-temps.
+        """
+        removed = 0
+        with self.db.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT o.content_hash, o.file_path FROM media_orphans o
+                WHERE NOT EXISTS (SELECT 1 FROM food_images fi WHERE fi.content_hash = o.content_hash)
+            ''')
+            orphans = cursor.fetchall()
+            
+            for content_hash, file_path in orphans:
+                paths = [file_path] + [
+                    self.variant_path(file_path, size, image_format)
+                    for size in self.VARIANT_SIZES for image_format in self.VARIANT_FORMATS
+                ]
+                for path in paths:
+                    try:
+                        os.remove(path)
+                        removed += 1
+                    except FileNotFoundError:
+                        pass
+                
+                # Répertoires de shard devenus vides
+                shard = os.path.dirname(file_path)
+                for directory in (shard, os.path.dirname(shard)):
+                    if os.path.abspath(directory) == os.path.abspath(self.media_folder):
+                        break
+                    try:
+                        os.rmdir(directory)
+                    except OSError:
+                        break
+            
+            cursor.execute("DELETE FROM media_orphans")
+        return removed
+    
+    # Variantes redimensionnées : nom -> plus grand côté en pixels
+    VARIANT_SIZES = {'thumb': 200, 'medium': 600, 'large': 1200}
+    VARIANT_FORMATS = {'webp': ('WEBP', '.webp'), 'jpeg': ('JPEG', '.jpg')}
+    VARIANT_QUALITY = 80
+    
+    @staticmethod
+    def variant_path(file_path, size, image_format):
+        """Chemin d'une variante, à côté de l'original : <nom>_<taille><extension>"""
+        stem = os.path.splitext(file_path)[0]
+        return f"{stem}_{size}{ImageManager.VARIANT_FORMATS[image_format][1]}"
+    
+    def generate_variants(self, file_path):
+        """Générer les variantes thumb/medium/large en WebP et JPEG
+        
+        Les images ne sont jamais agrandies : une taille supérieure à
+        l'original n'est pas générée et /api/media sert alors l'original.
+        Retourne une liste de dictionnaires (size, format, file_path, width,
+        height, file_size). Les variantes déjà présentes (même contenu) sont
+        réutilisées.
+        """
+        existing = self.existing_variants(file_path)
+        if existing is not None:
+            return existing
+        
+        variants = []
+        with Image.open(file_path) as original:
+            original = ImageOps.exif_transpose(original)
+            has_alpha = original.mode in ('RGBA', 'LA') or 'transparency' in original.info
+            base = original.convert('RGBA' if has_alpha else 'RGB')
+        
+        for size, max_side in self.VARIANT_SIZES.items():
+            if max(base.size) <= max_side and size != 'thumb':
+                continue
+            resized = base.copy()
+            resized.thumbnail((max_side, max_side), Image.LANCZOS)
+            
+            for image_format, (pil_format, _) in self.VARIANT_FORMATS.items():
+                output = resized
+                if pil_format == 'JPEG' and resized.mode == 'RGBA':
+                    # Pas de transparence en JPEG : fond blanc
+                    output = Image.new('RGB', resized.size, (255, 255, 255))
+                    output.paste(resized, mask=resized.getchannel('A'))
+                
+                path = self.variant_path(file_path, size, image_format)
+                temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+                output.save(temp_path, pil_format, quality=self.VARIANT_QUALITY, optimize=True)
+                os.replace(temp_path, path)
+                variants.append({
+                    'size': size,
+                    'format': image_format,
+                    'file_path': path,
+                    'width': output.width,
+                    'height': output.height,
+                    'file_size': os.path.getsize(path)
+                })
+        
+        return variants
+    
+    def existing_variants(self, file_path):
+        """Variantes déjà générées pour ce fichier, ou None s'il en manque"""
+        thumb_path = self.variant_path(file_path, 'thumb', 'webp')
+        if not os.path.exists(thumb_path):
+            return None
+        
+        variants = []
+        for size in self.VARIANT_SIZES:
+            paths = {image_format: self.variant_path(file_path, size, image_format)
+                     for image_format in self.VARIANT_FORMATS}
+            present = [os.path.exists(path) for path in paths.values()]
+            if not any(present):
+                continue
+            if not all(present):
+                return None
+            for image_format, path in paths.items():
+                with Image.open(path) as img:
+                    width, height = img.size
+                variants.append({
+                    'size': size,
+                    'format': image_format,
+                    'file_path': path,
+                    'width': width,
+                    'height': height,
+                    'file_size': os.path.getsize(path)
+                })
+        return variants
+    
+    def validate_image(self, file_path):
+        """Vérifier avec Pillow que le fichier est une image lisible"""
+        try:
+            with Image.open(file_path) as img:
+                img.verify()
+            return True
+        except Exception:
+            return False
+    
+    CLEAR_PRIMARY_SQL = "UPDATE food_images SET is_primary = 0 WHERE food_id = ? AND is_primary = 1"
+    
+    # La première image d'un aliment devient principale
+    INSERT_IMAGE_SQL = '''
+        INSERT INTO food_images (food_id, file_path, original_url, is_primary, file_size, content_hash)
+        VALUES (?, ?, ?, ? OR NOT EXISTS (SELECT 1 FROM food_images WHERE food_id = ? AND is_primary = 1),
+                ?, ?)
+    '''
+    
+    def register_image(self, food_id, file_path, original_url, is_primary=False, file_size=0, variants=(),
+                       content_hash=None):
+        """Enregistrer une image et ses variantes dans food_images ; retourne son id"""
+        with self.db.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            # Sous verrou d'écriture : reclaim_orphans ne peut plus supprimer ce fichier
+            if not os.path.exists(file_path):
+                raise FileNotFoundError(f"Fichier image disparu avant l'enregistrement: {file_path}")
+            cursor = conn.cursor()
+            if is_primary:
+                cursor.execute(self.CLEAR_PRIMARY_SQL, (food_id,))
+            cursor.execute(
+                self.INSERT_IMAGE_SQL,
+                (food_id, file_path, original_url, bool(is_primary), food_id, file_size, content_hash)
+            )
+            image_id = cursor.lastrowid
+            self.record_variants(cursor, image_id, variants)
+            return image_id
+    
+    @staticmethod
+    def record_variants(cursor, image_id, variants):
+        cursor.executemany('''
+            INSERT OR REPLACE INTO food_image_variants
+                (image_id, size, format, file_path, width, height, file_size)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (image_id, v['size'], v['format'], v['file_path'], v['width'], v['height'], v['file_size'])
+            for v in variants
+        ])
+    
+    def _images_for_version(self, version):
+        """Listes d'images de tous les aliments pour une version du catalogue"""
+        with self._lock:
+            if version is not None and version == self._images_version:
+                return self._images_by_food
+        
+        with self.db.get_connection() as conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN")
+            cursor = conn.cursor()
+            cursor.execute("SELECT version FROM catalog_state WHERE id = 1")
+            loaded_version = cursor.fetchone()[0]
+            cursor.execute('''
+                SELECT id, food_id, file_path, original_url, is_primary, file_size, created_at
+                FROM food_images
+                ORDER BY food_id, is_primary DESC, created_at DESC, id DESC
+            ''')
+            rows = cursor.fetchall()
+        
+        images_by_food = defaultdict(list)
+        for image_id, food_id, file_path, original_url, is_primary, file_size, created_at in rows:
+            image_url = media_url(file_path)
+            images_by_food[food_id].append({
+                'id': image_id,
+                'file_path': file_path,
+                'image_url': image_url,
+                'original_url': original_url,
+                'is_primary': bool(is_primary),
+                'file_size': file_size,
+                'created_at': created_at,
+                'variants': {
+                    size: f"{image_url}?size={size}" for size in self.VARIANT_SIZES
+                } if image_url else {}
+            })
+        images_by_food = dict(images_by_food)
+        
+        with self._lock:
+            self._images_version, self._images_by_food = loaded_version, images_by_food
+        return images_by_food
+    
+    def get_food_images(self, food_id, version=None):
+        """Images d'un aliment, principale en tête (liste partagée : ne pas la modifier)
+        
+        version : version du catalogue déjà connue de l'appelant, ce qui évite
+        toute requête tant qu'elle ne change pas.
+        """
+        if version is None:
+            version = self.catalog_cache.current_version()
+        return self._images_for_version(version).get(food_id, [])
+    
+    SET_PRIMARY_SQL = '''
+        UPDATE food_images SET is_primary = (id = ?)
+        WHERE food_id = (SELECT food_id FROM food_images WHERE id = ?)
+          AND (is_primary = 1 OR id = ?)
+    '''
+    
+    def set_primary_image(self, image_id):
+        """Définir l'image principale de son aliment en un seul UPDATE indexé"""
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.SET_PRIMARY_SQL, (image_id, image_id, image_id))
+            return cursor.rowcount > 0
+    
+    def delete_image(self, image_id):
+        """Supprimer une image : ligne et fichier
+        
+        La ligne est supprimée (et une autre image promue principale si besoin)
+        dans une transaction ; le fichier n'est effacé qu'après validation, et
+        seulement si plus aucune image ne le référence.
+        """
+        with self.db.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.cursor()
+            cursor.execute("SELECT food_id, is_primary FROM food_images WHERE id = ?", (image_id,))
+            image = cursor.fetchone()
+            if not image:
+                return False
+            
+            cursor.execute("DELETE FROM food_images WHERE id = ?", (image_id,))
+            if image[1]:
+                cursor.execute('''
+                    UPDATE food_images SET is_primary = 1
+                    WHERE id = (SELECT id FROM food_images WHERE food_id = ?
+                                ORDER BY created_at DESC, id DESC LIMIT 1)
+                ''', (image[0],))
+        
+        self.reclaim_orphans()
+        return True
+
+class FoodCatalogCache:
+    """Cache en mémoire du catalogue d'aliments
+    
+    Le catalogue est rechargé lorsque la version stockée dans catalog_state
+    change. Les triggers incrémentent cette version à chaque écriture sur
+    foods ou food_images, ce qui garde les caches des différents processus
+    cohérents.
+    """
+    
+    def __init__(self, db_dao, food_dao):
+        self.db = db_dao
+        self.food_dao = food_dao
+        self._lock = threading.Lock()
+        self._version = None
+        self._foods = []
+        self._by_id = {}
+        self._ids = []
+        self.hits = 0
+        self.misses = 0
+    
+    def current_version(self):
+        with self.db.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT version FROM catalog_state WHERE id = 1")
+            return cursor.fetchone()[0]
+    
+    def _refresh(self):
+        version = self.current_version()
+        with self._lock:
+            if version == self._version:
+                self.hits += 1
+                return version, self._foods, self._by_id, self._ids
+        
+        # Version et contenu lus dans la même transaction (même instantané)
+        with self.db.get_connection() as conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN")
+            version = self.current_version()
+            foods = self.food_dao.get_catalog()
+        
+        # Identifiants triés (catalogue ordonné par id), construits une fois par version pour get_page
+        by_id = {food[0]: food for food in foods}
+        ids = [food[0] for food in foods]
+        with self._lock:
+            self.misses += 1
+            self._version, self._foods, self._by_id, self._ids = version, foods, by_id, ids
+        return version, foods, by_id, ids
+    
+    def get_all(self):
+        """(version, aliments) - chaque ligne : id, name, category, ingredients, image_path, is_base_food, primary_image"""
+        version, foods, _, _ = self._refresh()
+        return version, foods
+    
+    def get_food(self, food_id):
+        version, _, by_id, _ = self._refresh()
+        return version, by_id.get(food_id)
+    
+    def get_page(self, category=None, after_id=None, limit=None):
+        """Équivalent en mémoire de FoodDAO.get_catalog"""
+        version, foods, _, ids = self._refresh()
+        if after_id is not None:
+            foods = foods[bisect.bisect_right(ids, after_id):]
+        if category:
+            foods = [food for food in foods if food[2] == category]
+        if limit is not None:
+            foods = foods[:limit]
+        return version, foods
+    
+    def stats(self):
+        with self._lock:
+            return {
+                'version': self._version,
+                'foods': len(self._foods),
+                'hits': self.hits,
+                'misses': self.misses
+            }
 
-class FoodDAO:
-    def __init__(self, db_dao):
+class ImageJobQueue:
+    """File persistante (table image_jobs) des téléchargements d'images
+    
+    Les routes enregistrent un job et répondent immédiatement ; un pool de
+    threads télécharge, valide et enregistre l'image dans food_images. Un job
+    est réclamé par une seule requête UPDATE ... RETURNING, ce qui reste sûr
+    entre plusieurs processus. Un job dont le bail a expiré (processus arrêté
+    en plein téléchargement) est repris par un autre worker.
+    """
+    
+    MAX_ATTEMPTS = 3
+    RETRY_DELAY = 30
+    LEASE_SECONDS = 300
+    
+    def __init__(self, db_dao, image_manager, catalog_cache, workers=2, poll_interval=2.0):
         self.db = db_dao
+        self.image_manager = image_manager
+        self.catalog_cache = catalog_cache
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
     
-    def create_food(self, name, category, ingredients, image_path=None, is_base_food=False):
+    def start(self):
+        """Démarrer les workers (une seule fois par processus)"""
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads or self.workers <= 0:
+                return
+            self._stop.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'image-job-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+    
+    def stop(self, timeout=None):
+        with self._lock:
+            threads, self._threads = self._threads, []
+        self._stop.set()
+        self._wakeup.set()
+        for thread in threads:
+            thread.join(timeout)
+    
+    def enqueue(self, food_id, image_url, is_primary=False):
+        """Enregistrer un téléchargement ; retourne l'id du job"""
         with self.db.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                "INSERT INTO foods (name, category, ingredients, image_path, is_base_food) VALUES (?, ?, ?, ?, ?)",
-                (name, category, ingredients, image_path, is_base_food)
+                "INSERT INTO image_jobs (food_id, image_url, is_primary) VALUES (?, ?, ?)",
+                (food_id, image_url, bool(is_primary))
             )
-            conn.commit()
-            return cursor.lastrowid
+            job_id = cursor.lastrowid
+        self.start()
+        self._wakeup.set()
+        return job_id
     
-    def get_food(self, food_id):
+    def get_job(self, job_id):
         with self.db.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM foods WHERE id = ?", (food_id,))
+            cursor.execute('''
+                SELECT j.id, j.food_id, j.image_url, j.is_primary, j.status, j.attempts, j.error,
+                       j.image_id, fi.file_path, j.created_at, j.updated_at
+                FROM image_jobs j
+                LEFT JOIN food_images fi ON fi.id = j.image_id
+                WHERE j.id = ?
+            ''', (job_id,))
             return cursor.fetchone()
     
-    def get_all_foods(self):
+    def claim(self):
+        """Réclamer le prochain job disponible ; None si la file est vide"""
+        now = time.time()
         with self.db.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM foods")
-            return cursor.fetchall()
+            cursor.execute('''
+                UPDATE image_jobs
+                SET status = 'running', attempts = attempts + 1,
+                    lease_expires_at = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE id = (
+                    SELECT id FROM image_jobs
+                    WHERE (status = 'pending' AND available_at <= ?)
+                       OR (status = 'running' AND lease_expires_at < ?)
+                    ORDER BY id LIMIT 1
+                )
+                RETURNING id, food_id, image_url, is_primary, attempts
+            ''', (now + self.LEASE_SECONDS, now, now))
+            rows = cursor.fetchall()
+            return rows[0] if rows else None
+    
+    def process(self, job):
+        """Télécharger, valider et enregistrer l'image d'un job"""
+        job_id, food_id, image_url, is_primary, attempts = job
+        
+        _, food = self.catalog_cache.get_food(food_id)
+        if not food:
+            self._finish(job_id, 'failed', error='Aliment non trouvé')
+            return
+        
+        result = self.image_manager.download_and_save_image(
+            image_url=image_url,
+            food_id=food_id,
+            food_name=food[1],
+            is_primary=bool(is_primary)
+        )
+        
+        if not result['success']:
+            # Seules les erreurs réseau sont retentées ; un contenu invalide le restera
+            if result.get('retryable') and attempts < self.MAX_ATTEMPTS:
+                self._retry(job_id, result['error'], self.RETRY_DELAY * attempts)
+            else:
+                self._finish(job_id, 'failed', error=result['error'])
+            return
+        
+        self._finish(job_id, 'done', image_id=result['image_id'])
     
-    def search_foods(self, query):
+    def _finish(self, job_id, status, error=None, image_id=None):
         with self.db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "SELECT * FROM foods WHERE name LIKE ? OR category LIKE ? OR ingredients LIKE ?",
-                (f"%{query}%", f"%{query}%", f"%{query}%")
+            conn.execute(
+                "UPDATE image_jobs SET status = ?, error = ?, image_id = ?, lease_expires_at = NULL, "
+                "updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (status, error, image_id, job_id)
             )
-            return cursor.fetchall()
-
-class MealDAO:
-    def __init__(self, db_dao):
-        self.db = db_dao
     
-    def create_meal(self, user_id, food_id, meal_time, quantity, notes=None):
+    def _retry(self, job_id, error, delay):
         with self.db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO meals (user_id, food_id, meal_time, quantity, notes) VALUES (?, ?, ?, ?, ?)",
-                (user_id, food_id, meal_time, quantity, notes)
+            conn.execute(
+                "UPDATE image_jobs SET status = 'pending', error = ?, available_at = ?, "
+                "lease_expires_at = NULL, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (error, time.time() + delay, job_id)
             )
-            conn.commit()
-            return cursor.lastrowid
     
-    def get_user_meals(self, user_id, start_date=None, end_date=None):
-        with self.db.get_connection() as conn:
-            cursor = conn.cursor()
-            query = """
-                SELECT m.*, f.name as food_name, f.ingredients 
-                FROM meals m 
-                JOIN foods f ON m.food_id = f.id 
-                WHERE m.user_id = ?
-            """
-            params = [user_id]
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                job = self.claim()
+            except sqlite3.Error as e:
+                print(f"Erreur lors de la lecture de la file d'images: {e}")
+                job = None
             
-            if start_date:
-                query += " AND m.meal_time >= ?"
-                params.append(start_date)
-            if end_date:
-                query += " AND m.meal_time <= ?"
-                params.append(end_date)
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
             
-            query += " ORDER BY m.meal_time DESC"
-            cursor.execute(query, params)
-            return cursor.fetchall()
+            try:
+                self.process(job)
+            except Exception as e:
+                print(f"Erreur lors du traitement du job d'image {job[0]}: {e}")
+                self._finish(job[0], 'failed', error=str(e))
 
-class SymptomDAO:
-    def __init__(self, db_dao):
-        self.db = db_dao
+# Services du processus (base, DAO, caches), construits par init_services()
+db_dao = None
+user_dao = None
+food_dao = None
+meal_dao = None
+symptom_dao = None
+food_catalog_cache = None
+risk_store = None
+analysis_cache = None
+image_manager = None
+image_jobs = None
+
+def init_services(database_path=None):
+    """Ouvrir la base (migrations comprises) et construire les DAO, une fois par processus
     
-    def create_symptom(self, user_id, symptom_type, severity, occurrence_time, description=None):
-        with self.db.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO symptoms (user_id, symptom_type, severity, occurrence_time, description) VALUES (?, ?, ?, ?, ?)",
-                (user_id, symptom_type, severity, occurrence_time, description)
+    Les routes lisent ces services au niveau du module : un processus ne sert
+    qu'une base. Un second appel avec le même chemin réutilise les services
+    (pas de nouvelles migrations) ; avec un autre chemin, il lève RuntimeError
+    tant que close_services() n'a pas été appelée.
+    """
+    global db_dao, user_dao, food_dao, meal_dao, symptom_dao, food_catalog_cache
+    global risk_store, analysis_cache, image_manager, image_jobs
+    if db_dao is not None:
+        if database_path and os.path.abspath(database_path) != os.path.abspath(db_dao.db_name):
+            raise RuntimeError(
+                f"Services déjà initialisés sur {db_dao.db_name} : "
+                f"impossible d'ouvrir {database_path} dans le même processus"
             )
-            conn.commit()
-            return cursor.lastrowid
+        return
     
-    def get_user_symptoms(self, user_id, start_date=None, end_date=None):
-        with self.db.get_connection() as conn:
-            cursor = conn.cursor()
-            query = "SELECT * FROM symptoms WHERE user_id = ?"
-            params = [user_id]
-            
-            if start_date:
-                query += " AND occurrence_time >= ?"
-                params.append(start_date)
-            if end_date:
-                query += " AND occurrence_time <= ?"
-                params.append(end_date)
-            
-            query += " ORDER BY occurrence_time DESC"
-            cursor.execute(query, params)
-            return cursor.fetchall()
-class ImageManager:
-    def __init__(self, media_folder='media'):
-        self.media_folder = media_folder
-        self.allowed_extensions = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
-        
-    def download_and_save_image(self, image_url, food_id, food_name, is_primary=False):
-        """Télécharger une image depuis une URL et la sauvegarder localement"""
-        try:
-            # Créer le dossier media s'il n'existe pas
-            if not os.path.exists(self.media_folder):
-                os.makedirs(self.media_folder)
-            
-            # Télécharger l'image
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            }
-            response = requests.get(image_url, headers=headers, timeout=30)
-            response.raise_for_status()
-            
-            # Déterminer l'extension du fichier
-            content_type = response.headers.get('content-type', '')
-            if 'image' not in content_type:
-                return {'success': False, 'error': 'URL ne pointe pas vers une image'}
-            
-            # Récupérer l'extension depuis l'URL ou le content-type
-            parsed_url = urlparse(image_url)
-            file_extension = os.path.splitext(parsed_url.path)[1].lower()
-            
-            if not file_extension:
-                # Essayer de deviner depuis le content-type
-                extension_map = {
-                    'image/jpeg': '.jpg',
-                    'image/png': '.png',
-                    'image/gif': '.gif',
-                    'image/webp': '.webp'
-                }
-                file_extension = extension_map.get(content_type, '.jpg')
-            
-            # Créer un nom de fichier sécurisé
-            safe_name = secure_filename(food_name.replace(' ', '_'))
-            timestamp = str(int(time.time()))
-            filename = f"{safe_name}_{timestamp}{file_extension}"
-            file_path = os.path.join(self.media_folder, filename)
-            
-            # Sauvegarder l'image
-            with open(file_path, 'wb') as f:
-                f.write(response.content)
-            
-            return {
-                'success': True,
-                'file_path': file_path,
-                'filename': filename,
-                'file_size': len(response.content),
-                'content_type': content_type
-            }
-            
-        except requests.RequestException as e:
-            return {'success': False, 'error': f'Erreur de téléchargement: {str(e)}'}
-        except Exception as e:
-            return {'success': False, 'error': f'Erreur: {str(e)}'}
-# Initialisation des DAOs
-db_dao = DatabaseDAO()
-user_dao = UserDAO(db_dao)
-food_dao = FoodDAO(db_dao)
-meal_dao = MealDAO(db_dao)
-symptom_dao = SymptomDAO(db_dao)
+    db_dao = DatabaseDAO(database_path)
+    user_dao = UserDAO(db_dao)
+    food_dao = FoodDAO(db_dao)
+    meal_dao = MealDAO(db_dao)
+    symptom_dao = SymptomDAO(db_dao)
+    food_catalog_cache = FoodCatalogCache(db_dao, food_dao)
+    risk_store = RiskStoreDAO(
+        db_dao, food_catalog_cache,
+        maintenance_interval=float(os.environ.get('RISK_STORE_MAINTENANCE_INTERVAL', 60))
+    )
+    analysis_cache = AnalysisCache(
+        db_dao,
+        max_entries=int(os.environ.get('ANALYSIS_CACHE_SIZE', 1024)),
+        ttl=float(os.environ.get('ANALYSIS_CACHE_TTL', 60))
+    )
+    image_manager = ImageManager(MEDIA_FOLDER, db_dao, food_catalog_cache)
+    image_jobs = ImageJobQueue(
+        db_dao, image_manager, food_catalog_cache,
+        workers=int(os.environ.get('IMAGE_JOB_WORKERS', 2))
+    )
+    metrics.add_collector(collect_service_metrics)
+
+def close_services():
+    """Arrêter les threads, fermer la base et oublier les services (tests, changement de base)"""
+    global db_dao, user_dao, food_dao, meal_dao, symptom_dao, food_catalog_cache
+    global risk_store, analysis_cache, image_manager, image_jobs
+    if db_dao is None:
+        return
+    image_jobs.stop(timeout=5)
+    risk_store.stop_maintenance()
+    db_dao.pool.close_all()
+    db_dao = user_dao = food_dao = meal_dao = symptom_dao = food_catalog_cache = None
+    risk_store = analysis_cache = image_manager = image_jobs = None
+
+pool_connections = metrics.gauge('db_pool_connections', 'Connexions SQLite du pool', ('state',))
+pool_events = metrics.counter('db_pool_events_total', 'Événements du pool de connexions', ('event',))
+pool_wait = metrics.counter('db_pool_wait_seconds_total', "Attente cumulée d'une connexion libre")
+cache_entries = metrics.gauge('cache_entries', 'Entrées en cache', ('cache',))
+cache_lookups = metrics.counter('cache_lookups_total', 'Lectures des caches', ('cache', 'result'))
+cache_evictions = metrics.counter('cache_evictions_total', 'Entrées évincées', ('cache',))
+
+def collect_service_metrics():
+    """Recopier les statistiques du pool et des caches dans le registre"""
+    pool = db_dao.pool.stats()
+    pool_connections.set(pool['in_use'], 'in_use')
+    pool_connections.set(pool['idle'], 'idle')
+    for event in ('checkouts', 'thread_reuses', 'waits', 'timeouts'):
+        pool_events.set(pool[event], event)
+    pool_wait.set(pool['total_wait_ms'] / 1000)
+    
+    catalog = food_catalog_cache.stats()
+    cache_entries.set(catalog['foods'], 'food_catalog')
+    cache_lookups.set(catalog['hits'], 'food_catalog', 'hit')
+    cache_lookups.set(catalog['misses'], 'food_catalog', 'miss')
+    
+    analysis = analysis_cache.stats()
+    cache_entries.set(analysis['entries'], 'analysis')
+    cache_lookups.set(analysis['hits'], 'analysis', 'hit')
+    cache_lookups.set(analysis['misses'], 'analysis', 'miss')
+    cache_evictions.set(analysis['evictions'], 'analysis')
+
+def create_app(config=None):
+    """Fabrique de l'application Flask
+    
+    Rien n'est ouvert à l'import du module : la base et les DAO sont créés
+    ici. Avec gunicorn --preload, le maître appelle create_app() une seule
+    fois et les workers héritent des services au fork (voir
+    init_worker_process).
+    """
+    app = Flask(__name__)
+    app.config.update(
+        DATABASE_PATH=os.environ.get('DATABASE_PATH', 'allergy_detection.db'),
+        USE_X_SENDFILE=MEDIA_X_SENDFILE,
+    )
+    if config:
+        app.config.update(config)
+    
+    init_services(app.config['DATABASE_PATH'])
+    app.register_blueprint(api)
+    return app
+
+def init_worker_process():
+    """Préparer un worker gunicorn juste après le fork
+    
+    Le maître a fermé ses connexions avant le fork (release_master_resources) :
+    le worker ouvre les siennes à la demande. Les threads ne survivant pas au
+    fork, la file de jobs d'images, la maintenance du store de risque et
+    l'écriture des métriques sont démarrées ici, dans le worker.
+    """
+    db_dao.pool.close_all()
+    image_jobs.start()
+    risk_store.start_maintenance()
+    metrics.reset()
+    metrics.start_flusher()
+
+def release_master_resources():
+    """Fermer les connexions SQLite du maître avant de forker les workers"""
+    db_dao.pool.close_all()
 
 # Données de base des nourritures camerounaises
 CAMEROON_FOODS_DATA = [
@@ -484,81 +3230,227 @@ CAMEROON_FOODS_DATA = [
     }
 ]
 
-def download_images_for_food(food_name, image_urls):
-    """Télécharge les images pour un aliment donné"""
-    downloaded_paths = []
+class ImageDownloader:
+    """Téléchargement concurrent d'images
+    
+    Pool de threads borné, session HTTP partagée (connexions keep-alive),
+    limite de requêtes simultanées par hôte, nouvelles tentatives avec
+    attente exponentielle et échéance globale pour l'ensemble du lot. Un
+    en-tête Retry-After (429, 503) allonge l'attente avant la tentative
+    suivante ; s'il dépasse l'échéance, l'URL est abandonnée.
+    """
+    
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+    
+    def __init__(self, max_workers=8, per_host=4, timeout=10, retries=3, backoff=0.5, session=None):
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.session = session or self._create_session()
+        self._host_slots = {}
+        self._lock = threading.Lock()
+    
+    def _create_session(self):
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=self.max_workers)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers['User-Agent'] = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+        return session
+    
+    def _host_slot(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_slots[host]
+    
+    @staticmethod
+    def retry_after(response):
+        """Attente demandée par Retry-After (secondes ou date HTTP), 0 si absente ou illisible"""
+        value = response.headers.get('Retry-After')
+        if not value:
+            return 0
+        if value.strip().isdigit():
+            return int(value)
+        try:
+            moment = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return 0
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return max(0, (moment - datetime.now(timezone.utc)).total_seconds())
     
-    for i, url in enumerate(image_urls):
+    def fetch(self, url, deadline_at):
+        """Télécharger une URL ; retourne (outcome, contenu ou None)"""
+        started = time.monotonic()
+        outcome = {'url': url, 'status': 'failed', 'attempts': 0, 'error': None}
+        content = None
+        
+        if not url:
+            outcome.update(status='skipped', error='URL vide', elapsed_ms=0.0)
+            return outcome, None
+        
+        slot = self._host_slot(url)
+        if not slot.acquire(timeout=max(0, deadline_at - time.monotonic())):
+            outcome.update(status='skipped', error='Échéance dépassée',
+                           elapsed_ms=round((time.monotonic() - started) * 1000, 1))
+            return outcome, None
+        
         try:
-            response = requests.get(url, timeout=10)
-            if response.status_code == 200:
-                # Créer un nom de fichier unique
-                file_extension = url.split('.')[-1] if '.' in url else 'jpg'
-                filename = f"{food_name.lower().replace(' ', '_')}_{i+1}.{file_extension}"
-                filepath = os.path.join(MEDIA_FOLDER, filename)
+            for attempt in range(1, self.retries + 1):
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    outcome.update(status='skipped' if attempt == 1 else 'failed', error='Échéance dépassée')
+                    break
                 
-                with open(filepath, "wb") as f:
-                    f.write(response.content)
+                outcome['attempts'] = attempt
+                retry = False
+                wait = 0
+                try:
+                    response = self.session.get(url, timeout=min(self.timeout, remaining))
+                    if response.status_code == 200:
+                        content = response.content
+                        outcome.update(status='ok', error=None, http_status=200, file_size=len(content),
+                                       content_type=response.headers.get('content-type', ''))
+                        break
+                    outcome.update(error=f'HTTP {response.status_code}', http_status=response.status_code)
+                    retry = response.status_code in self.RETRY_STATUSES
+                    wait = self.retry_after(response)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    outcome['error'] = f'Erreur de téléchargement: {e}'
+                    retry = True
+                except requests.RequestException as e:
+                    outcome['error'] = f'Erreur de téléchargement: {e}'
                 
-                downloaded_paths.append(filepath)
-            
-        except Exception as e:
-            print(f"Erreur lors du téléchargement de {url}: {e}")
+                if not retry or attempt == self.retries:
+                    break
+                delay = max(self.backoff * (2 ** (attempt - 1)), wait)
+                if time.monotonic() + delay >= deadline_at:
+                    if wait:
+                        outcome['error'] += f' (Retry-After {wait:g}s au-delà de l\'échéance)'
+                    break
+                time.sleep(delay)
+        finally:
+            slot.release()
+        
+        elapsed = time.monotonic() - started
+        outcome['elapsed_ms'] = round(elapsed * 1000, 1)
+        image_download_duration.observe(elapsed, 'batch', outcome['status'])
+        return outcome, content
     
-    return downloaded_paths
+    def download_all(self, urls, store, deadline=120):
+        """Télécharger un lot d'URL ; un résultat par URL, dans l'ordre
+        
+        store(url, contenu, content_type) enregistre le contenu et retourne
+        les champs à ajouter au résultat (file_path...).
+        """
+        deadline_at = time.monotonic() + deadline
+        
+        def run(url):
+            outcome, content = self.fetch(url, deadline_at)
+            if content is not None:
+                try:
+                    outcome.update(store(url, content, outcome['content_type']))
+                except OSError as e:
+                    outcome.update(status='failed', error=f'Erreur d\'écriture: {e}')
+            return outcome
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(run, urls))
+
+image_downloader = ImageDownloader(
+    max_workers=int(os.environ.get('IMAGE_DOWNLOAD_WORKERS', 8)),
+    per_host=int(os.environ.get('IMAGE_DOWNLOAD_PER_HOST', 4))
+)
+
+def store_downloaded_image(url, content, content_type):
+    """Enregistrer une image téléchargée dans le store par contenu"""
+    file_path, content_hash = image_manager.store_bytes(content, ImageManager.extension_for(url, content_type))
+    return {'file_path': file_path, 'content_hash': content_hash}
+
+def download_images_for_food(food_name, image_urls):
+    """Télécharge les images pour un aliment donné"""
+    outcomes = image_downloader.download_all(image_urls, store_downloaded_image)
+    for outcome in outcomes:
+        if outcome['status'] != 'ok':
+            print(f"Erreur lors du téléchargement de {outcome['url']}: {outcome['error']}")
+    return [outcome['file_path'] for outcome in outcomes if outcome['status'] == 'ok']
 
 class AllergyDetectionEngine:
     """Moteur de détection d'allergies"""
     
+    # Fenêtre d'apparition des symptômes après un repas (ms)
+    SYMPTOM_WINDOW_MIN = SYMPTOM_WINDOW_MIN_MS
+    SYMPTOM_WINDOW_MAX = SYMPTOM_WINDOW_MAX_MS
+    
     @staticmethod
-    def calculate_allergy_score(user_id, food_id, days_back=30):
-        """Calcule le score de risque allergique pour un aliment"""
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days_back)
-        
-        # Récupérer les repas contenant cet aliment
-        meals = meal_dao.get_user_meals(user_id, start_date.isoformat(), end_date.isoformat())
-        food_meals = [meal for meal in meals if meal[2] == food_id]  # food_id est à l'index 2
+    def sweep_scores(meal_events, symptom_times):
+        """Calcule les scores de risque de tous les aliments en un seul balayage
         
-        if not food_meals:
-            return 0
+        meal_events: liste de (food_id, meal_ts) et symptom_times: liste de
+        ms epoch. Un repas compte comme "suivi d'un symptôme" s'il existe au
+        moins un symptôme entre 2h et 48h après lui.
+        """
+        symptom_times = sorted(symptom_times)
+        consumptions = defaultdict(int)
+        hits = defaultdict(int)
         
-        # Récupérer les symptômes dans la même période
-        symptoms = symptom_dao.get_user_symptoms(user_id, start_date.isoformat(), end_date.isoformat())
+        # Les repas sont parcourus dans l'ordre chronologique : le début de la
+        # fenêtre ne fait qu'avancer, un seul pointeur suffit sur les symptômes
+        pointer = 0
+        total_symptoms = len(symptom_times)
+        for food_id, meal_time in sorted(meal_events, key=lambda event: event[1]):
+            consumptions[food_id] += 1
+            
+            window_start = meal_time + AllergyDetectionEngine.SYMPTOM_WINDOW_MIN
+            while pointer < total_symptoms and symptom_times[pointer] < window_start:
+                pointer += 1
+            
+            if pointer < total_symptoms and symptom_times[pointer] - meal_time <= AllergyDetectionEngine.SYMPTOM_WINDOW_MAX:
+                hits[food_id] += 1
         
-        symptom_after_food_count = 0
-        total_consumptions = len(food_meals)
+        return {
+            food_id: round((hits[food_id] / count) * 100, 2)
+            for food_id, count in consumptions.items()
+        }
+    
+    @staticmethod
+    def calculate_all_scores(user_id, days_back=30):
+        """Calcule les scores de risque de tous les aliments consommés par un utilisateur"""
+        end_ts = epoch_ms_now()
+        start_ts = end_ts - days_back * MS_PER_DAY
         
-        for meal in food_meals:
-            meal_time = datetime.fromisoformat(meal[3])  # meal_time est à l'index 3
-            
-            # Chercher des symptômes dans les 2h à 48h après le repas
-            for symptom in symptoms:
-                symptom_time = datetime.fromisoformat(symptom[4])  # occurrence_time est à l'index 4
-                time_diff = symptom_time - meal_time
-                
-                if timedelta(hours=2) <= time_diff <= timedelta(hours=48):
-                    symptom_after_food_count += 1
-                    break  # Un symptôme par repas maximum
+        # Un seul chargement des repas et des symptômes pour tous les aliments,
+        # réduit aux entiers utiles au balayage
+        meal_events = meal_dao.get_meal_events(user_id, start_ts, end_ts)
+        if not meal_events:
+            return {}
         
-        # Calcul du score de risque
-        if total_consumptions == 0:
-            return 0
+        symptom_times = symptom_dao.get_symptom_times(user_id, start_ts, end_ts)
         
-        risk_score = (symptom_after_food_count / total_consumptions) * 100
-        return round(risk_score, 2)
+        return AllergyDetectionEngine.sweep_scores(meal_events, symptom_times)
+    
+    @staticmethod
+    def calculate_allergy_score(user_id, food_id, days_back=30):
+        """Calcule le score de risque allergique pour un aliment"""
+        scores = AllergyDetectionEngine.calculate_all_scores(user_id, days_back)
+        return scores.get(food_id, 0)
     
     @staticmethod
-    def detect_potential_allergies(user_id, threshold=30):
+    def detect_potential_allergies(user_id, threshold=30, days_back=30):
         """Détecte les allergies potentielles pour un utilisateur"""
-        foods = food_dao.get_all_foods()
+        _, foods = food_catalog_cache.get_all()
+        scores = AllergyDetectionEngine.calculate_all_scores(user_id, days_back)
         potential_allergies = []
         
         for food in foods:
             food_id = food[0]
             food_name = food[1]
             
-            score = AllergyDetectionEngine.calculate_allergy_score(user_id, food_id)
+            score = scores.get(food_id, 0)
             
             if score >= threshold:
                 potential_allergies.append({
@@ -570,17 +3462,417 @@ class AllergyDetectionEngine:
         
         return sorted(potential_allergies, key=lambda x: x['risk_score'], reverse=True)
 
+def get_potential_allergies(user_id, threshold=30, days_back=RiskStoreDAO.WINDOW_DAYS):
+    """Analyse mémorisée : store matérialisé pour la fenêtre standard, moteur sinon"""
+    def compute():
+        if days_back == RiskStoreDAO.WINDOW_DAYS:
+            return risk_store.detect_potential_allergies(user_id, threshold)
+        return AllergyDetectionEngine.detect_potential_allergies(user_id, threshold, days_back)
+    
+    return analysis_cache.get_or_compute(user_id, threshold, days_back, compute)
+
+# Analyse par lot : chaque processus lit la base par sa propre connexion en
+# lecture seule ; seul le processus parent écrit les rapports
+ANALYSIS_RUNS_KEPT = 7
+
+class ReadOnlyDatabase:
+    """Connexion SQLite en lecture seule d'un processus d'analyse
+    
+    Expose get_connection() comme DatabaseDAO pour réutiliser les DAO de
+    lecture, sans pool ni migrations. La connexion sert elle-même de
+    gestionnaire de contexte et reste ouverte.
+    """
+    
+    def __init__(self, db_name):
+        self.conn = sqlite3.connect(f"file:{db_name}?mode=ro", uri=True)
+        self.conn.execute("PRAGMA query_only=ON")
+        self.conn.execute("PRAGMA mmap_size=268435456")
+        self.conn.execute("PRAGMA cache_size=-16000")
+    
+    def get_connection(self):
+        return self.conn
+
+_batch_daos = None
+
+def init_batch_worker(db_name):
+    """Initialiseur d'un processus du pool : connexion en lecture seule et DAO"""
+    global _batch_daos
+    database = ReadOnlyDatabase(db_name)
+    _batch_daos = (MealDAO(database), SymptomDAO(database))
+
+def analyze_user_chunk(user_ids, threshold, days_back, reference_ts):
+    """Tâche d'un processus : (utilisateurs traités, lignes (user_id, food_id, score), pic RSS en Ko)
+    
+    Même calcul que AllergyDetectionEngine.detect_potential_allergies, à la
+    date de référence commune à tout le lot.
+    """
+    meals, symptoms = _batch_daos
+    start_ts = reference_ts - days_back * MS_PER_DAY
+    rows = []
+    for user_id in user_ids:
+        meal_events = meals.get_meal_events(user_id, start_ts, reference_ts)
+        if not meal_events:
+            continue
+        scores = AllergyDetectionEngine.sweep_scores(
+            meal_events, symptoms.get_symptom_times(user_id, start_ts, reference_ts)
+        )
+        rows.extend(
+            (user_id, food_id, score) for food_id, score in scores.items() if score >= threshold
+        )
+    return len(user_ids), rows, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+# Commandes CLI
+
+@api.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Vérifier qu'aucune requête fréquente ne parcourt une table entière"""
+    report = db_dao.explain_hot_queries()
+    failures = [entry for entry in report if entry['full_scan']]
+    
+    for entry in report:
+        status = 'SCAN' if entry['full_scan'] else 'OK'
+        print(f"[{status}] {entry['name']}: {' | '.join(entry['plan'])}")
+    
+    print(f"Version du schéma: {db_dao.get_schema_version()}")
+    if failures:
+        raise SystemExit(f"{len(failures)} requête(s) sans index")
+
+def media_url(file_path, size=None):
+    """URL publique d'un fichier du dossier media (chemins du store : ab/cd/<sha256>.jpg)"""
+    if not file_path:
+        return None
+    relative = os.path.relpath(file_path, MEDIA_FOLDER).replace(os.sep, '/')
+    return f"/api/media/{relative}" + (f"?size={size}" if size else '')
+
+def keyset_page_args(limit_param='limit', default=DEFAULT_PAGE_SIZE, integer_key=False, key_length=2):
+    """(limit, clé après laquelle reprendre) depuis ?limit= et ?cursor= (ValueError si invalides)"""
+    limit = int(request.args.get(limit_param, default))
+    if limit < 1:
+        raise ValueError(limit)
+    after = None
+    if request.args.get('cursor'):
+        after = decode_cursor(request.args['cursor'])
+        if len(after) != key_length:
+            raise ValueError(after)
+        if integer_key and not all(type(value) is int for value in after):
+            raise ValueError(after)
+    return min(limit, MAX_PAGE_SIZE), after
+
+def period_args():
+    """Bornes (start_ts, end_ts) en ms epoch depuis ?start_date= et ?end_date= (ValueError si invalides)
+    
+    Une end_date sans heure couvre toute la journée.
+    """
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    start_ts = to_epoch_ms(start_date) if start_date else None
+    end_ts = None
+    if end_date:
+        end_ts = to_epoch_ms(end_date)
+        if len(end_date) == 10:
+            end_ts += MS_PER_DAY - 1
+    return start_ts, end_ts
+
+def etag_response(etag, build_payload):
+    """Réponse JSON avec un ETag fort ; 304 si le client possède déjà cette version"""
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(build_payload())
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
+
+@api.cli.command('rebuild-risk-store')
+@click.option('--user-id', type=int, default=None, help='Limiter à un utilisateur')
+def rebuild_risk_store_command(user_id):
+    """Reconstruire le store de risque et le comparer au moteur de détection"""
+    started = time.perf_counter()
+    risk_store.rebuild(user_id)
+    print(f"Store reconstruit en {time.perf_counter() - started:.2f}s")
+    
+    if user_id is not None:
+        user_ids = [user_id]
+    else:
+        with db_dao.get_connection() as conn:
+            user_ids = [row[0] for row in conn.execute("SELECT id FROM users")]
+    
+    mismatches = 0
+    for current_user in user_ids:
+        stored = risk_store.get_scores(current_user)
+        computed = AllergyDetectionEngine.calculate_all_scores(current_user, RiskStoreDAO.WINDOW_DAYS)
+        for food_id in set(stored) | set(computed):
+            if stored.get(food_id, 0) != computed.get(food_id, 0):
+                mismatches += 1
+                print(f"Écart utilisateur {current_user}, aliment {food_id}: "
+                      f"store={stored.get(food_id, 0)} moteur={computed.get(food_id, 0)}")
+    
+    print(f"{len(user_ids)} utilisateur(s) vérifié(s), {mismatches} écart(s)")
+    if mismatches:
+        raise SystemExit(1)
+
+@api.cli.command('maintain-risk-store')
+def maintain_risk_store_command():
+    """Expirer les repas anciens et prendre en compte les repas et symptômes futurs échus"""
+    expired, rebuilt = risk_store.maintain()
+    print(f"{expired} repas expiré(s), {rebuilt} utilisateur(s) recalculé(s)")
+
+@api.cli.command('generate-image-variants')
+@click.option('--force', is_flag=True, help='Regénérer aussi les images qui ont déjà leurs variantes')
+def generate_image_variants_command(force):
+    """Générer les variantes redimensionnées des images déjà enregistrées"""
+    with db_dao.get_connection() as conn:
+        query = "SELECT id, file_path FROM food_images"
+        if not force:
+            query += " WHERE id NOT IN (SELECT image_id FROM food_image_variants)"
+        images = conn.execute(query).fetchall()
+    
+    generated = failed = 0
+    for image_id, file_path in images:
+        try:
+            variants = image_manager.generate_variants(file_path)
+        except Exception as e:
+            failed += 1
+            print(f"Image {image_id} ({file_path}) ignorée: {e}")
+            continue
+        with db_dao.get_connection() as conn:
+            ImageManager.record_variants(conn.cursor(), image_id, variants)
+        generated += 1
+    
+    print(f"{generated} image(s) traitée(s), {failed} échec(s)")
+
+@api.cli.command('analyze-all-users')
+@click.option('--workers', type=int, default=None, help='Processus d\'analyse (défaut : nombre de cœurs)')
+@click.option('--chunk-size', type=int, default=500, show_default=True, help='Utilisateurs par tâche')
+@click.option('--threshold', type=float, default=30, show_default=True, help='Score minimal enregistré')
+@click.option('--days', type=int, default=RiskStoreDAO.WINDOW_DAYS, show_default=True, help='Fenêtre d\'analyse (jours)')
+def analyze_all_users_command(workers, chunk_size, threshold, days):
+    """Analyser tous les utilisateurs en parallèle et enregistrer les rapports (allergy_reports)"""
+    workers = workers or os.cpu_count() or 1
+    reference_ts = epoch_ms_now()
+    with db_dao.get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO analysis_runs (threshold, days_back, reference_ts) VALUES (?, ?, ?)",
+            (threshold, days, reference_ts)
+        )
+        run_id = cursor.lastrowid
+        conn.commit()
+        user_ids = [row[0] for row in conn.execute("SELECT id FROM users ORDER BY id")]
+    
+    chunks = [user_ids[start:start + chunk_size] for start in range(0, len(user_ids), chunk_size)]
+    print(f"Analyse {run_id} : {len(user_ids)} utilisateurs, {len(chunks)} lots, {workers} processus")
+    
+    started = time.perf_counter()
+    analyzed = reports = max_rss = 0
+    last_report = started
+    status = 'failed'
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_batch_worker,
+                                 initargs=(db_dao.db_name,)) as executor:
+            # Au plus deux lots en cours par processus : la mémoire du parent reste bornée
+            pending = set()
+            next_chunk = 0
+            while pending or next_chunk < len(chunks):
+                while next_chunk < len(chunks) and len(pending) < workers * 2:
+                    pending.add(executor.submit(analyze_user_chunk, chunks[next_chunk], threshold, days, reference_ts))
+                    next_chunk += 1
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    count, rows, rss = future.result()
+                    with db_dao.get_connection() as conn:
+                        conn.executemany(
+                            "INSERT INTO allergy_reports (run_id, user_id, food_id, risk_score) VALUES (?, ?, ?, ?)",
+                            [(run_id,) + row for row in rows]
+                        )
+                        conn.commit()
+                    analyzed += count
+                    reports += len(rows)
+                    max_rss = max(max_rss, rss)
+                
+                now = time.perf_counter()
+                if now - last_report >= 5 or analyzed == len(user_ids):
+                    last_report = now
+                    print(f"  {analyzed}/{len(user_ids)} utilisateurs "
+                          f"({analyzed * 100 / max(len(user_ids), 1):.1f}%), "
+                          f"{analyzed / (now - started):.0f} utilisateurs/s")
+        status = 'completed'
+    finally:
+        elapsed = time.perf_counter() - started
+        with db_dao.get_connection() as conn:
+            conn.execute(
+                "UPDATE analysis_runs SET status = ?, users_analyzed = ?, reports_count = ?, "
+                "elapsed_seconds = ?, finished_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (status, analyzed, reports, elapsed, run_id)
+            )
+            if status == 'completed':
+                # Conserver les dernières analyses terminées (rapports supprimés en cascade)
+                conn.execute(
+                    "DELETE FROM analysis_runs WHERE status = 'completed' AND id NOT IN "
+                    "(SELECT id FROM analysis_runs WHERE status = 'completed' ORDER BY id DESC LIMIT ?)",
+                    (ANALYSIS_RUNS_KEPT,)
+                )
+            conn.commit()
+    
+    print(f"Analyse {run_id} terminée : {analyzed} utilisateurs en {elapsed:.1f}s "
+          f"({analyzed / max(elapsed, 1e-9):.0f} utilisateurs/s), {reports} rapports, "
+          f"mémoire max par processus {max_rss / 1024:.0f} Mo")
+
+@api.cli.command('reclaim-media')
+def reclaim_media_command():
+    """Supprimer les fichiers media qui ne sont plus référencés"""
+    removed = image_manager.reclaim_orphans()
+    print(f"{removed} fichier(s) supprimé(s)")
+
 # Routes API
 
-@app.route('/api/init-data', methods=['POST'])
+@api.before_app_request
+def start_background_workers():
+    """Reprendre les jobs d'images en attente et la maintenance du store dès la première requête du processus"""
+    image_jobs.start()
+    risk_store.start_maintenance()
+
+@api.before_app_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    http_in_flight.inc()
+
+@api.after_app_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        # Les URL sans route partagent une étiquette : pas une série par chemin inconnu
+        endpoint = request.endpoint or 'unmatched'
+        http_duration.observe(time.perf_counter() - started, endpoint, request.method)
+        http_requests.inc(endpoint, request.method, str(response.status_code))
+    return response
+
+@api.teardown_app_request
+def finish_request_timer(exc):
+    if g.pop('request_started', None) is not None:
+        http_in_flight.dec()
+
+# Profilage à la demande d'une requête (cProfile et trace SQL), activé par
+# l'en-tête X-Profile valant PROFILE_TOKEN. Le jeton n'est pas accepté dans
+# l'URL, que le journal d'accès enregistre. Sans PROFILE_TOKEN, le profilage
+# est désactivé et ne coûte qu'un test par requête.
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN') or None
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+PROFILE_TOP_FUNCTIONS = 30
+
+@api.before_app_request
+def start_profiling():
+    if PROFILE_TOKEN is None:
+        return
+    token = request.headers.get('X-Profile')
+    if not token or not hmac.compare_digest(token.encode('utf-8'), PROFILE_TOKEN.encode('utf-8')):
+        return
+    
+    output = request.headers.get('X-Profile-Output') or request.args.get('_profile_output', 'json')
+    profiler = cProfile.Profile()
+    g.profile = (profiler, time.perf_counter(), output)
+    start_sql_trace()
+    profiler.enable()
+
+@api.after_app_request
+def finish_profiling(response):
+    """Remplacer la réponse par le rapport, ou l'écrire dans PROFILE_DIR (_profile_output=file)"""
+    profile = g.pop('profile', None)
+    if profile is None:
+        return response
+    
+    profiler, started, output = profile
+    if response.is_streamed:
+        # Le corps d'une réponse en flux n'est produit qu'après after_request :
+        # il est généré ici, sous le profileur, pour que le rapport le couvre
+        response.set_data(b''.join(response.iter_encoded()))
+    profiler.disable()
+    report = build_profile_report(profiler, stop_sql_trace(), time.perf_counter() - started)
+    report.update({
+        'endpoint': request.endpoint,
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code
+    })
+    if output == 'file':
+        response.headers['X-Profile-File'] = write_profile(profiler, report)
+        return response
+    return jsonify(report)
+
+@api.teardown_app_request
+def abort_profiling(exc):
+    # Requête interrompue avant after_request : ne pas laisser le profileur actif sur le thread
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profile[0].disable()
+        stop_sql_trace()
+
+def build_profile_report(profiler, statements, elapsed):
+    """Durée totale, instructions SQL (regroupées pour repérer les N+1) et fonctions les plus coûteuses"""
+    by_statement = {}
+    for statement in statements:
+        group = by_statement.setdefault(statement['sql'], {'sql': statement['sql'], 'count': 0, 'total_ms': 0.0, 'rows': 0})
+        group['count'] += 1
+        group['total_ms'] += statement['duration_ms']
+        group['rows'] += statement['rows']
+    
+    stats = pstats.Stats(profiler).stats
+    functions = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:PROFILE_TOP_FUNCTIONS]
+    
+    return {
+        'total_ms': round(elapsed * 1000, 3),
+        'sql': {
+            'count': len(statements),
+            'total_ms': round(sum(statement['duration_ms'] for statement in statements), 3),
+            'rows': sum(statement['rows'] for statement in statements),
+            'by_statement': [
+                dict(group, total_ms=round(group['total_ms'], 3))
+                for group in sorted(by_statement.values(), key=lambda group: group['total_ms'], reverse=True)
+            ],
+            'statements': [dict(statement, duration_ms=round(statement['duration_ms'], 3)) for statement in statements]
+        },
+        'functions': [
+            {
+                'function': pstats.func_std_string(key),
+                'calls': calls,
+                'primitive_calls': primitive_calls,
+                'own_ms': round(own_time * 1000, 3),
+                'cumulative_ms': round(cumulative_time * 1000, 3)
+            }
+            for key, (primitive_calls, calls, own_time, cumulative_time, _) in functions
+        ]
+    }
+
+def write_profile(profiler, report):
+    """Écrire le rapport (.json) et les statistiques brutes (.prof, pour pstats ou snakeviz)"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(
+        PROFILE_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{report['endpoint'] or 'unmatched'}-{uuid.uuid4().hex[:8]}"
+    )
+    profiler.dump_stats(f'{base}.prof')
+    with open(f'{base}.json', 'w') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return f'{base}.json'
+
+@api.route('/api/init-data', methods=['POST'])
 def init_base_data():
     """Initialise les données de base avec les nourritures camerounaises"""
     try:
         loaded_foods = []
         
+        # Télécharger toutes les images du lot en parallèle
+        urls = [url for food_data in CAMEROON_FOODS_DATA for url in food_data.get('image_urls', [])]
+        outcomes = iter(image_downloader.download_all(
+            urls, store_downloaded_image, deadline=float(os.environ.get('IMAGE_DOWNLOAD_DEADLINE', 120))
+        ))
+        
         for food_data in CAMEROON_FOODS_DATA:
-            # Télécharger les images
-            image_paths = download_images_for_food(food_data['name'], food_data.get('image_urls', []))
+            image_results = [next(outcomes) for _ in food_data.get('image_urls', [])]
+            for result in image_results:
+                if result['status'] == 'ok' and not image_manager.validate_image(result['file_path']):
+                    image_manager.discard_unreferenced(result.pop('file_path'), result['content_hash'])
+                    result.update(status='failed', error='Fichier image invalide')
+            image_paths = [result['file_path'] for result in image_results if result['status'] == 'ok']
             image_path = image_paths[0] if image_paths else None
             
             # Créer l'aliment en base
@@ -592,10 +3884,21 @@ def init_base_data():
                 is_base_food=True
             )
             
+            # Enregistrer les images et leurs variantes redimensionnées
+            downloaded = [result for result in image_results if result['status'] == 'ok']
+            for position, result in enumerate(downloaded):
+                image_manager.register_image(
+                    food_id, result['file_path'], result['url'],
+                    is_primary=(position == 0), file_size=result['file_size'],
+                    variants=image_manager.generate_variants(result['file_path']),
+                    content_hash=result['content_hash']
+                )
+            
             loaded_foods.append({
                 'id': food_id,
                 'name': food_data['name'],
-                'images_downloaded': len(image_paths)
+                'images_downloaded': len(image_paths),
+                'image_results': image_results
             })
         
         return jsonify({
@@ -610,7 +3913,7 @@ def init_base_data():
             'message': f'Erreur lors de l\'initialisation: {str(e)}'
         }), 500
 
-@app.route('/api/users', methods=['POST'])
+@api.route('/api/users', methods=['POST'])
 def create_user():
     """Créer un nouvel utilisateur"""
     data = request.get_json()
@@ -629,7 +3932,7 @@ def create_user():
     else:
         return jsonify({'error': 'Utilisateur déjà existant'}), 409
 
-@app.route('/api/users/<int:user_id>', methods=['GET'])
+@api.route('/api/users/<int:user_id>', methods=['GET'])
 def get_user(user_id):
     """Récupérer les informations d'un utilisateur"""
     user = user_dao.get_user(user_id)
@@ -644,115 +3947,86 @@ def get_user(user_id):
     else:
         return jsonify({'error': 'Utilisateur non trouvé'}), 404
 
-@app.route('/api/foods', methods=['GET'])
+# Champs exposés par le catalogue (projection via ?fields=)
+FOOD_FIELDS = ('id', 'name', 'category', 'ingredients', 'image_path', 'is_base_food', 'image_url', 'thumbnail_url',
+               'image_count')
+
+@api.route('/api/foods', methods=['GET'])
 def get_foods():
-    """Récupérer tous les aliments avec leurs images principales"""
-    foods = food_dao.get_all_foods()
+    """Récupérer les aliments avec leurs images principales
     
-    foods_list = []
-    for food in foods:
-        food_data = {
-            'id': food[0],
-            'name': food[1],
-            'category': food[2],
-            'ingredients': food[3],
-            'image_path': food[4],
-            'is_base_food': bool(food[5]),
-            'image_url': None
-        }
+    Paramètres optionnels : category, fields (ex: id,name), limit et cursor
+    pour la pagination par clé.
+    """
+    category = request.args.get('category')
+    
+    fields = FOOD_FIELDS
+    if request.args.get('fields'):
+        fields = [field.strip() for field in request.args['fields'].split(',') if field.strip()]
+        unknown = [field for field in fields if field not in FOOD_FIELDS]
+        if unknown:
+            return jsonify({
+                'error': f"Champs inconnus: {', '.join(unknown)}",
+                'allowed_fields': list(FOOD_FIELDS)
+            }), 400
+    
+    try:
+        limit = None
+        if 'limit' in request.args:
+            limit = max(1, min(int(request.args['limit']), MAX_PAGE_SIZE))
+        
+        after_id = None
+        if request.args.get('cursor'):
+            after_id = int(decode_cursor(request.args['cursor'])[0])
+    except (ValueError, IndexError, TypeError):
+        return jsonify({'error': 'Paramètres de pagination invalides'}), 400
+    
+    version, foods = food_catalog_cache.get_page(category=category, after_id=after_id, limit=limit)
+    
+    # La représentation dépend de la version du catalogue et des paramètres
+    query_key = hashlib.sha1(request.query_string).hexdigest()[:16]
+    etag = f"catalog-{version}-{query_key}"
+    
+    def build_payload():
+        foods_list = []
+        for food in foods:
+            food_data = {
+                'id': food[0],
+                'name': food[1],
+                'category': food[2],
+                'ingredients': food[3],
+                'image_path': food[4],
+                'is_base_food': bool(food[5]),
+                'image_url': media_url(food[6]),
+                'thumbnail_url': media_url(food[6], size='thumb'),
+                'image_count': len(image_manager.get_food_images(food[0], version))
+            }
+            foods_list.append({field: food_data[field] for field in fields})
         
-        # Récupérer l'image principale si elle existe
-        try:
-            with db_dao.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT file_path FROM food_images 
-                    WHERE food_id = ? AND is_primary = 1
-                    LIMIT 1
-                ''', (food[0],))
-                
-                primary_image = cursor.fetchone()
-                if primary_image and primary_image[0]:
-                    filename = os.path.basename(primary_image[0])
-                    food_data['image_url'] = f"/api/media/{filename}"
-        except Exception as e:
-            print(f"Erreur lors de la récupération de l'image principale: {e}")
+        next_cursor = None
+        if limit is not None and len(foods) == limit:
+            next_cursor = encode_cursor([foods[-1][0]])
         
-        foods_list.append(food_data)
+        return {'foods': foods_list, 'next_cursor': next_cursor}
     
-    return jsonify({'foods': foods_list})
-@app.route('/api/foods', methods=['POST'])
+    return etag_response(etag, build_payload)
+
+@api.route('/api/foods', methods=['POST'])
 def create_food():
-    """Créer un nouvel aliment avec téléchargement d'image optionnel"""
+    """Créer un nouvel aliment ; l'image éventuelle est téléchargée en arrière-plan"""
     data = request.get_json()
     
     if not data or 'name' not in data:
         return jsonify({'error': 'Nom de l\'aliment requis'}), 400
     
-    # Gérer le téléchargement d'image si une URL est fournie
-    image_path = None
-    image_download_info = None
-    
-    if 'image_url' in data and data['image_url']:
-        try:
-            # Télécharger l'image depuis l'URL
-            result = image_manager.download_and_save_image(
-                image_url=data['image_url'],
-                food_id=None,  # Sera mis à jour après création de l'aliment
-                food_name=data['name'],
-                is_primary=True
-            )
-            
-            if result['success']:
-                image_path = result['file_path']
-                image_download_info = {
-                    'downloaded': True,
-                    'original_url': data['image_url'],
-                    'local_path': result['file_path'],
-                    'file_size': result.get('file_size', 0)
-                }
-            else:
-                image_download_info = {
-                    'downloaded': False,
-                    'error': result['error'],
-                    'original_url': data['image_url']
-                }
-        except Exception as e:
-            image_download_info = {
-                'downloaded': False,
-                'error': str(e),
-                'original_url': data['image_url']
-            }
-    
     # Créer l'aliment en base
     food_id = food_dao.create_food(
         name=data['name'],
         category=data.get('category', ''),
         ingredients=data.get('ingredients', ''),
-        image_path=image_path,
         is_base_food=data.get('is_base_food', False)
     )
     
-    # Si l'image a été téléchargée avec succès, mettre à jour avec le food_id
-    if image_path and image_download_info and image_download_info['downloaded']:
-        try:
-            # Enregistrer l'image dans la table images si elle existe
-            with db_dao.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO food_images (food_id, file_path, original_url, is_primary, file_size)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (
-                    food_id, 
-                    image_path, 
-                    data['image_url'], 
-                    True, 
-                    image_download_info.get('file_size', 0)
-                ))
-                conn.commit()
-        except Exception as e:
-            print(f"Erreur lors de l'enregistrement de l'image en base: {e}")
-    
     # Préparer la réponse
     response_data = {
         'success': True,
@@ -760,53 +4034,34 @@ def create_food():
         'message': 'Aliment créé avec succès'
     }
     
-    # Ajouter les informations sur l'image si une URL était fournie
-    if 'image_url' in data:
-        response_data['image_download'] = image_download_info
-        if image_path:
-            response_data['image_url'] = f"/api/media/{os.path.basename(image_path)}"
+    # Le téléchargement de l'image est confié à la file image_jobs
+    if data.get('image_url'):
+        job_id = image_jobs.enqueue(food_id, data['image_url'], is_primary=True)
+        response_data['image_job'] = {
+            'job_id': job_id,
+            'status': 'pending',
+            'original_url': data['image_url'],
+            'status_url': f"/api/jobs/{job_id}"
+        }
     
     return jsonify(response_data)
-@app.route('/api/foods/<int:food_id>', methods=['GET'])
+@api.route('/api/foods/<int:food_id>', methods=['GET'])
 def get_food_detail(food_id):
     """Récupérer les détails d'un aliment avec ses images"""
-    food = food_dao.get_food(food_id)
+    version, food = food_catalog_cache.get_food(food_id)
     
     if not food:
         return jsonify({'error': 'Aliment non trouvé'}), 404
     
-    # Récupérer les images associées
-    images = []
-    try:
-        with db_dao.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, file_path, original_url, is_primary, file_size, created_at
-                FROM food_images 
-                WHERE food_id = ?
-                ORDER BY is_primary DESC, created_at DESC
-            ''', (food_id,))
-            
-            image_records = cursor.fetchall()
-            
-            for img in image_records:
-                # Construire l'URL accessible
-                filename = os.path.basename(img[1]) if img[1] else None
-                image_url = f"/api/media/{filename}" if filename else None
-                
-                images.append({
-                    'id': img[0],
-                    'file_path': img[1],
-                    'image_url': image_url,
-                    'original_url': img[2],
-                    'is_primary': bool(img[3]),
-                    'file_size': img[4],
-                    'created_at': img[5]
-                })
-    except Exception as e:
-        print(f"Erreur lors de la récupération des images: {e}")
+    # Les images font partie du catalogue versionné (triggers sur food_images)
+    etag = f"food-{food_id}-{version}"
+    if request.if_none_match.contains(etag):
+        return etag_response(etag, None)
     
-    return jsonify({
+    # Images associées, depuis le cache par version du catalogue
+    images = image_manager.get_food_images(food_id, version)
+    
+    return etag_response(etag, lambda: {
         'id': food[0],
         'name': food[1],
         'category': food[2],
@@ -817,7 +4072,7 @@ def get_food_detail(food_id):
         'primary_image_url': images[0]['image_url'] if images and images[0]['is_primary'] else None
     })
 
-@app.route('/api/users/<int:user_id>', methods=['PUT'])
+@api.route('/api/users/<int:user_id>', methods=['PUT'])
 def update_user(user_id):
     """Modifier les informations d'un utilisateur"""
     data = request.get_json()
@@ -858,7 +4113,7 @@ def update_user(user_id):
             'error': 'Échec de la mise à jour (email ou nom d\'utilisateur déjà utilisé)'
         }), 409
 
-@app.route('/api/users/<int:user_id>', methods=['DELETE'])
+@api.route('/api/users/<int:user_id>', methods=['DELETE'])
 def delete_user(user_id):
     """Supprimer un utilisateur et toutes ses données"""
     # Vérifier que l'utilisateur existe
@@ -876,9 +4131,9 @@ def delete_user(user_id):
         }), 400
     
     # Effectuer la suppression
-    success = user_dao.delete_user(user_id)
+    deleted = user_dao.delete_user(user_id)
     
-    if success:
+    if deleted is not None:
         return jsonify({
             'success': True,
             'message': f'Utilisateur {user[1]} supprimé avec succès',
@@ -886,7 +4141,8 @@ def delete_user(user_id):
                 'id': user[0],
                 'username': user[1],
                 'email': user[2]
-            }
+            },
+            'deleted_records': deleted
         })
     else:
         return jsonify({
@@ -894,114 +4150,142 @@ def delete_user(user_id):
             'error': 'Échec de la suppression de l\'utilisateur'
         }), 500
 
-@app.route('/api/users/<int:user_id>/stats', methods=['GET'])
+@api.route('/api/users/<int:user_id>/stats', methods=['GET'])
 def get_user_deletion_stats(user_id):
     """Obtenir les statistiques avant suppression d'un utilisateur"""
-    if not user_dao.user_exists(user_id):
+    stats = user_dao.get_deletion_stats(user_id)
+    if not stats:
         return jsonify({'error': 'Utilisateur non trouvé'}), 404
     
-    with db_dao.get_connection() as conn:
-        cursor = conn.cursor()
-        
-        # Compter les données associées
-        cursor.execute("SELECT COUNT(*) FROM meals WHERE user_id = ?", (user_id,))
-        meals_count = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM symptoms WHERE user_id = ?", (user_id,))
-        symptoms_count = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM weekly_plans WHERE user_id = ?", (user_id,))
-        plans_count = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM buffet_events WHERE created_by = ?", (user_id,))
-        buffets_count = cursor.fetchone()[0]
-    
-    user = user_dao.get_user(user_id)
+    username, meals_count, symptoms_count, plans_count, buffets_count, buffet_foods_count = stats
     
     return jsonify({
         'user_id': user_id,
-        'username': user[1],
+        'username': username,
         'data_summary': {
             'meals_recorded': meals_count,
             'symptoms_logged': symptoms_count,
             'weekly_plans': plans_count,
             'buffet_events_created': buffets_count,
-            'total_records': meals_count + symptoms_count + plans_count + buffets_count
+            'buffet_foods_planned': buffet_foods_count,
+            'total_records': meals_count + symptoms_count + plans_count + buffets_count + buffet_foods_count
         },
         'warning': 'La suppression de cet utilisateur effacera définitivement toutes ces données'
     })
 
 # 3. Route pour récupérer tous les utilisateurs avec pagination
-@app.route('/api/users', methods=['GET'])
+@api.route('/api/users', methods=['GET'])
 def get_all_users():
-    """Récupérer tous les utilisateurs avec pagination optionnelle"""
+    """Récupérer les utilisateurs, du plus récent au plus ancien
+    
+    Sans paramètre de curseur : pagination par numéro de page (page, per_page)
+    avec les totaux, comme auparavant. Avec limit (défaut 10, max 200) ou
+    cursor : pagination par clé (created_at, id), sans COUNT ni OFFSET.
+    """
     try:
-        page = int(request.args.get('page', 1))
-        per_page = int(request.args.get('per_page', 10))
         search = request.args.get('search', '').strip()
         
-        with db_dao.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Requête de base
-            base_query = "SELECT * FROM users"
-            count_query = "SELECT COUNT(*) FROM users"
-            params = []
-            
-            # Ajouter la recherche si fournie
-            if search:
-                base_query += " WHERE username LIKE ? OR email LIKE ?"
-                count_query += " WHERE username LIKE ? OR email LIKE ?"
-                params = [f"%{search}%", f"%{search}%"]
-            
-            # Compter le total
-            cursor.execute(count_query, params)
-            total_users = cursor.fetchone()[0]
-            
-            # Calculer la pagination
-            offset = (page - 1) * per_page
-            base_query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
-            params.extend([per_page, offset])
-            
-            # Récupérer les utilisateurs
-            cursor.execute(base_query, params)
-            users = cursor.fetchall()
-            
-            users_list = []
-            for user in users:
-                users_list.append({
-                    'id': user[0],
-                    'username': user[1],
-                    'email': user[2],
-                    'created_at': user[3]
-                })
-            
-            return jsonify({
-                'users': users_list,
-                'pagination': {
-                    'current_page': page,
-                    'per_page': per_page,
-                    'total_users': total_users,
-                    'total_pages': (total_users + per_page - 1) // per_page,
-                    'has_next': page * per_page < total_users,
-                    'has_prev': page > 1
-                },
-                'search': search if search else None
+        if 'cursor' not in request.args and 'limit' not in request.args:
+            return get_users_by_offset(search)
+        
+        limit, after = keyset_page_args(default=10)
+        users = user_dao.get_users_page(after, limit, search)
+        
+        users_list = []
+        for user in users:
+            users_list.append({
+                'id': user[0],
+                'username': user[1],
+                'email': user[2],
+                'created_at': user[3]
             })
-            
+        
+        has_next = len(users) == limit
+        return jsonify({
+            'users': users_list,
+            'next_cursor': encode_cursor([users[-1][3], users[-1][0]]) if has_next else None,
+            'pagination': {
+                'limit': limit,
+                'has_next': has_next,
+                'has_prev': after is not None
+            },
+            'search': search if search else None
+        })
+    
     except ValueError:
         return jsonify({'error': 'Paramètres de pagination invalides'}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-@app.route('/api/foods/search', methods=['GET'])
+
+def get_users_by_offset(search):
+    """Ancienne pagination par numéro de page"""
+    page = int(request.args.get('page', 1))
+    per_page = min(int(request.args.get('per_page', 10)), MAX_PAGE_SIZE)
+    
+    with db_dao.get_connection() as conn:
+        cursor = conn.cursor()
+        
+        # Requête de base
+        base_query = "SELECT * FROM users"
+        count_query = "SELECT COUNT(*) FROM users"
+        params = []
+        
+        # Ajouter la recherche si fournie
+        if search:
+            base_query += " WHERE username LIKE ? OR email LIKE ?"
+            count_query += " WHERE username LIKE ? OR email LIKE ?"
+            params = [f"%{search}%", f"%{search}%"]
+        
+        # Compter le total
+        cursor.execute(count_query, params)
+        total_users = cursor.fetchone()[0]
+        
+        # Calculer la pagination
+        offset = (page - 1) * per_page
+        base_query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
+        params.extend([per_page, offset])
+        
+        # Récupérer les utilisateurs
+        cursor.execute(base_query, params)
+        users = cursor.fetchall()
+        
+        users_list = []
+        for user in users:
+            users_list.append({
+                'id': user[0],
+                'username': user[1],
+                'email': user[2],
+                'created_at': user[3]
+            })
+        
+        return jsonify({
+            'users': users_list,
+            'pagination': {
+                'current_page': page,
+                'per_page': per_page,
+                'total_users': total_users,
+                'total_pages': (total_users + per_page - 1) // per_page,
+                'has_next': page * per_page < total_users,
+                'has_prev': page > 1
+            },
+            'search': search if search else None
+        })
+
+@api.route('/api/foods/search', methods=['GET'])
 def search_foods():
-    """Rechercher des aliments"""
+    """Rechercher des aliments (recherche par préfixe, insensible aux accents)"""
     query = request.args.get('q', '')
     
     if not query:
         return jsonify({'error': 'Paramètre de recherche requis'}), 400
     
-    foods = food_dao.search_foods(query)
+    try:
+        limit = max(1, min(int(request.args.get('limit', 50)), MAX_PAGE_SIZE))
+        offset = max(0, int(request.args.get('offset', 0)))
+    except ValueError:
+        return jsonify({'error': 'Paramètres de pagination invalides'}), 400
+    
+    foods = food_dao.search_foods(query, limit=limit, offset=offset)
     
     foods_list = []
     for food in foods:
@@ -1015,7 +4299,7 @@ def search_foods():
     
     return jsonify({'foods': foods_list})
 
-@app.route('/api/meals', methods=['POST'])
+@api.route('/api/meals', methods=['POST'])
 def create_meal():
     """Enregistrer un repas"""
     data = request.get_json()
@@ -1024,6 +4308,11 @@ def create_meal():
     if not data or not all(field in data for field in required_fields):
         return jsonify({'error': 'Tous les champs requis doivent être fournis'}), 400
     
+    try:
+        to_epoch_ms(data['meal_time'])
+    except ValueError:
+        return jsonify({'error': 'meal_time doit être une date ISO 8601'}), 400
+    
     meal_id = meal_dao.create_meal(
         user_id=data['user_id'],
         food_id=data['food_id'],
@@ -1032,36 +4321,161 @@ def create_meal():
         notes=data.get('notes')
     )
     
+    if meal_id is None:
+        return jsonify({'error': 'Utilisateur ou aliment inexistant'}), 400
+    
     return jsonify({
         'success': True,
         'meal_id': meal_id,
         'message': 'Repas enregistré avec succès'
     })
 
-@app.route('/api/users/<int:user_id>/meals', methods=['GET'])
+# Import groupé (synchronisation des journaux hors ligne)
+BULK_MAX_ROWS = 5000
+
+def validate_bulk_row(row, required_fields):
+    """Contrôles communs d'une ligne d'import groupé ; retourne un message d'erreur ou None"""
+    if not isinstance(row, dict):
+        return 'Objet JSON attendu'
+    missing = [field for field in required_fields if row.get(field) is None]
+    if missing:
+        return f"Champs manquants: {', '.join(missing)}"
+    if not isinstance(row['user_id'], int):
+        return 'user_id doit être un entier'
+    key = row.get('idempotency_key')
+    if key is not None and (not isinstance(key, str) or not 0 < len(key) <= 128):
+        return 'idempotency_key doit être une chaîne de 1 à 128 caractères'
+    return None
+
+def validate_meal_row(row):
+    error = validate_bulk_row(row, ['user_id', 'food_id', 'meal_time', 'quantity'])
+    if error:
+        return None, error
+    if not isinstance(row['food_id'], int):
+        return None, 'food_id doit être un entier'
+    if not isinstance(row['quantity'], (int, float)) or isinstance(row['quantity'], bool):
+        return None, 'quantity doit être un nombre'
+    try:
+        meal_ts = to_epoch_ms(row['meal_time'])
+    except ValueError:
+        return None, 'meal_time doit être une date ISO 8601'
+    return {
+        'user_id': row['user_id'],
+        'food_id': row['food_id'],
+        'meal_time': row['meal_time'],
+        'meal_ts': meal_ts,
+        'quantity': row['quantity'],
+        'notes': row.get('notes'),
+        'idempotency_key': row.get('idempotency_key')
+    }, None
+
+def validate_symptom_row(row):
+    error = validate_bulk_row(row, ['user_id', 'symptom_type', 'severity', 'occurrence_time'])
+    if error:
+        return None, error
+    if not isinstance(row['severity'], int) or not (1 <= row['severity'] <= 5):
+        return None, 'La sévérité doit être entre 1 et 5'
+    try:
+        occurrence_ts = to_epoch_ms(row['occurrence_time'])
+    except ValueError:
+        return None, 'occurrence_time doit être une date ISO 8601'
+    return {
+        'user_id': row['user_id'],
+        'symptom_type': row['symptom_type'],
+        'severity': row['severity'],
+        'occurrence_time': row['occurrence_time'],
+        'occurrence_ts': occurrence_ts,
+        'description': row.get('description'),
+        'idempotency_key': row.get('idempotency_key')
+    }, None
+
+def bulk_ingest(items_key, validate, insert):
+    """Valider puis insérer un lot ; statut par ligne dans l'ordre d'envoi"""
+    data = request.get_json(silent=True)
+    items = data.get(items_key) if isinstance(data, dict) else None
+    
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': f'Liste "{items_key}" requise'}), 400
+    if len(items) > BULK_MAX_ROWS:
+        return jsonify({'error': f'Maximum {BULK_MAX_ROWS} lignes par lot'}), 413
+    
+    results = [None] * len(items)
+    valid_rows = []
+    valid_indexes = []
+    for index, item in enumerate(items):
+        row, error = validate(item)
+        if error:
+            results[index] = {'index': index, 'status': 'invalid', 'error': error}
+        else:
+            valid_rows.append(row)
+            valid_indexes.append(index)
+    
+    if valid_rows:
+        for index, (status, value) in zip(valid_indexes, insert(valid_rows)):
+            if status == 'invalid':
+                results[index] = {'index': index, 'status': status, 'error': value}
+            else:
+                results[index] = {'index': index, 'status': status, 'id': value}
+    
+    summary = defaultdict(int)
+    for result in results:
+        summary[result['status']] += 1
+    
+    return jsonify({
+        'success': True,
+        'created': summary['created'],
+        'duplicates': summary['duplicate'],
+        'invalid': summary['invalid'],
+        'results': results
+    })
+
+@api.route('/api/meals/bulk', methods=['POST'])
+def create_meals_bulk():
+    """Enregistrer un lot de repas (jusqu'à BULK_MAX_ROWS) en une transaction"""
+    return bulk_ingest('meals', validate_meal_row, meal_dao.create_meals_bulk)
+
+@api.route('/api/symptoms/bulk', methods=['POST'])
+def create_symptoms_bulk():
+    """Enregistrer un lot de symptômes (jusqu'à BULK_MAX_ROWS) en une transaction"""
+    return bulk_ingest('symptoms', validate_symptom_row, symptom_dao.create_symptoms_bulk)
+
+@api.route('/api/users/<int:user_id>/meals', methods=['GET'])
 def get_user_meals(user_id):
-    """Récupérer les repas d'un utilisateur"""
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
+    """Récupérer les repas d'un utilisateur, du plus récent au plus ancien
+    
+    Pagination par clé : limit (défaut 50, max 200) et cursor (next_cursor
+    de la page précédente). start_date et end_date sont des dates ISO 8601,
+    comparées après conversion en UTC.
+    """
+    try:
+        start_ts, end_ts = period_args()
+    except ValueError:
+        return jsonify({'error': 'start_date et end_date doivent être des dates ISO 8601'}), 400
+    
+    try:
+        limit, after = keyset_page_args(integer_key=True)
+    except ValueError:
+        return jsonify({'error': 'Paramètres de pagination invalides'}), 400
     
-    meals = meal_dao.get_user_meals(user_id, start_date, end_date)
+    meals = meal_dao.get_user_meals_page(user_id, after, limit, start_ts, end_ts)
     
     meals_list = []
     for meal in meals:
         meals_list.append({
-            'id': meal[0],
-            'user_id': meal[1],
-            'food_id': meal[2],
-            'meal_time': meal[3],
-            'quantity': meal[4],
-            'notes': meal[5],
-            'food_name': meal[6],
-            'ingredients': meal[7]
+            'id': meal.id,
+            'user_id': meal.user_id,
+            'food_id': meal.food_id,
+            'meal_time': meal.meal_time,
+            'quantity': meal.quantity,
+            'notes': meal.notes,
+            'food_name': meal.food_name,
+            'ingredients': meal.ingredients
         })
     
-    return jsonify({'meals': meals_list})
+    next_cursor = encode_cursor([meals[-1].meal_ts, meals[-1].id]) if len(meals) == limit else None
+    return jsonify({'meals': meals_list, 'next_cursor': next_cursor})
 
-@app.route('/api/symptoms', methods=['POST'])
+@api.route('/api/symptoms', methods=['POST'])
 def create_symptom():
     """Enregistrer un symptôme"""
     data = request.get_json()
@@ -1073,6 +4487,11 @@ def create_symptom():
     if not (1 <= data['severity'] <= 5):
         return jsonify({'error': 'La sévérité doit être entre 1 et 5'}), 400
     
+    try:
+        to_epoch_ms(data['occurrence_time'])
+    except ValueError:
+        return jsonify({'error': 'occurrence_time doit être une date ISO 8601'}), 400
+    
     symptom_id = symptom_dao.create_symptom(
         user_id=data['user_id'],
         symptom_type=data['symptom_type'],
@@ -1081,39 +4500,50 @@ def create_symptom():
         description=data.get('description')
     )
     
+    if symptom_id is None:
+        return jsonify({'error': 'Utilisateur inexistant'}), 400
+    
     return jsonify({
         'success': True,
         'symptom_id': symptom_id,
         'message': 'Symptôme enregistré avec succès'
     })
 
-@app.route('/api/users/<int:user_id>/symptoms', methods=['GET'])
+@api.route('/api/users/<int:user_id>/symptoms', methods=['GET'])
 def get_user_symptoms(user_id):
-    """Récupérer les symptômes d'un utilisateur"""
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
+    """Récupérer les symptômes d'un utilisateur, du plus récent au plus ancien (pagination par clé)"""
+    try:
+        start_ts, end_ts = period_args()
+    except ValueError:
+        return jsonify({'error': 'start_date et end_date doivent être des dates ISO 8601'}), 400
+    
+    try:
+        limit, after = keyset_page_args(integer_key=True)
+    except ValueError:
+        return jsonify({'error': 'Paramètres de pagination invalides'}), 400
     
-    symptoms = symptom_dao.get_user_symptoms(user_id, start_date, end_date)
+    symptoms = symptom_dao.get_user_symptoms_page(user_id, after, limit, start_ts, end_ts)
     
     symptoms_list = []
     for symptom in symptoms:
         symptoms_list.append({
-            'id': symptom[0],
-            'user_id': symptom[1],
-            'symptom_type': symptom[2],
-            'severity': symptom[3],
-            'occurrence_time': symptom[4],
-            'description': symptom[5]
+            'id': symptom.id,
+            'user_id': symptom.user_id,
+            'symptom_type': symptom.symptom_type,
+            'severity': symptom.severity,
+            'occurrence_time': symptom.occurrence_time,
+            'description': symptom.description
         })
     
-    return jsonify({'symptoms': symptoms_list})
+    next_cursor = encode_cursor([symptoms[-1].occurrence_ts, symptoms[-1].id]) if len(symptoms) == limit else None
+    return jsonify({'symptoms': symptoms_list, 'next_cursor': next_cursor})
 
-@app.route('/api/users/<int:user_id>/allergy-analysis', methods=['GET'])
+@api.route('/api/users/<int:user_id>/allergy-analysis', methods=['GET'])
 def analyze_allergies(user_id):
     """Analyser les allergies potentielles d'un utilisateur"""
     threshold = float(request.args.get('threshold', 30))
     
-    potential_allergies = AllergyDetectionEngine.detect_potential_allergies(user_id, threshold)
+    potential_allergies = get_potential_allergies(user_id, threshold)
     
     return jsonify({
         'user_id': user_id,
@@ -1123,7 +4553,7 @@ def analyze_allergies(user_id):
         'total_detected': len(potential_allergies)
     })
 
-@app.route('/api/users/<int:user_id>/food-risk/<int:food_id>', methods=['GET'])
+@api.route('/api/users/<int:user_id>/food-risk/<int:food_id>', methods=['GET'])
 def get_food_risk_score(user_id, food_id):
     """Calculer le score de risque pour un aliment spécifique"""
     days_back = int(request.args.get('days', 30))
@@ -1144,7 +4574,7 @@ def get_food_risk_score(user_id, food_id):
     })
 
 # Module de planification hebdomadaire
-@app.route('/api/users/<int:user_id>/weekly-plan', methods=['POST'])
+@api.route('/api/users/<int:user_id>/weekly-plan', methods=['POST'])
 def create_weekly_plan(user_id):
     """Créer un plan alimentaire hebdomadaire"""
     data = request.get_json()
@@ -1181,29 +4611,45 @@ def create_weekly_plan(user_id):
         except Exception as e:
             return jsonify({'error': str(e)}), 500
 
-@app.route('/api/users/<int:user_id>/weekly-plan', methods=['GET'])
+def weekly_plan_query(user_id, week_start=None, after=None, limit=MAX_PAGE_SIZE):
+    """(requête, paramètres) d'une page du plan hebdomadaire ; partagée avec HOT_QUERIES"""
+    query = '''
+        SELECT wp.*, f.name as food_name, f.category, f.ingredients
+        FROM weekly_plans wp
+        JOIN foods f ON wp.food_id = f.id
+        WHERE wp.user_id = ?
+    '''
+    params = [user_id]
+    
+    if week_start:
+        query += " AND wp.week_start_date = ?"
+        params.append(week_start)
+    
+    if after is not None:
+        query += " AND (wp.day_of_week, wp.meal_type, wp.id) > (?, ?, ?)"
+        params.extend(after)
+    
+    query += " ORDER BY wp.day_of_week, wp.meal_type, wp.id LIMIT ?"
+    params.append(limit)
+    return query, params
+
+@api.route('/api/users/<int:user_id>/weekly-plan', methods=['GET'])
 def get_weekly_plan(user_id):
-    """Récupérer le plan alimentaire hebdomadaire"""
+    """Récupérer le plan alimentaire hebdomadaire
+    
+    Au plus limit entrées (défaut et max 200) dans l'ordre (jour, repas) ;
+    next_cursor permet de demander la suite.
+    """
     week_start = request.args.get('week_start_date')
     
+    try:
+        limit, after = keyset_page_args(default=MAX_PAGE_SIZE, key_length=3)
+    except ValueError:
+        return jsonify({'error': 'Paramètres de pagination invalides'}), 400
+    
     with db_dao.get_connection() as conn:
         cursor = conn.cursor()
-        
-        query = '''
-            SELECT wp.*, f.name as food_name, f.category, f.ingredients
-            FROM weekly_plans wp
-            JOIN foods f ON wp.food_id = f.id
-            WHERE wp.user_id = ?
-        '''
-        params = [user_id]
-        
-        if week_start:
-            query += " AND wp.week_start_date = ?"
-            params.append(week_start)
-        
-        query += " ORDER BY wp.day_of_week, wp.meal_type"
-        
-        cursor.execute(query, params)
+        cursor.execute(*weekly_plan_query(user_id, week_start, after, limit))
         plans = cursor.fetchall()
         
         weekly_plan = []
@@ -1219,14 +4665,27 @@ def get_weekly_plan(user_id):
                 'ingredients': plan[9]
             })
         
+        next_cursor = None
+        if len(plans) == limit:
+            next_cursor = encode_cursor([plans[-1][3], plans[-1][4], plans[-1][0]])
+        
         return jsonify({
             'user_id': user_id,
             'week_start_date': week_start,
-            'weekly_plan': weekly_plan
+            'weekly_plan': weekly_plan,
+            'next_cursor': next_cursor
         })
 
 # Module de gestion de buffet
-@app.route('/api/buffet-events', methods=['POST'])
+
+# Aliments d'un buffet (détail et calcul des quantités) ; partagée avec HOT_QUERIES
+BUFFET_FOODS_SQL = '''
+    SELECT bf.*, f.name as food_name, f.category, f.ingredients
+    FROM buffet_foods bf
+    JOIN foods f ON bf.food_id = f.id
+    WHERE bf.buffet_id = ?
+'''
+@api.route('/api/buffet-events', methods=['POST'])
 def create_buffet_event():
     """Créer un événement buffet"""
     data = request.get_json()
@@ -1238,32 +4697,36 @@ def create_buffet_event():
     with db_dao.get_connection() as conn:
         cursor = conn.cursor()
         
-        cursor.execute('''
-            INSERT INTO buffet_events (event_name, event_date, estimated_guests, created_by)
-            VALUES (?, ?, ?, ?)
-        ''', (
-            data['event_name'],
-            data['event_date'],
-            data['estimated_guests'],
-            data['created_by']
-        ))
-        
-        buffet_id = cursor.lastrowid
-        
-        # Ajouter les aliments du buffet si fournis
-        if 'foods' in data:
-            for food_item in data['foods']:
-                cursor.execute('''
-                    INSERT INTO buffet_foods (buffet_id, food_id, planned_quantity, unit)
-                    VALUES (?, ?, ?, ?)
-                ''', (
-                    buffet_id,
-                    food_item['food_id'],
-                    food_item.get('planned_quantity', 1),
-                    food_item.get('unit', 'portions')
-                ))
-        
-        conn.commit()
+        try:
+            cursor.execute('''
+                INSERT INTO buffet_events (event_name, event_date, estimated_guests, created_by)
+                VALUES (?, ?, ?, ?)
+            ''', (
+                data['event_name'],
+                data['event_date'],
+                data['estimated_guests'],
+                data['created_by']
+            ))
+            
+            buffet_id = cursor.lastrowid
+            
+            # Ajouter les aliments du buffet si fournis
+            if 'foods' in data:
+                for food_item in data['foods']:
+                    cursor.execute('''
+                        INSERT INTO buffet_foods (buffet_id, food_id, planned_quantity, unit)
+                        VALUES (?, ?, ?, ?)
+                    ''', (
+                        buffet_id,
+                        food_item['food_id'],
+                        food_item.get('planned_quantity', 1),
+                        food_item.get('unit', 'portions')
+                    ))
+            
+            conn.commit()
+        except sqlite3.IntegrityError:
+            conn.rollback()
+            return jsonify({'error': 'Créateur ou aliment inexistant'}), 400
         
         return jsonify({
             'success': True,
@@ -1271,7 +4734,7 @@ def create_buffet_event():
             'message': 'Événement buffet créé avec succès'
         })
 
-@app.route('/api/buffet-events/<int:buffet_id>', methods=['GET'])
+@api.route('/api/buffet-events/<int:buffet_id>', methods=['GET'])
 def get_buffet_event(buffet_id):
     """Récupérer les détails d'un événement buffet"""
     with db_dao.get_connection() as conn:
@@ -1291,12 +4754,7 @@ def get_buffet_event(buffet_id):
             return jsonify({'error': 'Événement non trouvé'}), 404
         
         # Récupérer les aliments du buffet
-        cursor.execute('''
-            SELECT bf.*, f.name as food_name, f.category, f.ingredients
-            FROM buffet_foods bf
-            JOIN foods f ON bf.food_id = f.id
-            WHERE bf.buffet_id = ?
-        ''', (buffet_id,))
+        cursor.execute(BUFFET_FOODS_SQL, (buffet_id,))
         
         foods = cursor.fetchall()
         
@@ -1322,19 +4780,34 @@ def get_buffet_event(buffet_id):
             'foods': buffet_foods
         })
 
-@app.route('/api/buffet-events', methods=['GET'])
+@api.route('/api/buffet-events', methods=['GET'])
 def get_buffet_events():
-    """Récupérer tous les événements buffet"""
+    """Récupérer les événements buffet, du plus récent au plus ancien
+    
+    Au plus limit événements (défaut et max 200) ; next_cursor permet de
+    demander la suite.
+    """
+    try:
+        limit, after = keyset_page_args(default=MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'Paramètres de pagination invalides'}), 400
+    
     with db_dao.get_connection() as conn:
         cursor = conn.cursor()
         
-        cursor.execute('''
+        query = '''
             SELECT be.*, u.username 
             FROM buffet_events be
             JOIN users u ON be.created_by = u.id
-            ORDER BY be.event_date DESC
-        ''')
+        '''
+        params = []
+        if after is not None:
+            query += " WHERE (COALESCE(be.event_date, ''), be.id) < (?, ?)"
+            params.extend(after)
+        query += " ORDER BY COALESCE(be.event_date, '') DESC, be.id DESC LIMIT ?"
+        params.append(limit)
         
+        cursor.execute(query, params)
         events = cursor.fetchall()
         
         events_list = []
@@ -1348,9 +4821,13 @@ def get_buffet_events():
                 'creator_username': event[5]
             })
         
-        return jsonify({'buffet_events': events_list})
+        next_cursor = None
+        if len(events) == limit:
+            next_cursor = encode_cursor([events[-1][2] or '', events[-1][0]])
+        
+        return jsonify({'buffet_events': events_list, 'next_cursor': next_cursor})
 
-@app.route('/api/buffet-events/<int:buffet_id>/calculate-quantities', methods=['GET'])
+@api.route('/api/buffet-events/<int:buffet_id>/calculate-quantities', methods=['GET'])
 def calculate_buffet_quantities(buffet_id):
     """Calculer les quantités recommandées pour un buffet"""
     with db_dao.get_connection() as conn:
@@ -1366,12 +4843,7 @@ def calculate_buffet_quantities(buffet_id):
         estimated_guests = event[3]
         
         # Récupérer les aliments du buffet
-        cursor.execute('''
-            SELECT bf.*, f.name as food_name, f.category
-            FROM buffet_foods bf
-            JOIN foods f ON bf.food_id = f.id
-            WHERE bf.buffet_id = ?
-        ''', (buffet_id,))
+        cursor.execute(BUFFET_FOODS_SQL, (buffet_id,))
         
         foods = cursor.fetchall()
         
@@ -1410,31 +4882,31 @@ def calculate_buffet_quantities(buffet_id):
         })
 
 # Routes utilitaires et statistiques
-@app.route('/api/users/<int:user_id>/dashboard', methods=['GET'])
+@api.route('/api/users/<int:user_id>/dashboard', methods=['GET'])
 def get_user_dashboard(user_id):
     """Tableau de bord utilisateur avec statistiques"""
     try:
         # Période d'analyse (30 derniers jours par défaut)
         days_back = int(request.args.get('days', 30))
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days_back)
+        end_ts = epoch_ms_now()
+        start_ts = end_ts - days_back * MS_PER_DAY
         
         # Statistiques des repas
-        meals = meal_dao.get_user_meals(user_id, start_date.isoformat(), end_date.isoformat())
+        meals = meal_dao.get_user_meals(user_id, start_ts, end_ts)
         total_meals = len(meals)
         
         # Statistiques des symptômes
-        symptoms = symptom_dao.get_user_symptoms(user_id, start_date.isoformat(), end_date.isoformat())
+        symptoms = symptom_dao.get_user_symptoms(user_id, start_ts, end_ts)
         total_symptoms = len(symptoms)
         
         # Analyse des allergies
-        potential_allergies = AllergyDetectionEngine.detect_potential_allergies(user_id)
+        potential_allergies = get_potential_allergies(user_id)
         high_risk_foods = [allergy for allergy in potential_allergies if allergy['risk_score'] >= 50]
         
         # Aliments les plus consommés
         food_consumption = defaultdict(int)
         for meal in meals:
-            food_consumption[meal[6]] += 1  # food_name
+            food_consumption[meal.food_name] += 1
         
         most_consumed = sorted(food_consumption.items(), key=lambda x: x[1], reverse=True)[:5]
         
@@ -1460,28 +4932,194 @@ def get_user_dashboard(user_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/health', methods=['GET'])
+@api.route('/api/health', methods=['GET'])
 def health_check():
-    """Vérification de l'état de l'API"""
+    """Vérification de l'état de l'API (503 si la base ne répond pas)"""
+    started = time.perf_counter()
+    try:
+        with db_dao.get_connection() as conn:
+            conn.execute("SELECT 1 FROM schema_version LIMIT 1").fetchall()
+        database = 'Connected'
+    except (sqlite3.Error, PoolTimeoutError) as e:
+        database = f'Unavailable: {e}'
+    
+    healthy = database == 'Connected'
     return jsonify({
-        'status': 'OK',
+        'status': 'OK' if healthy else 'DEGRADED',
         'timestamp': datetime.now().isoformat(),
         'version': '1.0.0',
-        'database': 'Connected'
-    })
+        'database': database,
+        'database_latency_ms': round((time.perf_counter() - started) * 1000, 3),
+        'database_pool': db_dao.pool.stats(),
+        'catalog_cache': food_catalog_cache.stats(),
+        'analysis_cache': analysis_cache.stats()
+    }), 200 if healthy else 503
+
+@api.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Métriques au format texte Prometheus (tous les workers gunicorn additionnés)"""
+    return current_app.response_class(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+# Export en flux : sections exportées dans l'ordre, chacune du plus récent au plus ancien
+EXPORT_CHUNK_SIZE = 500
+EXPORT_CSV_COLUMNS = (
+    'record_type', 'id', 'time', 'food_id', 'food_name', 'quantity', 'notes', 'ingredients',
+    'symptom_type', 'severity', 'description', 'cursor'
+)
+
+def export_meal_record(meal):
+    return {
+        'id': meal.id,
+        'food_id': meal.food_id,
+        'food_name': meal.food_name,
+        'meal_time': meal.meal_time,
+        'quantity': meal.quantity,
+        'notes': meal.notes,
+        'ingredients': meal.ingredients
+    }
+
+def export_symptom_record(symptom):
+    return {
+        'id': symptom.id,
+        'symptom_type': symptom.symptom_type,
+        'severity': symptom.severity,
+        'occurrence_time': symptom.occurrence_time,
+        'description': symptom.description
+    }
+
+# section -> (lecture d'une page, champ de temps, conversion en dictionnaire) ;
+# les DAO n'existent qu'après create_app(), d'où la résolution à l'appel
+EXPORT_SECTIONS = (
+    ('meal', lambda *args: meal_dao.get_user_meals_page(*args), 'meal_ts', export_meal_record),
+    ('symptom', lambda *args: symptom_dao.get_user_symptoms_page(*args), 'occurrence_ts', export_symptom_record),
+)
+
+def iter_export_chunks(user_id, resume=None):
+    """Lots de (type, enregistrement, curseur de reprise) à mémoire constante
+    
+    Chaque lot est une requête par clé (temps, id) : aucune connexion n'est
+    gardée pendant que le client lit le flux.
+    """
+    section_index, after = 0, None
+    if resume is not None:
+        section_index, after = resume[0], (resume[1], resume[2])
+    
+    for index in range(section_index, len(EXPORT_SECTIONS)):
+        record_type, read_page, time_field, to_record = EXPORT_SECTIONS[index]
+        if index != section_index:
+            after = None
+        
+        while True:
+            rows = read_page(user_id, after, EXPORT_CHUNK_SIZE)
+            if not rows:
+                break
+            yield [
+                (record_type, to_record(row), encode_cursor([index, getattr(row, time_field), row.id]))
+                for row in rows
+            ]
+            if len(rows) < EXPORT_CHUNK_SIZE:
+                break
+            after = (getattr(rows[-1], time_field), rows[-1].id)
+
+def stream_export(user, export_format, resume=None, compress=False):
+    """Générateur du corps de l'export NDJSON ou CSV, éventuellement compressé en gzip"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    
+    def encode(text):
+        data = text.encode('utf-8')
+        # Z_SYNC_FLUSH : chaque lot est transmis sans attendre la fin du flux
+        return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH) if compressor else data
+    
+    if export_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if resume is None:
+            writer.writerow(EXPORT_CSV_COLUMNS)
+    else:
+        buffer = None
+        if resume is None:
+            yield encode(json.dumps({
+                'type': 'user',
+                'id': user[0],
+                'username': user[1],
+                'email': user[2],
+                'created_at': user[3]
+            }, ensure_ascii=False) + '\n')
+    
+    for chunk in iter_export_chunks(user[0], resume):
+        if export_format == 'csv':
+            for record_type, record, cursor in chunk:
+                writer.writerow((
+                    record_type, record['id'], record.get('meal_time') or record.get('occurrence_time'),
+                    record.get('food_id'), record.get('food_name'), record.get('quantity'),
+                    record.get('notes'), record.get('ingredients'), record.get('symptom_type'),
+                    record.get('severity'), record.get('description'), cursor
+                ))
+            text = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        else:
+            text = ''.join(
+                json.dumps(dict(record, type=record_type, cursor=cursor), ensure_ascii=False) + '\n'
+                for record_type, record, cursor in chunk
+            )
+        yield encode(text)
+    
+    if export_format != 'csv':
+        # Lecture indexée du store matérialisé : une reprise (?cursor=) ne relance aucune analyse
+        yield encode(json.dumps({
+            'type': 'end',
+            'allergy_analysis': risk_store.detect_potential_allergies(user[0]),
+            'export_date': datetime.now().isoformat()
+        }, ensure_ascii=False) + '\n')
+    
+    if compressor:
+        yield compressor.flush()
 
-@app.route('/api/export/<int:user_id>/data', methods=['GET'])
+@api.route('/api/export/<int:user_id>/data', methods=['GET'])
 def export_user_data(user_id):
-    """Exporter toutes les données d'un utilisateur"""
+    """Exporter toutes les données d'un utilisateur
+    
+    ?format=ndjson ou csv : export en flux, à mémoire constante, compressé en
+    gzip si le client l'accepte. Chaque ligne porte un curseur ; ?cursor=
+    reprend l'export juste après cette ligne.
+    """
     try:
         # Récupérer toutes les données
         user = user_dao.get_user(user_id)
         if not user:
             return jsonify({'error': 'Utilisateur non trouvé'}), 404
         
+        export_format = request.args.get('format', 'json')
+        if export_format in ('ndjson', 'csv'):
+            resume = None
+            if request.args.get('cursor'):
+                try:
+                    resume = decode_cursor(request.args['cursor'])
+                    if (len(resume) != 3 or resume[0] not in range(len(EXPORT_SECTIONS))
+                            or not all(type(value) is int for value in resume)):
+                        raise ValueError(resume)
+                except (ValueError, TypeError):
+                    return jsonify({'error': 'Curseur invalide'}), 400
+            
+            compress = 'gzip' in request.accept_encodings
+            response = current_app.response_class(
+                stream_with_context(stream_export(user, export_format, resume, compress)),
+                mimetype='application/x-ndjson' if export_format == 'ndjson' else 'text/csv'
+            )
+            response.headers['Content-Disposition'] = (
+                f'attachment; filename=export_{user_id}.{export_format}'
+            )
+            response.vary.add('Accept-Encoding')
+            if compress:
+                response.headers['Content-Encoding'] = 'gzip'
+            return response
+        if export_format != 'json':
+            return jsonify({'error': f'Format inconnu: {export_format}', 'allowed_formats': ['json', 'ndjson', 'csv']}), 400
+        
         meals = meal_dao.get_user_meals(user_id)
         symptoms = symptom_dao.get_user_symptoms(user_id)
-        potential_allergies = AllergyDetectionEngine.detect_potential_allergies(user_id)
+        potential_allergies = get_potential_allergies(user_id)
         
         export_data = {
             'user_info': {
@@ -1492,21 +5130,21 @@ def export_user_data(user_id):
             },
             'meals': [
                 {
-                    'id': meal[0],
-                    'food_name': meal[6],
-                    'meal_time': meal[3],
-                    'quantity': meal[4],
-                    'notes': meal[5],
-                    'ingredients': meal[7]
+                    'id': meal.id,
+                    'food_name': meal.food_name,
+                    'meal_time': meal.meal_time,
+                    'quantity': meal.quantity,
+                    'notes': meal.notes,
+                    'ingredients': meal.ingredients
                 } for meal in meals
             ],
             'symptoms': [
                 {
-                    'id': symptom[0],
-                    'symptom_type': symptom[2],
-                    'severity': symptom[3],
-                    'occurrence_time': symptom[4],
-                    'description': symptom[5]
+                    'id': symptom.id,
+                    'symptom_type': symptom.symptom_type,
+                    'severity': symptom.severity,
+                    'occurrence_time': symptom.occurrence_time,
+                    'description': symptom.description
                 } for symptom in symptoms
             ],
             'allergy_analysis': potential_allergies,
@@ -1519,14 +5157,14 @@ def export_user_data(user_id):
         return jsonify({'error': str(e)}), 500
 
 # Routes de recommandations intelligentes
-@app.route('/api/users/<int:user_id>/recommendations', methods=['GET'])
+@api.route('/api/users/<int:user_id>/recommendations', methods=['GET'])
 def get_recommendations(user_id):
     """Obtenir des recommandations personnalisées"""
     try:
         # Analyser les habitudes alimentaires
         meals = meal_dao.get_user_meals(user_id)
         symptoms = symptom_dao.get_user_symptoms(user_id)
-        potential_allergies = AllergyDetectionEngine.detect_potential_allergies(user_id)
+        potential_allergies = get_potential_allergies(user_id)
         
         recommendations = []
         
@@ -1545,7 +5183,7 @@ def get_recommendations(user_id):
         # Recommandations de diversification
         food_variety = defaultdict(int)
         for meal in meals[-30:]:  # 30 derniers repas
-            food_variety[meal[6]] += 1
+            food_variety[meal.food_name] += 1
         
         if len(food_variety) < 5:
             recommendations.append({
@@ -1560,7 +5198,7 @@ def get_recommendations(user_id):
         if len(symptoms) > 10:  # Plus de 10 symptômes
             symptom_types = defaultdict(int)
             for symptom in symptoms:
-                symptom_types[symptom[2]] += 1
+                symptom_types[symptom.symptom_type] += 1
             
             most_common = max(symptom_types.items(), key=lambda x: x[1])
             recommendations.append({
@@ -1581,10 +5219,9 @@ def get_recommendations(user_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 # 6. Nouvelles routes pour la gestion des images
-@app.route('/api/foods/<int:food_id>/images', methods=['POST'])
+@api.route('/api/foods/<int:food_id>/images', methods=['POST'])
 def add_food_image(food_id):
-    image_manager = ImageManager()
-    """Ajouter une image à un aliment existant"""
+    """Ajouter une image à un aliment existant (téléchargement en arrière-plan)"""
     data = request.get_json()
     
     if not data or 'image_url' not in data:
@@ -1594,34 +5231,46 @@ def add_food_image(food_id):
     food = food_dao.get_food(food_id)
     if not food:
         return jsonify({'error': 'Aliment non trouvé'}), 404
-    # Télécharger l'image
-    result = image_manager.download_and_save_image(
-        image_url=data['image_url'],
-        food_id=food_id,
-        food_name=food[1],  # nom de l'aliment
-        is_primary=data.get('is_primary', False)
-    )
     
-    if result['success']:
-        return jsonify({
-            'success': True,
-            'message': 'Image ajoutée avec succès',
-            'image_data': result
-        })
-    else:
-        return jsonify({
-            'success': False,
-            'error': result['error']
-        }), 400
+    job_id = image_jobs.enqueue(food_id, data['image_url'], is_primary=data.get('is_primary', False))
+    
+    return jsonify({
+        'success': True,
+        'message': 'Téléchargement de l\'image programmé',
+        'job_id': job_id,
+        'status': 'pending',
+        'status_url': f"/api/jobs/{job_id}"
+    }), 202
+
+@api.route('/api/jobs/<int:job_id>', methods=['GET'])
+def get_image_job(job_id):
+    """État d'un téléchargement d'image"""
+    job = image_jobs.get_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job non trouvé'}), 404
+    
+    return jsonify({
+        'job_id': job[0],
+        'food_id': job[1],
+        'original_url': job[2],
+        'is_primary': bool(job[3]),
+        'status': job[4],
+        'attempts': job[5],
+        'error': job[6],
+        'image_id': job[7],
+        'image_url': media_url(job[8]),
+        'created_at': job[9],
+        'updated_at': job[10]
+    })
 
-@app.route('/api/foods/<int:food_id>/images', methods=['GET'])
+@api.route('/api/foods/<int:food_id>/images', methods=['GET'])
 def get_food_images(food_id):
     """Récupérer toutes les images d'un aliment"""
-    food = food_dao.get_food(food_id)
+    version, food = food_catalog_cache.get_food(food_id)
     if not food:
         return jsonify({'error': 'Aliment non trouvé'}), 404
     
-    images = image_manager.get_food_images(food_id)
+    images = image_manager.get_food_images(food_id, version)
     
     return jsonify({
         'food_id': food_id,
@@ -1630,7 +5279,7 @@ def get_food_images(food_id):
         'total_images': len(images)
     })
 
-@app.route('/api/images/<int:image_id>/primary', methods=['PUT'])
+@api.route('/api/images/<int:image_id>/primary', methods=['PUT'])
 def set_primary_image(image_id):
     """Définir une image comme image principale"""
     success = image_manager.set_primary_image(image_id)
@@ -1646,7 +5295,7 @@ def set_primary_image(image_id):
             'error': 'Image non trouvée'
         }), 404
 
-@app.route('/api/images/<int:image_id>', methods=['DELETE'])
+@api.route('/api/images/<int:image_id>', methods=['DELETE'])
 def delete_image(image_id):
     """Supprimer une image"""
     success = image_manager.delete_image(image_id)
@@ -1662,13 +5311,73 @@ def delete_image(image_id):
             'error': 'Impossible de supprimer l\'image'
         }), 404
 
-@app.route('/api/media/<path:filename>', methods=['GET'])
+# Service des médias : noms adressés par contenu (ab/cd/<sha256>[_taille].ext) immuables
+CONTENT_ADDRESSED_MEDIA = re.compile(r'^[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64}(?:_[a-z]+)?\.[a-z0-9]+)$')
+MEDIA_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+MEDIA_MAX_AGE = int(os.environ.get('MEDIA_MAX_AGE', 3600))
+# Délégation à un reverse proxy : préfixe interne nginx (X-Accel-Redirect) ou X-Sendfile
+MEDIA_ACCEL_REDIRECT_PREFIX = os.environ.get('MEDIA_ACCEL_REDIRECT_PREFIX')
+MEDIA_X_SENDFILE = os.environ.get('MEDIA_X_SENDFILE', '').lower() in ('1', 'true', 'yes')
+
+@api.route('/api/media/<path:filename>', methods=['GET'])
 def serve_media(filename):
-    """Servir les fichiers media"""
-    try:
-        return send_from_directory(MEDIA_FOLDER, filename)
-    except FileNotFoundError:
-        return jsonify({'error': 'Fichier non trouvé'}), 404
+    """Servir les fichiers media
+    
+    ?size=thumb|medium|large sert la variante redimensionnée, en WebP si le
+    client l'accepte (ou selon ?format=webp|jpeg). L'original est servi si la
+    variante n'a pas été générée.
+    
+    Les réponses gèrent If-None-Match/If-Modified-Since (304) et Range (206) ;
+    le corps est transmis par wsgi.file_wrapper (sendfile sous gunicorn) ou
+    délégué au reverse proxy (MEDIA_ACCEL_REDIRECT_PREFIX, MEDIA_X_SENDFILE).
+    """
+    size = request.args.get('size')
+    negotiated = False
+    
+    if size:
+        if size not in ImageManager.VARIANT_SIZES:
+            return jsonify({
+                'error': f'Taille inconnue: {size}',
+                'allowed_sizes': list(ImageManager.VARIANT_SIZES)
+            }), 400
+        
+        image_format = request.args.get('format')
+        if image_format is None:
+            image_format = 'webp' if request.accept_mimetypes['image/webp'] else 'jpeg'
+            negotiated = True
+        if image_format not in ImageManager.VARIANT_FORMATS:
+            return jsonify({
+                'error': f'Format inconnu: {image_format}',
+                'allowed_formats': list(ImageManager.VARIANT_FORMATS)
+            }), 400
+        
+        variant = ImageManager.variant_path(filename, size, image_format)
+        if os.path.isfile(os.path.join(MEDIA_FOLDER, variant)):
+            filename = variant
+    
+    # Un nom adressé par contenu ne change jamais de contenu : l'empreinte sert d'ETag
+    content_addressed = CONTENT_ADDRESSED_MEDIA.match(filename)
+    etag = content_addressed.group(1) if content_addressed else True
+    max_age = MEDIA_IMMUTABLE_MAX_AGE if content_addressed else MEDIA_MAX_AGE
+    
+    if MEDIA_ACCEL_REDIRECT_PREFIX:
+        if not os.path.isfile(safe_join(os.path.abspath(MEDIA_FOLDER), filename) or ''):
+            return jsonify({'error': 'Fichier non trouvé'}), 404
+        response = current_app.response_class(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = MEDIA_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + filename
+    else:
+        try:
+            response = send_from_directory(os.path.abspath(MEDIA_FOLDER), filename, etag=etag, max_age=max_age)
+        except NotFound:
+            return jsonify({'error': 'Fichier non trouvé'}), 404
+    
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    if content_addressed:
+        response.cache_control.immutable = True
+    if negotiated:
+        response.vary.add('Accept')
+    return response
 
 if __name__ == '__main__':
     # Créer le dossier media s'il n'existe pas
@@ -1686,4 +5395,4 @@ if __name__ == '__main__':
     print("🔗 Utilisez Postman pour tester les endpoints")
     print("📊 Initialisez les données avec POST /api/init-data")
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    create_app().run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
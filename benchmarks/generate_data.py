@@ -0,0 +1,166 @@
+"""Générateur de bases synthétiques : utilisateurs, aliments, repas et symptômes
+
+Une partie des utilisateurs reçoit un ou deux allergènes (ingrédients). Les
+repas contenant l'un d'eux déclenchent le plus souvent un symptôme dans la
+fenêtre du moteur de détection (2 h à 12 h après le repas), les autres
+symptômes sont du bruit de faible sévérité. Chaque utilisateur a ses plats
+favoris, ce qui produit des aliments consommés de façon répétée. Les repas et
+symptômes passent par les insertions en lot des DAO (triggers du store de
+risque compris). Une même graine donne la même base.
+
+Usage : python benchmarks/generate_data.py --output bench.db --users 1000 --foods 200 --days 30
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ALLERGENS = ['arachides', 'crevettes', 'crabe', 'poisson', 'lait', 'œufs', 'blé', 'soja', 'sésame']
+INGREDIENTS = [
+    'huile de palme', 'poulet', 'bœuf', 'plantain', 'carotte', 'haricots', 'gingembre', 'eru',
+    'épices', 'tomates', 'oignons', 'ail', 'manioc', 'igname', 'macabo', 'gombo', 'okok',
+    'piment', 'riz', 'maïs', 'banane', 'safou', 'avocat', 'feuilles de ndolé', 'pistache'
+]
+CATEGORIES = ['Plat principal', 'Accompagnement', 'Légume', 'Dessert', 'Boisson', 'Entrée']
+REACTIONS = ['Démangeaisons', 'Urticaire', 'Maux de ventre', 'Gonflement des lèvres', 'Nausées', 'Diarrhée']
+NOISE_SYMPTOMS = ['Fatigue', 'Maux de tête', 'Ballonnements']
+MEAL_HOURS = (7, 12, 19)
+SNACK_HOURS = (10, 16, 22)
+
+
+def iso(ts):
+    return datetime.fromtimestamp(ts / 1000, timezone.utc).replace(tzinfo=None).isoformat(timespec='seconds')
+
+
+def insert_foods(app, count, rng):
+    """Plats camerounais de référence, complétés par des plats synthétiques ; retourne [(id, ingrédients)]"""
+    rows = [(food['name'], food['category'], food['ingredients'], True) for food in app.CAMEROON_FOODS_DATA]
+    for i in range(max(0, count - len(rows))):
+        ingredients = rng.sample(INGREDIENTS, rng.randint(3, 6))
+        if rng.random() < 0.35:
+            ingredients.insert(rng.randint(0, len(ingredients)), rng.choice(ALLERGENS))
+        name = f"{ingredients[0].capitalize()} aux {ingredients[1]} {i}"
+        rows.append((name, rng.choice(CATEGORIES), ', '.join(ingredients), False))
+    
+    with app.db_dao.get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO foods (name, category, ingredients, is_base_food) VALUES (?, ?, ?, ?)", rows
+        )
+        conn.commit()
+        return conn.execute("SELECT id, ingredients FROM foods ORDER BY id").fetchall()
+
+
+def insert_in_batches(insert, rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        insert(rows[start:start + batch_size])
+
+
+def generate(app, users=1000, foods=200, days=30, meals_per_day=3, allergic_ratio=0.3, seed=42, end_ts=None):
+    """Remplir la base de l'application (create_app() déjà appelé) ; retourne un résumé"""
+    rng = random.Random(seed)
+    # Jusqu'à minuit UTC : des journées complètes, donc la même base quelle que soit l'heure du lancement
+    if end_ts is None:
+        end_ts = app.epoch_ms_now() // app.MS_PER_DAY * app.MS_PER_DAY
+    start_day = end_ts - days * app.MS_PER_DAY
+    
+    catalog = insert_foods(app, foods, rng)
+    allergen_foods = {
+        allergen: {food_id for food_id, ingredients in catalog if allergen in ingredients.lower()}
+        for allergen in ALLERGENS
+    }
+    
+    with app.db_dao.get_connection() as conn:
+        first_id = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM users").fetchone()[0]
+        conn.executemany(
+            "INSERT INTO users (username, email) VALUES (?, ?)",
+            [(f'user{first_id + i}', f'user{first_id + i}@example.com') for i in range(users)]
+        )
+        conn.commit()
+    
+    meals, symptoms = [], []
+    allergic_users = 0
+    food_ids = [food_id for food_id, _ in catalog]
+    for user_id in range(first_id, first_id + users):
+        allergens = rng.sample(ALLERGENS, rng.randint(1, 2)) if rng.random() < allergic_ratio else []
+        allergic_users += bool(allergens)
+        triggers = set().union(*(allergen_foods[allergen] for allergen in allergens))
+        favorites = rng.sample(food_ids, min(15, len(food_ids)))
+        
+        for day in range(days):
+            day_ts = start_day + day * app.MS_PER_DAY
+            count = max(1, meals_per_day + rng.randint(-1, 1))
+            # Repas principaux, puis collations au-delà de trois repas
+            hours = list(MEAL_HOURS[:count]) + [rng.choice(SNACK_HOURS) for _ in range(count - len(MEAL_HOURS))]
+            for hour in hours:
+                meal_ts = day_ts + hour * 3600000 + rng.randint(0, 3600000)
+                if meal_ts > end_ts:
+                    continue
+                food_id = rng.choice(favorites) if rng.random() < 0.8 else rng.choice(food_ids)
+                meals.append({
+                    'user_id': user_id, 'food_id': food_id, 'meal_time': iso(meal_ts), 'meal_ts': meal_ts,
+                    'quantity': rng.choice((1, 1, 1, 2)), 'notes': None, 'idempotency_key': None
+                })
+                if food_id in triggers and rng.random() < 0.7:
+                    symptom_ts = min(meal_ts + rng.randint(2 * 3600000, 12 * 3600000), end_ts)
+                    symptoms.append({
+                        'user_id': user_id, 'symptom_type': rng.choice(REACTIONS), 'severity': rng.randint(2, 5),
+                        'occurrence_time': iso(symptom_ts), 'occurrence_ts': symptom_ts,
+                        'description': None, 'idempotency_key': None
+                    })
+            if rng.random() < 0.05:
+                symptom_ts = min(day_ts + rng.randint(0, app.MS_PER_DAY), end_ts)
+                symptoms.append({
+                    'user_id': user_id, 'symptom_type': rng.choice(NOISE_SYMPTOMS), 'severity': rng.randint(1, 2),
+                    'occurrence_time': iso(symptom_ts), 'occurrence_ts': symptom_ts,
+                    'description': None, 'idempotency_key': None
+                })
+    
+    # Ordre chronologique, comme des saisies réelles (le store de risque en dépend)
+    meals.sort(key=lambda meal: meal['meal_ts'])
+    symptoms.sort(key=lambda symptom: symptom['occurrence_ts'])
+    insert_in_batches(app.meal_dao.create_meals_bulk, meals, app.BULK_MAX_ROWS)
+    insert_in_batches(app.symptom_dao.create_symptoms_bulk, symptoms, app.BULK_MAX_ROWS)
+    
+    return {
+        'users': users,
+        'allergic_users': allergic_users,
+        'foods': len(catalog),
+        'meals': len(meals),
+        'symptoms': len(symptoms),
+        'days': days,
+        'first_user_id': first_id,
+        'seed': seed
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', required=True, help='Base SQLite à créer')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--foods', type=int, default=200)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--meals-per-day', type=int, default=3)
+    parser.add_argument('--allergic-ratio', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    
+    if os.path.exists(args.output):
+        parser.error(f'{args.output} existe déjà')
+    os.environ['DATABASE_PATH'] = os.path.abspath(args.output)
+    os.environ.setdefault('IMAGE_JOB_WORKERS', '0')
+    sys.path.insert(0, ROOT)
+    import app
+    app.create_app()
+    
+    started = time.perf_counter()
+    summary = generate(app, args.users, args.foods, args.days, args.meals_per_day, args.allergic_ratio, args.seed)
+    print(f"{summary['users']} utilisateurs ({summary['allergic_users']} allergiques), {summary['foods']} aliments, "
+          f"{summary['meals']} repas, {summary['symptoms']} symptômes en {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
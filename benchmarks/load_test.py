@@ -0,0 +1,198 @@
+"""Test de charge de gunicorn sur les endpoints de lecture, de 1 à N workers
+
+Une base temporaire est remplie (utilisateurs, repas, symptômes), puis pour
+chaque nombre de workers gunicorn est lancé avec gunicorn.conf.py et des
+clients concurrents (plusieurs processus) interrogent les endpoints de
+lecture pendant une durée fixe. Le débit ne peut croître qu'avec des cœurs
+libres : sur une machine à un cœur, clients et workers se le partagent.
+
+Usage : python benchmarks/load_test.py --workers 1 2 4 --duration 10 --clients 4 --threads 8
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def seed_database(users, meals_per_user, seed=7):
+    """Créer la base (migrations comprises) et insérer des données synthétiques"""
+    sys.path.insert(0, ROOT)
+    import app
+    app.create_app()
+    rng = random.Random(seed)
+    now = app.epoch_ms_now()
+    
+    with app.db_dao.get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO foods (name, category, ingredients) VALUES (?, ?, ?)",
+            [(food['name'], food['category'], food['ingredients']) for food in app.CAMEROON_FOODS_DATA]
+        )
+        conn.executemany(
+            "INSERT INTO users (username, email) VALUES (?, ?)",
+            [(f'user{i}', f'user{i}@example.com') for i in range(users)]
+        )
+        food_count = len(app.CAMEROON_FOODS_DATA)
+        meals, symptoms = [], []
+        for user_id in range(1, users + 1):
+            for _ in range(meals_per_user):
+                ts = now - rng.randint(0, 30 * app.MS_PER_DAY)
+                meals.append((user_id, rng.randint(1, food_count), app.datetime.utcfromtimestamp(ts / 1000).isoformat(), ts, 1))
+            for _ in range(meals_per_user // 4):
+                ts = now - rng.randint(0, 30 * app.MS_PER_DAY)
+                symptoms.append((user_id, 'Démangeaisons', rng.randint(1, 5), app.datetime.utcfromtimestamp(ts / 1000).isoformat(), ts))
+        conn.executemany(
+            "INSERT INTO meals (user_id, food_id, meal_time, meal_ts, quantity) VALUES (?, ?, ?, ?, ?)", meals
+        )
+        conn.executemany(
+            "INSERT INTO symptoms (user_id, symptom_type, severity, occurrence_time, occurrence_ts) VALUES (?, ?, ?, ?, ?)",
+            symptoms
+        )
+        conn.commit()
+    app.db_dao.pool.close_all()
+
+
+def read_paths(users, rng):
+    user_id = rng.randint(1, users)
+    return rng.choice([
+        '/api/foods',
+        f'/api/foods/{rng.randint(1, 5)}',
+        '/api/foods/search?q=ndole',
+        f'/api/users/{user_id}/meals?limit=20',
+        f'/api/users/{user_id}/allergy-analysis',
+        f'/api/users/{user_id}/dashboard',
+        '/api/health',
+    ])
+
+
+def client_process(base_url, users, threads, duration, seed, results):
+    """Processus client : threads en boucle fermée jusqu'à l'échéance"""
+    deadline = time.perf_counter() + duration
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    
+    def loop(index):
+        rng = random.Random(seed * 1000 + index)
+        session = requests.Session()
+        local_latencies = []
+        local_errors = 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = session.get(base_url + read_paths(users, rng), timeout=30)
+                if response.status_code >= 500:
+                    local_errors += 1
+            except requests.RequestException:
+                local_errors += 1
+            local_latencies.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local_latencies)
+            errors[0] += local_errors
+    
+    workers = [threading.Thread(target=loop, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    results.put((latencies, errors[0]))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(workers, threads, env):
+    port = free_port()
+    # Pas de recyclage pendant la mesure : il coupe les connexions keep-alive des clients
+    env = dict(env, GUNICORN_WORKERS=str(workers), GUNICORN_THREADS=str(threads),
+               GUNICORN_BIND=f'127.0.0.1:{port}', GUNICORN_ACCESS_LOG='', GUNICORN_MAX_REQUESTS='0')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    for _ in range(200):
+        try:
+            if requests.get(base_url + '/api/health', timeout=1).status_code == 200:
+                return process, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    process.kill()
+    raise RuntimeError('gunicorn ne répond pas')
+
+
+def run_load(base_url, users, clients, threads, duration):
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=client_process, args=(base_url, users, threads, duration, i, results))
+        for i in range(clients)
+    ]
+    for process in processes:
+        process.start()
+    latencies, errors = [], 0
+    for _ in processes:
+        client_latencies, client_errors = results.get()
+        latencies.extend(client_latencies)
+        errors += client_errors
+    for process in processes:
+        process.join()
+    latencies.sort()
+    return {
+        'rps': len(latencies) / duration,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else 0,
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000 if latencies else 0,
+        'errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--worker-threads', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--clients', type=int, default=4, help='Processus clients')
+    parser.add_argument('--threads', type=int, default=8, help='Connexions par processus client')
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--meals', type=int, default=40, help='Repas par utilisateur')
+    args = parser.parse_args()
+    
+    workdir = tempfile.mkdtemp(prefix='bench_load_')
+    env = dict(os.environ, DATABASE_PATH=os.path.join(workdir, 'bench.db'), IMAGE_JOB_WORKERS='0')
+    os.environ.update(env)
+    seed_database(args.users, args.meals)
+    print(f"{args.users} utilisateurs, {args.users * args.meals} repas ({workdir}), "
+          f"{os.cpu_count()} cœur(s), {args.clients}x{args.threads} clients")
+    
+    baseline = None
+    for workers in args.workers:
+        process, base_url = start_gunicorn(workers, args.worker_threads, env)
+        try:
+            run_load(base_url, args.users, args.clients, args.threads, min(args.duration, 2))  # préchauffage
+            result = run_load(base_url, args.users, args.clients, args.threads, args.duration)
+        finally:
+            process.terminate()
+            process.wait(30)
+        baseline = baseline or result['rps']
+        print(f"  {workers:>2} worker(s) : {result['rps']:8.0f} req/s  (x{result['rps'] / baseline:.2f})  "
+              f"p50={result['p50_ms']:.1f}ms  p95={result['p95_ms']:.1f}ms  erreurs={result['errors']}")
+    
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""Benchmark de /api/media : ancien chemin contre service conditionnel et variantes
+
+Un serveur HTTP local (werkzeug, multi-thread) sert les images du dossier
+media/ du dépôt, importées dans un store temporaire. Chaque scénario mesure
+les requêtes/seconde et le volume transféré pour des clients concurrents.
+
+Usage : python benchmarks/media_serving.py --requests 2000 --concurrency 8
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_images(app, source):
+    """Importer les images du dépôt dans le store et générer leurs variantes"""
+    urls = []
+    for name in sorted(os.listdir(source)):
+        path = os.path.join(source, name)
+        if not os.path.isfile(path):
+            continue
+        with open(path, 'rb') as f:
+            content = f.read()
+        file_path, _ = app.image_manager.store_bytes(content, app.ImageManager.extension_for(name))
+        if not app.image_manager.validate_image(file_path):
+            continue
+        app.image_manager.generate_variants(file_path)
+        urls.append(app.media_url(file_path))
+    return urls
+
+
+def run_scenario(base_url, paths, total, concurrency, headers_for=None):
+    """Exécuter total requêtes GET ; retourne (requêtes/s, Mo transférés, statuts)"""
+    local = threading.local()
+    statuses = {}
+    transferred = [0]
+    lock = threading.Lock()
+    
+    def fetch(index):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        path = paths[index % len(paths)]
+        headers = headers_for(path) if headers_for else {}
+        response = local.session.get(base_url + path, headers=headers)
+        with lock:
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            transferred[0] += len(response.content)
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(fetch, range(total)))
+    elapsed = time.perf_counter() - started
+    return total / elapsed, transferred[0] / 1e6, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+    
+    workdir = tempfile.mkdtemp(prefix='bench_media_')
+    os.environ['DATABASE_PATH'] = os.path.join(workdir, 'bench.db')
+    os.environ.setdefault('IMAGE_JOB_WORKERS', '0')
+    sys.path.insert(0, ROOT)
+    os.chdir(workdir)
+    import app
+    from flask import send_from_directory
+    from werkzeug.serving import WSGIRequestHandler, make_server
+    
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+    
+    application = app.create_app()
+    urls = import_images(app, os.path.join(ROOT, 'media'))
+    print(f"{len(urls)} images importées ({workdir})")
+    
+    # Ancien chemin : envoi du fichier sans en-têtes de cache, le client retélécharge tout
+    @application.route('/bench/legacy-media/<path:filename>')
+    def legacy_media(filename):
+        return send_from_directory(os.path.abspath(app.MEDIA_FOLDER), filename,
+                                   conditional=False, etag=False, max_age=None)
+    
+    server = make_server('127.0.0.1', 0, application, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    
+    # ETag de chaque image, tel qu'un navigateur l'aurait mis en cache
+    session = requests.Session()
+    etags = {url: session.get(base_url + url).headers.get('ETag') for url in urls}
+    
+    legacy_paths = [url.replace('/api/media/', '/bench/legacy-media/') for url in urls]
+    scenarios = [
+        ('ancien chemin (200 complet)', legacy_paths, None),
+        ('nouveau chemin (200 complet)', urls, None),
+        ('revalidation If-None-Match (304)', urls, lambda path: {'If-None-Match': etags[path]}),
+        ('Range 64 Ko (206)', urls, lambda path: {'Range': 'bytes=0-65535'}),
+        ('?size=thumb WebP (200)', [url + '?size=thumb' for url in urls],
+         lambda path: {'Accept': 'image/webp'}),
+    ]
+    
+    for label, paths, headers_for in scenarios:
+        rate, megabytes, statuses = run_scenario(base_url, paths, args.requests, args.concurrency, headers_for)
+        print(f"  {label:<36} {rate:8.0f} req/s  {megabytes:8.2f} Mo  statuts={statuses}")
+    
+    print("  Cache-Control immutable : un client qui a l'image en cache n'émet plus de requête.")
+    server.shutdown()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,323 @@
+"""Rejeu de trafic enregistré (JSONL) contre l'API, dans le processus ou par HTTP
+
+Une ligne par requête :
+
+    {"method": "GET", "path": "/api/foods/search?q=ndole", "offset_ms": 120}
+    {"method": "POST", "path": "/api/meals", "json": {...}, "headers": {...}, "offset_ms": 135}
+
+offset_ms (ou ts, en millisecondes epoch) donne l'instant d'envoi ; les
+lignes sans method ou path (comme celles de requests.jsonl, qui décrit des
+demandes d'évolution et non du trafic) sont ignorées et comptées. Le rejeu
+suit le rythme enregistré multiplié par --speed (0 : au plus vite, en boucle
+fermée), avec au plus --concurrency requêtes simultanées. Le rapport donne,
+par route Flask, le débit, p50/p95/p99 et les taux d'erreurs 4xx et 5xx.
+
+Cible : client de test Flask sur une base locale (--database, sinon base
+générée par generate_data.py), gunicorn lancé pour l'occasion
+(--gunicorn-workers) ou serveur existant (--url).
+
+Usage :
+    python benchmarks/replay.py synthesize --output traffic.jsonl --requests 5000 --rate 200
+    python benchmarks/replay.py run traffic.jsonl --concurrency 8 --speed 2
+    python benchmarks/replay.py run traffic.jsonl --gunicorn-workers 3 --speed 0
+    python benchmarks/replay.py run traffic.jsonl --url http://127.0.0.1:5000
+"""
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+SEARCH_TERMS = ['ndole', 'poisson', 'huile palme', 'arach', 'crevettes', 'okok', 'plantain piment', 'poulet']
+SYMPTOMS = ['Démangeaisons', 'Urticaire', 'Maux de ventre', 'Nausées']
+
+# (poids, fabrique de requête) : consultation majoritaire, saisie de repas et symptômes
+TRAFFIC_MIX = (
+    (20, lambda rng, users, foods, now: ('GET', '/api/foods', None)),
+    (10, lambda rng, users, foods, now: ('GET', f'/api/foods/{rng.randint(1, foods)}', None)),
+    (10, lambda rng, users, foods, now: ('GET', f'/api/foods/search?q={quote(rng.choice(SEARCH_TERMS))}', None)),
+    (15, lambda rng, users, foods, now: ('GET', f'/api/users/{rng.randint(1, users)}/meals?limit=20', None)),
+    (10, lambda rng, users, foods, now: ('GET', f'/api/users/{rng.randint(1, users)}/dashboard', None)),
+    (10, lambda rng, users, foods, now: ('GET', f'/api/users/{rng.randint(1, users)}/allergy-analysis', None)),
+    (15, lambda rng, users, foods, now: ('POST', '/api/meals', {
+        'user_id': rng.randint(1, users), 'food_id': rng.randint(1, foods),
+        'meal_time': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(now - rng.randint(0, 86400))), 'quantity': 1
+    })),
+    (5, lambda rng, users, foods, now: ('POST', '/api/symptoms', {
+        'user_id': rng.randint(1, users), 'symptom_type': rng.choice(SYMPTOMS), 'severity': rng.randint(1, 5),
+        'occurrence_time': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(now - rng.randint(0, 86400)))
+    })),
+    (2, lambda rng, users, foods, now: ('GET', f'/api/export/{rng.randint(1, users)}/data?format=ndjson', None)),
+    (3, lambda rng, users, foods, now: ('GET', '/api/health', None)),
+)
+
+
+def synthesize(args):
+    """Écrire un trafic synthétique : arrivées de Poisson au débit --rate, mélange TRAFFIC_MIX"""
+    rng = random.Random(args.seed)
+    weights = [weight for weight, _ in TRAFFIC_MIX]
+    factories = [factory for _, factory in TRAFFIC_MIX]
+    now = int(time.time())
+    offset = 0.0
+    with open(args.output, 'w') as f:
+        for _ in range(args.requests):
+            method, path, payload = rng.choices(factories, weights)[0](rng, args.users, args.foods, now)
+            line = {'method': method, 'path': path, 'offset_ms': round(offset, 3)}
+            if payload is not None:
+                line['json'] = payload
+            f.write(json.dumps(line, ensure_ascii=False) + '\n')
+            offset += rng.expovariate(args.rate) * 1000
+    print(f"{args.requests} requêtes écrites dans {args.output} ({offset / 1000:.1f}s à {args.rate} req/s)")
+
+
+def load_requests(path):
+    """Requêtes rejouables, triées par instant d'envoi, et nombre de lignes ignorées"""
+    entries, skipped = [], 0
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                skipped += 1
+                continue
+            if not isinstance(entry, dict) or not entry.get('method') or not str(entry.get('path', '')).startswith('/'):
+                skipped += 1
+                continue
+            entries.append(entry)
+    
+    timestamps = [entry.get('offset_ms', entry.get('ts')) for entry in entries]
+    if entries and all(isinstance(value, (int, float)) for value in timestamps):
+        first = min(timestamps)
+        for entry, value in zip(entries, timestamps):
+            entry['_offset'] = (value - first) / 1000
+        entries.sort(key=lambda entry: entry['_offset'])
+    else:
+        for entry in entries:
+            entry['_offset'] = 0.0
+    return entries, skipped
+
+
+class InProcessTarget:
+    """Client de test Flask, un par thread"""
+    
+    def __init__(self, application):
+        self.application = application
+        self._local = threading.local()
+    
+    def send(self, entry):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.application.test_client()
+        response = client.open(entry['path'], method=entry['method'].upper(), json=entry.get('json'),
+                               data=entry.get('body'), headers=entry.get('headers'))
+        response.get_data()
+        return response.status_code
+
+
+class HttpTarget:
+    """Serveur HTTP (gunicorn), une session keep-alive par thread"""
+    
+    def __init__(self, base_url):
+        import requests
+        self.requests = requests
+        self.base_url = base_url.rstrip('/')
+        self._local = threading.local()
+    
+    def send(self, entry):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self.requests.Session()
+        response = session.request(entry['method'].upper(), self.base_url + entry['path'], json=entry.get('json'),
+                                   data=entry.get('body'), headers=entry.get('headers'), timeout=60)
+        response.content
+        return response.status_code
+
+
+def route_namer(url_map):
+    """Regrouper les chemins par règle Flask (/api/users/<int:user_id>/meals), pas par URL"""
+    adapter = url_map.bind('localhost')
+    
+    def name(entry):
+        method = entry['method'].upper()
+        try:
+            rule, _ = adapter.match(entry['path'].split('?', 1)[0], method=method, return_rule=True)
+            return f'{method} {rule.rule}'
+        except Exception:
+            return f'{method} (sans route)'
+    return name
+
+
+def replay(entries, target, route_of, concurrency, speed):
+    """Envoyer les requêtes ; retourne (mesures par route, durée totale, retard max sur le rythme)"""
+    stats = defaultdict(lambda: {'latencies': [], 'client_errors': 0, 'server_errors': 0})
+    lock = threading.Lock()
+    slots = threading.BoundedSemaphore(concurrency)
+    max_lag = 0.0
+    
+    def run(entry):
+        route = route_of(entry)
+        started = time.perf_counter()
+        try:
+            status = target.send(entry)
+        except Exception:
+            status = None
+        elapsed = time.perf_counter() - started
+        with lock:
+            route_stats = stats[route]
+            route_stats['latencies'].append(elapsed)
+            if status is None or status >= 500:
+                route_stats['server_errors'] += 1
+            elif status >= 400:
+                route_stats['client_errors'] += 1
+        slots.release()
+    
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for entry in entries:
+            if speed > 0:
+                delay = started + entry['_offset'] / speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            # Concurrence épuisée : la requête part en retard sur le rythme enregistré
+            slots.acquire()
+            if speed > 0:
+                max_lag = max(max_lag, time.perf_counter() - started - entry['_offset'] / speed)
+            executor.submit(run, entry)
+    return stats, time.perf_counter() - started, max_lag
+
+
+def percentile(samples, rank):
+    return samples[max(0, math.ceil(rank / 100 * len(samples)) - 1)]
+
+
+def report(stats, elapsed, max_lag, speed):
+    rows = []
+    for route, route_stats in stats.items():
+        latencies = sorted(route_stats['latencies'])
+        count = len(latencies)
+        rows.append({
+            'route': route,
+            'requests': count,
+            'rps': round(count / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'client_error_rate': round(route_stats['client_errors'] / count, 4),
+            'server_error_rate': round(route_stats['server_errors'] / count, 4)
+        })
+    rows.sort(key=lambda row: row['requests'], reverse=True)
+    
+    total = sum(row['requests'] for row in rows)
+    print(f"{total} requêtes en {elapsed:.1f}s : {total / elapsed:.0f} req/s"
+          + (f", retard max sur le rythme x{speed:g} : {max_lag * 1000:.0f}ms" if speed > 0 else ''))
+    print(f"  {'route':<48} {'req':>6} {'req/s':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'4xx':>6} {'5xx':>6}")
+    for row in rows:
+        print(f"  {row['route'][:48]:<48} {row['requests']:>6} {row['rps']:>7.1f} {row['p50_ms']:>6.1f}ms "
+              f"{row['p95_ms']:>6.1f}ms {row['p99_ms']:>6.1f}ms {row['client_error_rate']:>6.1%} "
+              f"{row['server_error_rate']:>6.1%}")
+    return {'requests': total, 'elapsed_seconds': round(elapsed, 3), 'max_lag_ms': round(max_lag * 1000, 1),
+            'routes': rows}
+
+
+def run(args):
+    entries, skipped = load_requests(args.file)
+    if skipped:
+        print(f"{skipped} ligne(s) ignorée(s) (JSON invalide ou sans method/path)")
+    if not entries:
+        print(f"Aucune requête rejouable dans {args.file}")
+        sys.exit(2)
+    if args.limit:
+        entries = entries[:args.limit]
+    
+    workdir = tempfile.mkdtemp(prefix='bench_replay_')
+    process = None
+    try:
+        database = os.path.abspath(args.database) if args.database else os.path.join(workdir, 'bench.db')
+        os.environ['DATABASE_PATH'] = database
+        os.environ['IMAGE_JOB_WORKERS'] = '0'
+        sys.path.insert(0, ROOT)
+        os.chdir(workdir)
+        import app
+        
+        application = app.create_app()
+        if not args.database:
+            import generate_data
+            summary = generate_data.generate(app, users=args.users, foods=args.foods, seed=args.seed)
+            print(f"Base générée : {summary['users']} utilisateurs, {summary['meals']} repas")
+        app.db_dao.pool.close_all()
+        
+        if args.url:
+            target = HttpTarget(args.url)
+        elif args.gunicorn_workers:
+            import load_test
+            env = dict(os.environ, GUNICORN_MAX_REQUESTS='0')
+            process, base_url = load_test.start_gunicorn(args.gunicorn_workers, args.gunicorn_threads, env)
+            target = HttpTarget(base_url)
+        else:
+            target = InProcessTarget(application)
+        
+        label = args.url or (f'gunicorn, {args.gunicorn_workers} worker(s)' if process else 'dans le processus')
+        print(f"Rejeu de {len(entries)} requêtes ({label}, concurrence {args.concurrency}, "
+              f"vitesse {'max' if args.speed <= 0 else f'x{args.speed:g}'})")
+        stats, elapsed, max_lag = replay(entries, target, route_namer(application.url_map), args.concurrency, args.speed)
+        result = report(stats, elapsed, max_lag, args.speed)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(30)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    synth = commands.add_parser('synthesize', help='Écrire un trafic synthétique')
+    synth.add_argument('--output', required=True)
+    synth.add_argument('--requests', type=int, default=5000)
+    synth.add_argument('--rate', type=float, default=100, help='Débit moyen enregistré (req/s)')
+    
+    replay_parser = commands.add_parser('run', help='Rejouer un fichier JSONL')
+    replay_parser.add_argument('file')
+    replay_parser.add_argument('--speed', type=float, default=1.0, help='Multiplicateur du rythme enregistré (0 : au plus vite)')
+    replay_parser.add_argument('--concurrency', type=int, default=8)
+    replay_parser.add_argument('--limit', type=int, help='Ne rejouer que les N premières requêtes')
+    replay_parser.add_argument('--database', help='Base existante (sinon base générée)')
+    replay_parser.add_argument('--url', help='Serveur existant à interroger')
+    replay_parser.add_argument('--gunicorn-workers', type=int, help='Lancer gunicorn avec N workers sur la base')
+    replay_parser.add_argument('--gunicorn-threads', type=int, default=4)
+    replay_parser.add_argument('--output', help='Écrire le rapport dans ce fichier JSON')
+    
+    for command in (synth, replay_parser):
+        command.add_argument('--users', type=int, default=1000)
+        command.add_argument('--foods', type=int, default=200)
+        command.add_argument('--seed', type=int, default=42)
+    
+    args = parser.parse_args()
+    if args.command == 'synthesize':
+        synthesize(args)
+    else:
+        if args.output:
+            args.output = os.path.abspath(args.output)
+        args.file = os.path.abspath(args.file)
+        run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Benchmark de /api/foods/search : index FTS5 contre l'ancien chemin LIKE
+
+Usage : python benchmarks/search_fts.py --foods 100000 --repeat 20
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORDS = [
+    'ndolé', 'arachides', 'poisson', 'viande', 'crevettes', 'huile', 'palme', 'poulet',
+    'plantain', 'carotte', 'haricots', 'gingembre', 'eru', 'épices', 'tomates', 'oignons',
+    'ail', 'manioc', 'igname', 'macabo', 'gombo', 'okok', 'koki', 'mbongo', 'piment',
+    'bœuf', 'crabe', 'fufu', 'couscous', 'riz', 'maïs', 'banane', 'safou', 'avocat'
+]
+CATEGORIES = ['Plat principal', 'Accompagnement', 'Légume', 'Dessert', 'Boisson', 'Entrée']
+# Requêtes fréquentes (beaucoup de résultats) et sélectives (quelques résultats)
+QUERIES = {
+    'fréquentes': ['ndole', 'poisson', 'huile palme', 'gin', 'bœuf piment', 'crab', 'epices tomates'],
+    'sélectives': ['4242', 'okok 777', 'safou 1234', 'mais 99999', 'gombo igname 5'],
+}
+
+
+def build_catalog(db_dao, count, seed=42):
+    """Insérer des aliments synthétiques par lots"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        name = ' '.join(rng.sample(WORDS, 2)).capitalize() + f' {i}'
+        ingredients = ', '.join(rng.sample(WORDS, rng.randint(3, 7)))
+        rows.append((name, rng.choice(CATEGORIES), ingredients, False))
+    
+    with db_dao.get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO foods (name, category, ingredients, is_base_food) VALUES (?, ?, ?, ?)",
+            rows
+        )
+
+
+def time_calls(function, queries, repeat, limit):
+    samples = []
+    for _ in range(repeat):
+        for query in queries:
+            started = time.perf_counter()
+            function(query, limit=limit)
+            samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        'p50_ms': round(statistics.median(samples), 3),
+        'p95_ms': round(samples[int(len(samples) * 0.95) - 1], 3),
+        'mean_ms': round(statistics.mean(samples), 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--foods', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--limit', type=int, default=50)
+    args = parser.parse_args()
+    
+    workdir = tempfile.mkdtemp(prefix='bench_search_')
+    os.environ['DATABASE_PATH'] = os.path.join(workdir, 'bench.db')
+    sys.path.insert(0, ROOT)
+    os.chdir(workdir)
+    import app
+    app.create_app()
+    
+    started = time.perf_counter()
+    build_catalog(app.db_dao, args.foods)
+    print(f"{args.foods} aliments insérés en {time.perf_counter() - started:.1f}s ({workdir})")
+    
+    paths = {
+        'fts5 (limit)': (app.food_dao.search_foods, args.limit),
+        'like (limit)': (app.food_dao.search_foods_like, args.limit),
+        'like (ancien, sans limite)': (app.food_dao.search_foods_like, None),
+    }
+    for label, queries in QUERIES.items():
+        print(f"Requêtes {label}:")
+        for name, (function, limit) in paths.items():
+            result = time_calls(function, queries, args.repeat, limit)
+            print(f"  {name:<28} p50={result['p50_ms']}ms p95={result['p95_ms']}ms moyenne={result['mean_ms']}ms")
+
+
+if __name__ == '__main__':
+    main()
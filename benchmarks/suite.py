@@ -0,0 +1,301 @@
+"""Suite de benchmarks des chemins principaux, comparée à une référence
+
+Une base synthétique (benchmarks/generate_data.py) est générée avec une
+graine fixe, puis chaque cas est chronométré dans le processus, par le
+client de test Flask ou par appel direct. Le rapport donne p50/p95/p99 et
+le pic de mémoire allouée par appel (tracemalloc, mesuré sur un appel à
+part pour ne pas fausser les durées). Les itérations de tous les cas sont
+entrelacées en plusieurs tours. Il est comparé à
+benchmarks/baseline.json : un cas dont le p50 ou le pic mémoire dépasse la
+référence de plus de --tolerance, ou le p95 de plus de --tail-tolerance,
+est une régression, et le script sort en erreur.
+
+Les durées sont ramenées à la vitesse de la machine de référence par une
+boucle d'étalonnage (Python et SQLite en mémoire) exécutée avant et après
+les cas : une machine partagée plus lente ce jour-là ne passe pas pour une
+régression. La référence reste à régénérer (--save-baseline) lorsque la
+machine ou l'échelle change.
+
+Usage : python benchmarks/suite.py [--users 1000] [--iterations 100] [--save-baseline]
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import resource
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+# En deçà, un écart relève du bruit de mesure et n'est pas une régression
+MIN_REGRESSION_MS = 0.2
+MIN_REGRESSION_KB = 64
+
+SEARCH_QUERIES = ['ndole', 'poisson', 'huile palme', 'arach', 'crevettes', 'okok 17', 'plantain piment']
+
+
+def percentile(samples, rank):
+    """Percentile au rang le plus proche d'une liste triée"""
+    return samples[max(0, math.ceil(rank / 100 * len(samples)) - 1)]
+
+
+def calibrate(rounds=5):
+    """Durée minimale (ms) d'un travail fixe représentatif : boucles Python, JSON et SQLite"""
+    best = float('inf')
+    for _ in range(rounds):
+        started = time.perf_counter()
+        conn = sqlite3.connect(':memory:')
+        conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, value TEXT)")
+        conn.executemany("INSERT INTO t (value) VALUES (?)", [(str(i),) for i in range(5000)])
+        for i in range(500):
+            conn.execute("SELECT value FROM t WHERE id = ?", (i,)).fetchall()
+        rows = conn.execute("SELECT id, value FROM t").fetchall()
+        json.loads(json.dumps([{'id': row[0], 'value': row[1]} for row in rows]))
+        sum(i * i for i in range(100000))
+        conn.close()
+        best = min(best, (time.perf_counter() - started) * 1000)
+    return best
+
+
+def build_cases(app, client, summary, rng):
+    """Cas chronométrés : nom -> fonction(i) ; les utilisateurs tournent pour limiter l'effet des caches"""
+    first_user = summary['first_user_id']
+    user_ids = list(range(first_user, first_user + summary['users']))
+    rng.shuffle(user_ids)
+    now = app.epoch_ms_now()
+    
+    def user(i):
+        return user_ids[i % len(user_ids)]
+    
+    def get(path):
+        response = client.get(path)
+        data = response.get_data()
+        if response.status_code != 200:
+            raise RuntimeError(f'{path}: HTTP {response.status_code} {data[:200]!r}')
+        return data
+    
+    def post(path, payload):
+        response = client.post(path, json=payload)
+        if response.status_code != 200:
+            raise RuntimeError(f'{path}: HTTP {response.status_code} {response.get_data()[:200]!r}')
+    
+    def meal(i):
+        return {'user_id': user(i), 'food_id': 1 + i % summary['foods'],
+                'meal_time': app.datetime.utcfromtimestamp((now - i * 60000) / 1000).isoformat(), 'quantity': 1}
+    
+    return {
+        'detect_potential_allergies': lambda i: app.AllergyDetectionEngine.detect_potential_allergies(user(i)),
+        'risk_store_allergies': lambda i: app.risk_store.detect_potential_allergies(user(i)),
+        'get_foods': lambda i: get('/api/foods'),
+        'search_foods': lambda i: get(f'/api/foods/search?q={SEARCH_QUERIES[i % len(SEARCH_QUERIES)]}'),
+        'meal_ingestion': lambda i: post('/api/meals', meal(i)),
+        'meal_ingestion_bulk_100': lambda i: post('/api/meals/bulk', {'meals': [meal(i * 100 + j) for j in range(100)]}),
+        'dashboard': lambda i: get(f'/api/users/{user(i)}/dashboard'),
+        'export_json': lambda i: get(f'/api/export/{user(i)}/data'),
+        'export_ndjson': lambda i: get(f'/api/export/{user(i)}/data?format=ndjson'),
+    }
+
+
+def time_calls(function, start, count):
+    samples = []
+    for i in range(start, start + count):
+        started = time.perf_counter()
+        function(i)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def peak_memory_kb(function, i):
+    """Pic de mémoire allouée par un appel, mesuré à part (tracemalloc ralentit l'appel)"""
+    tracemalloc.start()
+    function(i)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return round(peak / 1024, 1)
+
+
+def summarize(samples, peak_kb):
+    samples = sorted(samples)
+    return {
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p95_ms': round(percentile(samples, 95), 3),
+        'p99_ms': round(percentile(samples, 99), 3),
+        'mean_ms': round(statistics.mean(samples), 3),
+        'peak_kb': peak_kb
+    }
+
+
+def measure(cases, iterations, rounds, start):
+    """Chronométrer les cas ; retourne (résultats par cas, étalonnage médian en ms)
+    
+    Les tours sont entrelacés : une variation de vitesse de la machine pendant
+    la mesure touche tous les cas de la même façon. L'étalonnage est refait à
+    chaque tour.
+    """
+    per_round = math.ceil(iterations / rounds)
+    samples = {name: [] for name in cases}
+    calibrations = []
+    for round_index in range(rounds):
+        calibrations.append(calibrate(rounds=2))
+        for name, function in cases.items():
+            samples[name].extend(time_calls(function, start + round_index * per_round, per_round))
+    calibrations.append(calibrate(rounds=2))
+    
+    results = {}
+    for name, function in cases.items():
+        results[name] = summarize(samples[name], peak_memory_kb(function, start + rounds * per_round))
+    return results, statistics.median(calibrations)
+
+
+def compare(results, baseline, tolerance, tail_tolerance, speed=1.0):
+    """Lignes de comparaison et liste des régressions
+    
+    speed : étalonnage courant / étalonnage de référence ; les durées
+    courantes en sont divisées avant comparaison.
+    """
+    lines, regressions = [], []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            lines.append(f"  {name:<26} (nouveau cas, pas de référence)")
+            continue
+        verdicts = []
+        checks = (
+            ('p50_ms', tolerance, MIN_REGRESSION_MS),
+            ('p95_ms', tail_tolerance, MIN_REGRESSION_MS),
+            ('peak_kb', tolerance, MIN_REGRESSION_KB),
+        )
+        for key, allowed, floor in checks:
+            current, previous = result[key], reference[key]
+            if key.endswith('_ms'):
+                current = round(current / speed, 3)
+            if current > previous * (1 + allowed) and current - previous > floor:
+                verdicts.append(f"{key} {previous} -> {current}")
+        ratio = result['p50_ms'] / speed / reference['p50_ms'] if reference['p50_ms'] else float('inf')
+        status = 'RÉGRESSION ' + ', '.join(verdicts) if verdicts else 'ok'
+        lines.append(f"  {name:<26} p50 x{ratio:.2f}  {status}")
+        if verdicts:
+            regressions.append(name)
+    return lines, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--foods', type=int, default=200)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--rounds', type=int, default=5, help='Tours entrelacés entre lesquels les itérations sont réparties')
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--cases', nargs='+', help='Cas à exécuter (tous par défaut)')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--tolerance', type=float, default=0.3, help='Écart relatif toléré sur p50 et mémoire (0.3 : +30 %%)')
+    parser.add_argument('--tail-tolerance', type=float, default=0.6, help='Écart relatif toléré sur p95, plus bruité')
+    parser.add_argument('--no-confirm', dest='confirm', action='store_false',
+                        help='Ne pas remesurer les cas en régression avant de conclure')
+    parser.add_argument('--save-baseline', action='store_true', help='Enregistrer les résultats comme référence')
+    parser.add_argument('--output', help='Écrire aussi les résultats dans ce fichier JSON')
+    args = parser.parse_args()
+    
+    workdir = tempfile.mkdtemp(prefix='bench_suite_')
+    os.environ['DATABASE_PATH'] = os.path.join(workdir, 'bench.db')
+    os.environ['IMAGE_JOB_WORKERS'] = '0'
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    os.chdir(workdir)
+    import app
+    import generate_data
+    
+    application = app.create_app()
+    started = time.perf_counter()
+    summary = generate_data.generate(app, users=args.users, foods=args.foods, days=args.days, seed=args.seed)
+    print(f"Base : {summary['users']} utilisateurs, {summary['foods']} aliments, {summary['meals']} repas, "
+          f"{summary['symptoms']} symptômes ({time.perf_counter() - started:.1f}s)")
+    
+    cases = build_cases(app, application.test_client(), summary, random.Random(args.seed))
+    unknown = set(args.cases or ()) - set(cases)
+    if unknown:
+        parser.error(f"cas inconnus : {', '.join(sorted(unknown))} (disponibles : {', '.join(cases)})")
+    
+    selected = {name: function for name, function in cases.items() if not args.cases or name in args.cases}
+    for function in selected.values():
+        for i in range(args.warmup):
+            function(i)
+    
+    results, calibration_ms = measure(selected, args.iterations, args.rounds, args.warmup)
+    for name, result in results.items():
+        print(f"  {name:<26} p50={result['p50_ms']:8.3f}ms  p95={result['p95_ms']:8.3f}ms  "
+              f"p99={result['p99_ms']:8.3f}ms  pic={result['peak_kb']:8.1f} Ko")
+    max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"  Mémoire maximale du processus : {max_rss_mb:.0f} Mo, étalonnage : {calibration_ms:.1f}ms")
+    
+    report = {
+        'scale': {key: summary[key] for key in ('users', 'foods', 'meals', 'symptoms', 'days', 'seed')},
+        'iterations': args.iterations,
+        'python': platform.python_version(),
+        'machine': f"{platform.machine()}, {os.cpu_count()} cœur(s)",
+        'max_rss_mb': round(max_rss_mb, 1),
+        'calibration_ms': round(calibration_ms, 3),
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        print(f"Référence enregistrée dans {args.baseline}")
+        shutil.rmtree(workdir, ignore_errors=True)
+        return
+    
+    if not os.path.exists(args.baseline):
+        print(f"Pas de référence ({args.baseline}) : relancer avec --save-baseline")
+        shutil.rmtree(workdir, ignore_errors=True)
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('scale') != report['scale']:
+        # Des durées mesurées sur d'autres volumes ne se comparent pas
+        print(f"Échelle {report['scale']} différente de la référence ({baseline.get('scale')}) : "
+              f"comparaison impossible, relancer à la même échelle ou avec --save-baseline")
+        shutil.rmtree(workdir, ignore_errors=True)
+        sys.exit(2)
+    
+    speed = calibration_ms / baseline['calibration_ms'] if baseline.get('calibration_ms') else 1.0
+    lines, regressions = compare(results, baseline['results'], args.tolerance, args.tail_tolerance, speed)
+    print(f"Comparaison avec {os.path.relpath(args.baseline, ROOT)} (tolérance {args.tolerance:.0%}/{args.tail_tolerance:.0%}, "
+          f"étalonnage x{speed:.2f} par rapport à la référence) :")
+    print('\n'.join(lines))
+    
+    # Sur une machine partagée, un cas isolé peut être ralenti par hasard : seules
+    # comptent les régressions confirmées par une seconde mesure
+    if regressions and args.confirm:
+        print(f"Nouvelle mesure de : {', '.join(regressions)}")
+        rerun, rerun_calibration = measure(
+            {name: selected[name] for name in regressions}, args.iterations, args.rounds,
+            args.warmup + args.iterations
+        )
+        speed = rerun_calibration / baseline['calibration_ms'] if baseline.get('calibration_ms') else 1.0
+        lines, regressions = compare(rerun, baseline['results'], args.tolerance, args.tail_tolerance, speed)
+        print('\n'.join(lines))
+    
+    shutil.rmtree(workdir, ignore_errors=True)
+    if regressions:
+        print(f"{len(regressions)} régression(s) : {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
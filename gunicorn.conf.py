@@ -0,0 +1,100 @@
+"""Configuration gunicorn de production
+
+Usage : gunicorn -c gunicorn.conf.py
+Chaque valeur peut être ajustée par variable d'environnement (GUNICORN_*).
+"""
+import multiprocessing
+import os
+import re
+import tempfile
+
+wsgi_app = 'app:create_app()'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+
+# Workers : 2 x cœurs + 1 ; threads : les requêtes attendent surtout SQLite,
+# le disque et les téléchargements, pas le CPU
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Application (migrations, caches) chargée une seule fois dans le maître puis
+# partagée par copie à l'écriture
+preload_app = True
+
+# Arrêt propre : une requête en cours dispose de graceful_timeout secondes
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+# Recyclage des workers, étalé pour ne pas les redémarrer tous en même temps
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+# Battement de cœur des workers en mémoire plutôt que sur disque (conteneurs)
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+
+# Instantanés des métriques de chaque worker, additionnés par /metrics ; fixé
+# avant le préchargement de l'application, qui lit METRICS_DIR à l'import
+metrics_dir = os.environ.setdefault(
+    'METRICS_DIR',
+    os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), f'allergy-metrics-{os.getpid()}')
+)
+
+
+# METRICS_DIR peut être fixé par l'utilisateur : seuls les instantanés de
+# métriques y sont supprimés, jamais le répertoire ni d'autres fichiers
+METRICS_FILE = re.compile(r'^metrics_\w+\.json(\.tmp)?$')
+
+
+def clear_metrics_dir():
+    """Supprimer les instantanés de métriques ; retourne les autres fichiers du répertoire"""
+    foreign = []
+    for entry in os.scandir(metrics_dir):
+        if entry.is_file() and METRICS_FILE.match(entry.name):
+            os.remove(entry.path)
+        else:
+            foreign.append(entry.name)
+    return foreign
+
+
+def on_starting(server):
+    os.makedirs(metrics_dir, exist_ok=True)
+    foreign = clear_metrics_dir()
+    if foreign:
+        raise RuntimeError(
+            f"METRICS_DIR={metrics_dir} contient d'autres fichiers que des métriques "
+            f"({', '.join(sorted(foreign)[:5])}) : choisir un répertoire dédié"
+        )
+
+
+def on_exit(server):
+    if not clear_metrics_dir():
+        os.rmdir(metrics_dir)
+
+
+def pre_fork(server, worker):
+    # Une connexion SQLite ne doit pas traverser un fork
+    import app
+    app.release_master_resources()
+
+
+def post_fork(server, worker):
+    import app
+    app.init_worker_process()
+
+
+def worker_exit(server, worker):
+    # Laisser les jobs d'images en cours se terminer ; sinon leur bail expire
+    # et un autre worker les reprend
+    import app
+    app.image_jobs.stop(timeout=graceful_timeout / 2)
+    app.metrics.flush()
+
+
+def child_exit(server, worker):
+    # Les compteurs d'un worker recyclé restent comptés, ses jauges disparaissent
+    import app
+    app.metrics.mark_process_dead(worker.pid)
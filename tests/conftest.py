@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Application sur une base neuve ; services fermés et oubliés en fin de test"""
+    flask_app = app_module.create_app({'DATABASE_PATH': str(tmp_path / 'app.db'), 'TESTING': True})
+    yield flask_app
+    app_module.close_services()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def media_folder(app, tmp_path, monkeypatch):
+    """Dossier media temporaire pour le store d'images et /api/media"""
+    folder = str(tmp_path / 'media')
+    os.makedirs(folder)
+    monkeypatch.setattr(app_module, 'MEDIA_FOLDER', folder)
+    monkeypatch.setattr(app_module.image_manager, 'media_folder', folder)
+    return folder
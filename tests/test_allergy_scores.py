@@ -0,0 +1,60 @@
+"""sweep_scores face à la double boucle d'origine (calculate_allergy_score) sur les mêmes données"""
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import app as app_module
+
+HOUR = 3600 * 1000
+START = 1767225600000  # 2026-01-01T00:00:00Z
+
+
+def baseline_scores(meal_events, symptom_times):
+    """Double boucle repas x symptômes de la version d'origine, aliment par aliment"""
+    def moment(ms):
+        return datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+    
+    scores = {}
+    for food_id in {food for food, _ in meal_events}:
+        food_meals = [meal_ts for food, meal_ts in meal_events if food == food_id]
+        symptom_after_food_count = 0
+        for meal_ts in food_meals:
+            meal_time = moment(meal_ts)
+            for symptom_ts in symptom_times:
+                time_diff = moment(symptom_ts) - meal_time
+                if timedelta(hours=2) <= time_diff <= timedelta(hours=48):
+                    symptom_after_food_count += 1
+                    break
+        scores[food_id] = round((symptom_after_food_count / len(food_meals)) * 100, 2)
+    return scores
+
+
+def test_window_boundaries_and_shared_timestamps():
+    meal_ts = START + 10 * HOUR
+    meals = [
+        (1, meal_ts), (2, meal_ts), (1, meal_ts),    # trois repas au même instant
+        (3, START), (4, START + 200 * HOUR), (5, START + 400 * HOUR), (6, START + 600 * HOUR),
+    ]
+    symptoms = [
+        meal_ts + 2 * HOUR,                          # début exact de la fenêtre
+        START + 48 * HOUR,                           # fin exacte de la fenêtre du repas 3
+        START + 200 * HOUR + 2 * HOUR - 1,           # 1 ms trop tôt pour le repas 4
+        START + 400 * HOUR + 48 * HOUR + 1,          # 1 ms trop tard pour le repas 5
+    ]
+    expected = {1: 100.0, 2: 100.0, 3: 100.0, 4: 0.0, 5: 0.0, 6: 0.0}
+    assert baseline_scores(meals, symptoms) == expected
+    assert app_module.AllergyDetectionEngine.sweep_scores(meals, symptoms) == expected
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_matches_baseline_on_generated_data(seed):
+    rng = random.Random(seed)
+    span = 30 * 24 * HOUR
+    slots = [START + rng.randrange(0, span, HOUR // 2) for _ in range(40)]
+    meals = [(rng.randint(1, 8), rng.choice(slots)) for _ in range(rng.randint(1, 120))]
+    symptoms = [rng.choice(slots) + rng.choice([2 * HOUR, 48 * HOUR, 2 * HOUR - 1, 48 * HOUR + 1, 0])
+                for _ in range(rng.randint(0, 40))]
+    rng.shuffle(symptoms)
+    
+    assert app_module.AllergyDetectionEngine.sweep_scores(meals, symptoms) == baseline_scores(meals, symptoms)
@@ -0,0 +1,30 @@
+"""create_app : un processus ne sert qu'une base"""
+import pytest
+
+import app as app_module
+
+
+def test_second_app_on_the_same_database_reuses_the_services(app, monkeypatch):
+    dao, pool = app_module.db_dao, app_module.db_dao.pool
+    
+    def migrate_again(self):
+        raise AssertionError('migrations relancées')
+    monkeypatch.setattr(app_module.DatabaseDAO, 'apply_migrations', migrate_again)
+    
+    app_module.create_app({'DATABASE_PATH': app.config['DATABASE_PATH']})
+    assert app_module.db_dao is dao
+    assert app_module.db_dao.pool is pool
+
+
+def test_second_app_on_another_database_is_refused(app, tmp_path):
+    with pytest.raises(RuntimeError):
+        app_module.create_app({'DATABASE_PATH': str(tmp_path / 'other.db')})
+
+
+def test_close_services_forgets_every_service(app, tmp_path):
+    app_module.close_services()
+    services = ('db_dao', 'user_dao', 'food_dao', 'meal_dao', 'symptom_dao', 'food_catalog_cache',
+                'risk_store', 'analysis_cache', 'image_manager', 'image_jobs')
+    assert all(getattr(app_module, name) is None for name in services)
+    app_module.create_app({'DATABASE_PATH': str(tmp_path / 'other.db')})
+    assert app_module.db_dao.db_name == str(tmp_path / 'other.db')
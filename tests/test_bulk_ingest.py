@@ -0,0 +1,95 @@
+"""POST /api/meals/bulk et /api/symptoms/bulk : statut par ligne et clés d'idempotence"""
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def ids(app):
+    with app_module.db_dao.get_connection() as conn:
+        user_id = conn.execute("INSERT INTO users (username, email) VALUES ('a', 'a@x')").lastrowid
+        food_id = conn.execute("INSERT INTO foods (name, category) VALUES ('Ndolé', 'Plat')").lastrowid
+    return user_id, food_id
+
+
+def meal(user_id, food_id, key=None, day=1):
+    row = {'user_id': user_id, 'food_id': food_id, 'meal_time': f'2026-01-{day:02d}T08:00:00', 'quantity': 1}
+    if key:
+        row['idempotency_key'] = key
+    return row
+
+
+def symptom(user_id, key=None, day=1):
+    row = {'user_id': user_id, 'symptom_type': 'urticaire', 'severity': 3,
+           'occurrence_time': f'2026-01-{day:02d}T12:00:00'}
+    if key:
+        row['idempotency_key'] = key
+    return row
+
+
+def test_meals_mixed_batch(client, ids):
+    user_id, food_id = ids
+    response = client.post('/api/meals/bulk', json={'meals': [
+        meal(user_id, food_id, 'k1'),
+        meal(user_id, food_id),
+        meal(user_id, 999, 'k2'),
+        {'user_id': user_id, 'food_id': food_id, 'meal_time': 'hier', 'quantity': 1},
+        meal(user_id, food_id, day=2),
+    ]})
+    body = response.get_json()
+    assert response.status_code == 200
+    assert [r['status'] for r in body['results']] == ['created', 'created', 'invalid', 'invalid', 'created']
+    assert (body['created'], body['duplicates'], body['invalid']) == (3, 0, 2)
+    
+    created = [r['id'] for r in body['results'] if r['status'] == 'created']
+    assert len(set(created)) == 3
+    with app_module.db_dao.get_connection() as conn:
+        rows = dict(conn.execute("SELECT id, meal_time FROM meals WHERE user_id = ?", (user_id,)).fetchall())
+    assert rows[created[0]] == '2026-01-01T08:00:00'
+    assert rows[created[2]] == '2026-01-02T08:00:00'
+
+
+def test_key_repeated_within_a_batch(client, ids):
+    user_id, food_id = ids
+    body = client.post('/api/meals/bulk', json={'meals': [
+        meal(user_id, food_id, 'same'), meal(user_id, food_id, 'other'), meal(user_id, food_id, 'same'),
+    ]}).get_json()
+    first, other, repeated = body['results']
+    assert (first['status'], other['status'], repeated['status']) == ('created', 'created', 'duplicate')
+    assert repeated['id'] == first['id']
+    with app_module.db_dao.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM meals").fetchone()[0] == 2
+
+
+@pytest.mark.parametrize('path, items_key, make', [
+    ('/api/meals/bulk', 'meals', lambda user_id, food_id, key: meal(user_id, food_id, key)),
+    ('/api/symptoms/bulk', 'symptoms', lambda user_id, food_id, key: symptom(user_id, key)),
+])
+def test_retried_batch_returns_the_original_ids(client, ids, path, items_key, make):
+    user_id, food_id = ids
+    batch = {items_key: [make(user_id, food_id, f'k{i}') for i in range(5)]}
+    first = client.post(path, json=batch).get_json()
+    retry = client.post(path, json=batch).get_json()
+    assert [r['status'] for r in first['results']] == ['created'] * 5
+    assert [r['status'] for r in retry['results']] == ['duplicate'] * 5
+    assert [r['id'] for r in retry['results']] == [r['id'] for r in first['results']]
+    with app_module.db_dao.get_connection() as conn:
+        assert conn.execute(f"SELECT COUNT(*) FROM {items_key}").fetchone()[0] == 5
+
+
+def test_symptoms_mixed_batch(client, ids):
+    user_id, _ = ids
+    body = client.post('/api/symptoms/bulk', json={'symptoms': [
+        symptom(user_id, 's1'),
+        dict(symptom(user_id), severity=9),
+        symptom(999),
+        symptom(user_id, 's1'),
+        symptom(user_id, day=3),
+    ]}).get_json()
+    statuses = [r['status'] for r in body['results']]
+    assert statuses == ['created', 'invalid', 'invalid', 'duplicate', 'created']
+    assert body['results'][3]['id'] == body['results'][0]['id']
+
+
+def test_empty_batch_is_rejected(client):
+    assert client.post('/api/meals/bulk', json={'meals': []}).status_code == 400
@@ -0,0 +1,91 @@
+"""Caches versionnés par les triggers : une écriture SQL directe suffit à les renouveler"""
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def food_id(app):
+    with app_module.db_dao.get_connection() as conn:
+        return conn.execute("INSERT INTO foods (name, category) VALUES ('Ndolé', 'Plat')").lastrowid
+
+
+def add_image(food_id, name, is_primary):
+    with app_module.db_dao.get_connection() as conn:
+        return conn.execute(
+            "INSERT INTO food_images (food_id, file_path, is_primary) VALUES (?, ?, ?)",
+            (food_id, f'media/{name}.jpg', is_primary)
+        ).lastrowid
+
+
+def primary_image(client, food_id):
+    images = client.get(f'/api/foods/{food_id}/images').get_json()['images']
+    return [image['id'] for image in images if image['is_primary']]
+
+
+def test_image_lists_follow_raw_sql_writes(client, food_id):
+    first = add_image(food_id, 'a', 1)
+    second = add_image(food_id, 'b', 0)
+    assert primary_image(client, food_id) == [first]
+    etag = client.get(f'/api/foods/{food_id}').headers['ETag']
+    
+    with app_module.db_dao.get_connection() as conn:
+        conn.execute("UPDATE food_images SET is_primary = (id = ?) WHERE food_id = ?", (second, food_id))
+    assert primary_image(client, food_id) == [second]
+    detail = client.get(f'/api/foods/{food_id}', headers={'If-None-Match': etag})
+    assert detail.status_code == 200
+    assert detail.get_json()['primary_image_url'] == '/api/media/b.jpg'
+
+
+def test_image_routes_need_no_manual_invalidation(client, food_id):
+    first = add_image(food_id, 'a', 1)
+    second = add_image(food_id, 'b', 0)
+    assert primary_image(client, food_id) == [first]
+    
+    assert client.put(f'/api/images/{second}/primary').status_code == 200
+    assert primary_image(client, food_id) == [second]
+    
+    assert client.delete(f'/api/images/{second}').status_code == 200
+    images = client.get(f'/api/foods/{food_id}/images').get_json()['images']
+    assert [image['id'] for image in images] == [first]
+
+
+def test_catalog_follows_raw_sql_writes(client, food_id):
+    first = client.get('/api/foods')
+    names = [food['name'] for food in first.get_json()['foods']]
+    assert client.get('/api/foods', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    
+    with app_module.db_dao.get_connection() as conn:
+        conn.execute("INSERT INTO foods (name, category) VALUES ('Eru', 'Plat')")
+    second = client.get('/api/foods', headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert [food['name'] for food in second.get_json()['foods']] == names + ['Eru']
+    
+    created = client.post('/api/foods', json={'name': 'Okok', 'category': 'Plat'}).get_json()
+    assert client.get(f"/api/foods/{created['food_id']}").get_json()['name'] == 'Okok'
+
+
+def test_analysis_cache_follows_raw_sql_writes(app, food_id):
+    now = app_module.epoch_ms_now()
+    with app_module.db_dao.get_connection() as conn:
+        user_id = conn.execute("INSERT INTO users (username, email) VALUES ('a', 'a@x')").lastrowid
+        conn.execute(
+            "INSERT INTO meals (user_id, food_id, meal_time, meal_ts, quantity) VALUES (?, ?, 'x', ?, 1)",
+            (user_id, food_id, now - 10 * 3600 * 1000)
+        )
+    assert app_module.get_potential_allergies(user_id) == []
+    assert app_module.get_potential_allergies(user_id) == []
+    assert app_module.analysis_cache.hits == 1
+    
+    with app_module.db_dao.get_connection() as conn:
+        conn.execute(
+            "INSERT INTO symptoms (user_id, symptom_type, severity, occurrence_time, occurrence_ts) "
+            "VALUES (?, 'urticaire', 3, 'x', ?)",
+            (user_id, now - 5 * 3600 * 1000)
+        )
+    assert [allergy['food_id'] for allergy in app_module.get_potential_allergies(user_id)] == [food_id]
+    
+    with app_module.db_dao.get_connection() as conn:
+        conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
+    assert app_module.get_potential_allergies(user_id) == []
+    assert app_module.analysis_cache.hits == 1
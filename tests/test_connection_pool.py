@@ -0,0 +1,114 @@
+"""ConnectionPool : portées imbriquées, épuisement du pool et emprunts concurrents"""
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = app.ConnectionPool(str(tmp_path / 'pool.db'), max_size=2, timeout=0.2)
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE items (name TEXT)")
+    yield pool
+    pool.close_all()
+
+
+def names(pool):
+    with sqlite3.connect(pool.db_name) as conn:
+        return sorted(row[0] for row in conn.execute("SELECT name FROM items"))
+
+
+def test_nested_failure_rolls_back_only_the_nested_scope(pool):
+    with pool.connection() as outer:
+        outer.execute("INSERT INTO items VALUES ('outer')")
+        with pytest.raises(ValueError):
+            with pool.connection() as inner:
+                assert inner is outer
+                inner.execute("INSERT INTO items VALUES ('inner')")
+                raise ValueError
+    assert names(pool) == ['outer']
+
+
+def test_nested_commit_does_not_commit_the_outer_transaction(pool):
+    with pytest.raises(ValueError):
+        with pool.connection() as outer:
+            outer.execute("INSERT INTO items VALUES ('outer')")
+            with pool.connection() as inner:
+                inner.execute("INSERT INTO items VALUES ('inner')")
+                inner.commit()
+            raise ValueError
+    assert names(pool) == []
+
+
+def test_nested_explicit_rollback_keeps_outer_work(pool):
+    with pool.connection() as outer:
+        outer.execute("INSERT INTO items VALUES ('outer')")
+        with pool.connection() as inner:
+            inner.execute("INSERT INTO items VALUES ('inner')")
+            inner.rollback()
+    assert names(pool) == ['outer']
+
+
+def test_exhausted_pool_times_out(pool):
+    held = threading.Event()
+    done = threading.Event()
+    
+    def hold():
+        with pool.connection():
+            held.set()
+            done.wait(5)
+    
+    holders = [threading.Thread(target=hold) for _ in range(pool.max_size)]
+    for thread in holders:
+        thread.start()
+        held.wait(5)
+        held.clear()
+    try:
+        started = time.monotonic()
+        with pytest.raises(app.PoolTimeoutError):
+            with pool.connection():
+                pass
+        assert time.monotonic() - started >= pool.timeout
+        assert pool.stats()['timeouts'] == 1
+    finally:
+        done.set()
+        for thread in holders:
+            thread.join()
+
+
+def test_concurrent_checkouts_stay_within_the_pool(pool):
+    pool.timeout = 5
+    lock = threading.Lock()
+    in_flight = []
+    peak = [0]
+    errors = []
+    
+    def work(index):
+        try:
+            with pool.connection() as conn:
+                with lock:
+                    in_flight.append(conn)
+                    peak[0] = max(peak[0], len(in_flight))
+                    assert len(set(map(id, in_flight))) == len(in_flight)
+                conn.execute("INSERT INTO items VALUES (?)", (f'item{index}',))
+                time.sleep(0.05)
+                with lock:
+                    in_flight.remove(conn)
+        except Exception as e:
+            errors.append(e)
+    
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    assert errors == []
+    assert peak[0] == pool.max_size
+    assert len(names(pool)) == 8
+    stats = pool.stats()
+    assert stats['in_use'] == 0 and stats['size'] <= pool.max_size and stats['waits'] > 0
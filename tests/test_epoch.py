@@ -0,0 +1,82 @@
+"""Horodatages en ms epoch : conversion des dates ISO (naïves lues en UTC) et migration des lignes existantes"""
+import pytest
+
+import app as app_module
+
+JAN_1 = 1767225600000  # 2026-01-01T00:00:00Z
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('2026-01-01', JAN_1),
+    ('2026-01-01T00:00:00', JAN_1),
+    ('2026-01-01 02:30:00', JAN_1 + 9000000),
+    ('2026-01-01T00:00:00Z', JAN_1),
+    ('2026-01-01T01:00:00+01:00', JAN_1),
+    ('2025-12-31T19:00:00-05:00', JAN_1),
+    ('2026-01-01T00:00:00.999999', JAN_1 + 999),
+    ('1969-12-31T23:59:59.9995', -1),
+])
+def test_to_epoch_ms(value, expected):
+    assert app_module.to_epoch_ms(value) == expected
+
+
+@pytest.mark.parametrize('value', ['hier', '', '2026-13-01', None, 12])
+def test_to_epoch_ms_rejects(value):
+    with pytest.raises(ValueError):
+        app_module.to_epoch_ms(value)
+
+
+def test_naive_dates_ignore_server_timezone(monkeypatch):
+    monkeypatch.setenv('TZ', 'Africa/Douala')
+    app_module.time.tzset()
+    try:
+        assert app_module.to_epoch_ms('2026-01-01T00:00:00') == JAN_1
+    finally:
+        monkeypatch.undo()
+        app_module.time.tzset()
+
+
+def test_existing_rows_are_converted(tmp_path, monkeypatch):
+    path = str(tmp_path / 'legacy.db')
+    migrations = app_module.DatabaseDAO.MIGRATIONS
+    monkeypatch.setattr(app_module.DatabaseDAO, 'MIGRATIONS', [m for m in migrations if m[0] < 14])
+    dao = app_module.DatabaseDAO(path)
+    with dao.get_connection() as conn:
+        user_id = conn.execute("INSERT INTO users (username, email) VALUES ('a', 'a@x')").lastrowid
+        food_id = conn.execute("INSERT INTO foods (name, category) VALUES ('Ndolé', 'Plat')").lastrowid
+        conn.executemany(
+            "INSERT INTO meals (user_id, food_id, meal_time, quantity) VALUES (?, ?, ?, 1)",
+            [(user_id, food_id, value) for value in ('2026-01-01 08:00:00', '2026-01-01T09:00:00+01:00', 'midi')]
+        )
+        conn.execute("INSERT INTO symptoms (user_id, symptom_type, severity, occurrence_time) "
+                     "VALUES (?, 'urticaire', 2, '2026-01-01T10:00:00')", (user_id,))
+    dao.pool.close_all()
+    
+    monkeypatch.setattr(app_module.DatabaseDAO, 'MIGRATIONS', migrations)
+    dao = app_module.DatabaseDAO(path)
+    try:
+        with dao.get_connection() as conn:
+            meals = [row[0] for row in conn.execute("SELECT meal_ts FROM meals ORDER BY id")]
+            symptoms = [row[0] for row in conn.execute("SELECT occurrence_ts FROM symptoms")]
+    finally:
+        dao.pool.close_all()
+    
+    # Date illisible ramenée à 0 : hors de toute période d'analyse
+    assert meals == [JAN_1 + 8 * 3600000, JAN_1 + 8 * 3600000, 0]
+    assert symptoms == [JAN_1 + 10 * 3600000]
+
+
+def test_api_stores_naive_dates_as_utc(client):
+    with app_module.db_dao.get_connection() as conn:
+        user_id = conn.execute("INSERT INTO users (username, email) VALUES ('a', 'a@x')").lastrowid
+        food_id = conn.execute("INSERT INTO foods (name, category) VALUES ('Ndolé', 'Plat')").lastrowid
+    client.post('/api/meals', json={'user_id': user_id, 'food_id': food_id,
+                                     'meal_time': '2026-01-01T08:00:00', 'quantity': 1})
+    client.post('/api/meals/bulk', json={'meals': [{'user_id': user_id, 'food_id': food_id,
+                                                    'meal_time': '2026-01-01T09:00:00+01:00', 'quantity': 1}]})
+    assert client.post('/api/meals', json={'user_id': user_id, 'food_id': food_id,
+                                            'meal_time': 'midi', 'quantity': 1}).status_code == 400
+    
+    with app_module.db_dao.get_connection() as conn:
+        stored = [row[0] for row in conn.execute("SELECT meal_ts FROM meals ORDER BY id")]
+    assert stored == [JAN_1 + 8 * 3600000] * 2
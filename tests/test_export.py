@@ -0,0 +1,75 @@
+"""Export en flux : reprise par curseur (NDJSON et CSV), gzip, analyse finale lue dans le store"""
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def user_id(app, monkeypatch):
+    monkeypatch.setattr(app_module, 'EXPORT_CHUNK_SIZE', 2)
+    now = app_module.epoch_ms_now()
+    hour = 3600 * 1000
+    with app_module.db_dao.get_connection() as conn:
+        user_id = conn.execute("INSERT INTO users (username, email) VALUES ('a', 'a@x')").lastrowid
+        food_id = conn.execute("INSERT INTO foods (name, category) VALUES ('Ndolé', 'Plat')").lastrowid
+        for i in range(5):
+            conn.execute(
+                "INSERT INTO meals (user_id, food_id, meal_time, meal_ts, quantity) VALUES (?, ?, ?, ?, 1)",
+                (user_id, food_id, f'repas {i}', now - (100 - i) * hour)
+            )
+        for i in range(3):
+            conn.execute(
+                "INSERT INTO symptoms (user_id, symptom_type, severity, occurrence_time, occurrence_ts) "
+                "VALUES (?, 'urticaire', 2, ?, ?)",
+                (user_id, f'symptôme {i}', now - (97 - i) * hour)
+            )
+    return user_id
+
+
+def ndjson(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_ndjson_resume(client, user_id, monkeypatch):
+    full = ndjson(client.get(f'/api/export/{user_id}/data?format=ndjson'))
+    assert [line['type'] for line in full] == ['user'] + ['meal'] * 5 + ['symptom'] * 3 + ['end']
+    assert full[-1]['allergy_analysis'] == app_module.risk_store.detect_potential_allergies(user_id)
+    assert full[-1]['allergy_analysis'][0]['risk_score'] == 80.0
+    
+    def no_engine(*args, **kwargs):
+        raise AssertionError("la ligne de fin ne doit pas relancer le moteur")
+    
+    monkeypatch.setattr(app_module.AllergyDetectionEngine, 'detect_potential_allergies', no_engine)
+    for position in (3, 6):
+        resumed = ndjson(client.get(f"/api/export/{user_id}/data?format=ndjson&cursor={full[position]['cursor']}"))
+        assert resumed[:-1] == full[position + 1:-1]
+        assert resumed[-1]['allergy_analysis'] == full[-1]['allergy_analysis']
+
+
+def test_csv_resume(client, user_id):
+    full = list(csv.reader(io.StringIO(client.get(f'/api/export/{user_id}/data?format=csv').get_data(as_text=True))))
+    assert full[0] == list(app_module.EXPORT_CSV_COLUMNS)
+    assert [row[0] for row in full[1:]] == ['meal'] * 5 + ['symptom'] * 3
+    
+    cursor = full[5][-1]
+    body = client.get(f'/api/export/{user_id}/data?format=csv&cursor={cursor}').get_data(as_text=True)
+    assert list(csv.reader(io.StringIO(body))) == full[6:]
+
+
+def test_invalid_cursor(client, user_id):
+    assert client.get(f'/api/export/{user_id}/data?format=csv&cursor=abc').status_code == 400
+
+
+def test_gzip(client, user_id):
+    plain = client.get(f'/api/export/{user_id}/data?format=csv')
+    assert 'Content-Encoding' not in plain.headers
+    
+    compressed = client.get(f'/api/export/{user_id}/data?format=csv', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert gzip.decompress(compressed.get_data()) == plain.get_data()
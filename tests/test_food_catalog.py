@@ -0,0 +1,48 @@
+"""GET /api/foods : image principale et nombre d'images sans requête par aliment"""
+import app as app_module
+
+
+def add_foods(count):
+    with app_module.db_dao.get_connection() as conn:
+        for i in range(count):
+            food_id = conn.execute("INSERT INTO foods (name, category) VALUES (?, 'Plat')", (f'f{i}',)).lastrowid
+            # i images par aliment (au plus 3), la dernière principale
+            for n in range(min(i, 3)):
+                conn.execute("INSERT INTO food_images (food_id, file_path, is_primary) VALUES (?, ?, ?)",
+                             (food_id, f'media/{i}_{n}.jpg', n == min(i, 3) - 1))
+
+
+def traced_get(client, url):
+    app_module.start_sql_trace()
+    try:
+        body = client.get(url).get_json()
+    finally:
+        statements = app_module.stop_sql_trace()
+    return body, len(statements)
+
+
+def test_statement_count_does_not_grow_with_catalog(client):
+    add_foods(3)
+    _, small = traced_get(client, '/api/foods')
+    add_foods(30)
+    _, large = traced_get(client, '/api/foods')
+    assert large == small
+    
+    # Catalogue inchangé : servi depuis le cache
+    _, cached = traced_get(client, '/api/foods')
+    assert cached < small
+
+
+def test_primary_image_and_count(client):
+    add_foods(5)
+    foods = client.get('/api/foods').get_json()['foods']
+    assert [food['image_count'] for food in foods] == [0, 1, 2, 3, 3]
+    assert [food['image_url'] for food in foods] == [
+        None, '/api/media/1_0.jpg', '/api/media/2_1.jpg', '/api/media/3_2.jpg', '/api/media/4_2.jpg'
+    ]
+    assert foods[1]['thumbnail_url'] == '/api/media/1_0.jpg?size=thumb'
+    
+    page = client.get('/api/foods?fields=id,image_url&limit=2').get_json()
+    assert page['foods'] == [{'id': foods[0]['id'], 'image_url': None},
+                             {'id': foods[1]['id'], 'image_url': '/api/media/1_0.jpg'}]
+    assert page['next_cursor']
@@ -0,0 +1,50 @@
+"""Recherche FTS5 : préfixes, accents ignorés, classement bm25 et synchronisation par triggers"""
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def foods(app):
+    rows = [
+        ('Ndolé', 'Plat', 'arachides, feuilles amères'),
+        ('Poulet DG', 'Plat', 'poulet, plantain'),
+        ('Sauce arachide', 'Sauce', 'arachides, tomate'),
+        ('Beignets', 'Dessert', 'farine, sucre'),
+    ]
+    with app_module.db_dao.get_connection() as conn:
+        conn.executemany("INSERT INTO foods (name, category, ingredients) VALUES (?, ?, ?)", rows)
+
+
+def search(client, query, **params):
+    response = client.get('/api/foods/search', query_string={'q': query, **params})
+    assert response.status_code == 200
+    return [food['name'] for food in response.get_json()['foods']]
+
+
+def test_prefix_and_accents(client, foods):
+    assert search(client, 'ndo') == ['Ndolé']
+    assert search(client, 'NDOLE') == ['Ndolé']
+    assert search(client, 'poul plan') == ['Poulet DG']
+    assert search(client, 'xyz') == []
+
+
+def test_name_ranks_above_ingredients(client, foods):
+    # "arachide" est dans le nom de la sauce mais seulement dans les ingrédients du ndolé
+    assert search(client, 'arachide') == ['Sauce arachide', 'Ndolé']
+    assert search(client, 'arachide', limit=1, offset=1) == ['Ndolé']
+
+
+def test_index_follows_writes(client, foods):
+    with app_module.db_dao.get_connection() as conn:
+        conn.execute("UPDATE foods SET name = 'Koki' WHERE name = 'Beignets'")
+        conn.execute("DELETE FROM foods WHERE name = 'Ndolé'")
+    assert search(client, 'beign') == []
+    assert search(client, 'koki') == ['Koki']
+    assert search(client, 'ndole') == []
+
+
+def test_punctuation_only_and_missing_query(client, foods):
+    assert search(client, '"*') == []
+    assert client.get('/api/foods/search').status_code == 400
+    assert client.get('/api/foods/search?q=a&limit=x').status_code == 400
@@ -0,0 +1,73 @@
+"""Historique des repas et symptômes : parcours complet par curseur, égalités d'horodatage, filtres de dates"""
+import pytest
+
+import app as app_module
+
+# Deux repas partagent chaque horodatage : le curseur (ts, id) les départage
+MEAL_TIMES = ['2026-01-01T08:00:00', '2026-01-01T08:00:00', '2026-01-02T12:30:00+01:00',
+              '2026-01-02T11:30:00Z', '2026-01-03T19:00:00', '2026-01-04T07:00:00']
+SYMPTOM_TIMES = ['2026-01-01T10:00:00', '2026-01-02T10:00:00', '2026-01-02T10:00:00', '2026-01-05T09:00:00']
+
+
+@pytest.fixture
+def user_id(client):
+    with app_module.db_dao.get_connection() as conn:
+        user_id = conn.execute("INSERT INTO users (username, email) VALUES ('a', 'a@x')").lastrowid
+        food_id = conn.execute("INSERT INTO foods (name, category) VALUES ('Ndolé', 'Plat')").lastrowid
+    for meal_time in MEAL_TIMES:
+        client.post('/api/meals', json={'user_id': user_id, 'food_id': food_id,
+                                         'meal_time': meal_time, 'quantity': 1})
+    for occurrence_time in SYMPTOM_TIMES:
+        client.post('/api/symptoms', json={'user_id': user_id, 'symptom_type': 'urticaire',
+                                            'severity': 2, 'occurrence_time': occurrence_time})
+    return user_id
+
+
+def walk(client, url, key):
+    items = []
+    response = client.get(url).get_json()
+    items.extend(response[key])
+    pages = 1
+    while response['next_cursor']:
+        response = client.get(f"{url}&cursor={response['next_cursor']}").get_json()
+        items.extend(response[key])
+        pages += 1
+    return items, pages
+
+
+def newest_first(times):
+    """Ids attendus : ordre (ts, id) décroissant, ids attribués dans l'ordre d'insertion"""
+    keyed = [(app_module.to_epoch_ms(value), index + 1) for index, value in enumerate(times)]
+    return [item_id for _, item_id in sorted(keyed, reverse=True)]
+
+
+@pytest.mark.parametrize('limit', [1, 2, 4, 6, 50])
+def test_meal_pages_cover_history_once(client, user_id, limit):
+    meals, pages = walk(client, f'/api/users/{user_id}/meals?limit={limit}', 'meals')
+    assert [meal['id'] for meal in meals] == newest_first(MEAL_TIMES)
+    # Page pleine en dernier : une page vide de plus signale la fin
+    assert pages == len(MEAL_TIMES) // limit + 1
+
+
+@pytest.mark.parametrize('limit', [1, 3])
+def test_symptom_pages_cover_history_once(client, user_id, limit):
+    symptoms, _ = walk(client, f'/api/users/{user_id}/symptoms?limit={limit}', 'symptoms')
+    assert [symptom['id'] for symptom in symptoms] == newest_first(SYMPTOM_TIMES)
+
+
+def test_date_filters_compare_in_utc(client, user_id):
+    # 12:30+01:00 et 11:30Z désignent le même instant ; une end_date sans heure couvre la journée
+    url = f'/api/users/{user_id}/meals?start_date=2026-01-02T11:30:00Z&end_date=2026-01-03&limit=1'
+    meals, _ = walk(client, url, 'meals')
+    assert [meal['meal_time'] for meal in meals] == MEAL_TIMES[4:1:-1]
+    
+    symptoms, _ = walk(client, f'/api/users/{user_id}/symptoms?end_date=2026-01-02&limit=2', 'symptoms')
+    assert len(symptoms) == 3
+
+
+def test_invalid_parameters(client, user_id):
+    url = f'/api/users/{user_id}/meals'
+    assert client.get(f'{url}?cursor=abc').status_code == 400
+    assert client.get(f'{url}?limit=0').status_code == 400
+    assert client.get(f'{url}?start_date=hier').status_code == 400
+    assert client.get(f'/api/users/{user_id}/symptoms?cursor=abc').status_code == 400
@@ -0,0 +1,113 @@
+"""Téléchargement concurrent des images : parallélisme, limite par hôte, nouvelles tentatives, échéance"""
+import threading
+import time
+
+import requests
+
+import app as app_module
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, content=b'image', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = {'content-type': 'image/jpeg', **(headers or {})}
+
+
+class FakeSession:
+    """Session HTTP simulée : réponses programmées par URL, mesure de la concurrence par hôte"""
+    
+    def __init__(self, delay=0.0, responses=None):
+        self.delay = delay
+        self.responses = responses or {}
+        self.calls = []
+        self.active = {}
+        self.peak = {}
+        self.lock = threading.Lock()
+    
+    def get(self, url, timeout=None):
+        host = url.split('/')[2]
+        with self.lock:
+            self.calls.append(url)
+            self.active[host] = self.active.get(host, 0) + 1
+            self.peak[host] = max(self.peak.get(host, 0), self.active[host])
+        try:
+            time.sleep(self.delay)
+            queued = self.responses.get(url)
+            response = queued.pop(0) if queued else FakeResponse(content=url.encode())
+            if isinstance(response, Exception):
+                raise response
+            return response
+        finally:
+            with self.lock:
+                self.active[host] -= 1
+
+
+def store(url, content, content_type):
+    return {'stored': content}
+
+
+def test_downloads_run_in_parallel_in_order(app):
+    session = FakeSession(delay=0.2)
+    downloader = app_module.ImageDownloader(max_workers=8, per_host=4, session=session)
+    urls = [f'http://h{i}/{i}.jpg' for i in range(8)]
+    
+    started = time.monotonic()
+    outcomes = downloader.download_all(urls, store)
+    assert time.monotonic() - started < 0.2 * 4
+    assert [outcome['url'] for outcome in outcomes] == urls
+    assert [outcome['stored'] for outcome in outcomes] == [url.encode() for url in urls]
+    assert {outcome['status'] for outcome in outcomes} == {'ok'}
+
+
+def test_per_host_limit(app):
+    session = FakeSession(delay=0.05)
+    downloader = app_module.ImageDownloader(max_workers=8, per_host=2, session=session)
+    downloader.download_all([f'http://meme-hote/{i}.jpg' for i in range(8)], store)
+    assert session.peak == {'meme-hote': 2}
+
+
+def test_retries_transient_errors(app):
+    url = 'http://h/a.jpg'
+    session = FakeSession(responses={url: [FakeResponse(503), requests.ConnectionError('reset'), FakeResponse()]})
+    downloader = app_module.ImageDownloader(retries=3, backoff=0, session=session)
+    outcome, = downloader.download_all([url], store)
+    assert (outcome['status'], outcome['attempts']) == ('ok', 3)
+    
+    missing = 'http://h/absent.jpg'
+    session.responses[missing] = [FakeResponse(404)]
+    outcome, = downloader.download_all([missing], store)
+    assert (outcome['status'], outcome['attempts'], outcome['error']) == ('failed', 1, 'HTTP 404')
+
+
+def test_retry_after_beyond_deadline_gives_up(app):
+    url = 'http://h/a.jpg'
+    session = FakeSession(responses={url: [FakeResponse(429, headers={'Retry-After': '60'})]})
+    downloader = app_module.ImageDownloader(retries=3, backoff=0, session=session)
+    started = time.monotonic()
+    outcome, = downloader.download_all([url], store, deadline=1)
+    assert time.monotonic() - started < 1
+    assert outcome['status'] == 'failed'
+    assert 'Retry-After 60s' in outcome['error']
+    assert session.calls == [url]
+
+
+def test_deadline_skips_queued_urls(app):
+    session = FakeSession(delay=0.3)
+    downloader = app_module.ImageDownloader(max_workers=4, per_host=1, session=session)
+    outcomes = downloader.download_all([f'http://h/{i}.jpg' for i in range(4)] + [''], store, deadline=0.5)
+    statuses = [outcome['status'] for outcome in outcomes]
+    assert statuses[0] == 'ok'
+    assert 'skipped' in statuses[1:4]
+    assert statuses[4] == 'skipped'
+    assert len(session.calls) < 4
+
+
+def test_store_errors_are_reported(app):
+    def failing_store(url, content, content_type):
+        raise OSError('disque plein')
+    
+    downloader = app_module.ImageDownloader(session=FakeSession())
+    outcome, = downloader.download_all(['http://h/a.jpg'], failing_store)
+    assert outcome['status'] == 'failed'
+    assert 'disque plein' in outcome['error']
@@ -0,0 +1,94 @@
+"""File de jobs d'images : bail, reprise d'un bail expiré, nouvelles tentatives espacées"""
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def queue(app):
+    queue = app_module.image_jobs
+    # Pas de threads : le test réclame et traite les jobs lui-même
+    queue.workers = 0
+    return queue
+
+
+@pytest.fixture
+def food_id(app):
+    with app_module.db_dao.get_connection() as conn:
+        return conn.execute("INSERT INTO foods (name, category) VALUES ('Ndolé', 'Plat')").lastrowid
+
+
+def job_state(job_id):
+    with app_module.db_dao.get_connection() as conn:
+        return conn.execute("SELECT status, attempts, error, available_at FROM image_jobs WHERE id = ?",
+                            (job_id,)).fetchone()
+
+
+def make_available(job_id):
+    with app_module.db_dao.get_connection() as conn:
+        conn.execute("UPDATE image_jobs SET available_at = 0 WHERE id = ?", (job_id,))
+
+
+def download_result(monkeypatch, result):
+    calls = []
+    
+    def download(image_url, food_id, food_name, is_primary=False):
+        calls.append(image_url)
+        return dict(result)
+    
+    monkeypatch.setattr(app_module.image_manager, 'download_and_save_image', download)
+    return calls
+
+
+def test_claim_leases_each_job_once(queue, food_id):
+    first = queue.enqueue(food_id, 'http://x/a.jpg')
+    second = queue.enqueue(food_id, 'http://x/b.jpg')
+    
+    assert queue.claim()[0] == first
+    assert queue.claim()[0] == second
+    assert queue.claim() is None
+    assert job_state(first)[:2] == ('running', 1)
+    
+    # Worker arrêté en plein téléchargement : le bail expire et le job est repris
+    with app_module.db_dao.get_connection() as conn:
+        conn.execute("UPDATE image_jobs SET lease_expires_at = 0 WHERE id = ?", (first,))
+    job = queue.claim()
+    assert (job[0], job[4]) == (first, 2)
+    assert queue.claim() is None
+
+
+def test_network_errors_are_retried_then_fail(queue, food_id, monkeypatch):
+    calls = download_result(monkeypatch, {'success': False, 'error': 'timeout', 'retryable': True})
+    job_id = queue.enqueue(food_id, 'http://x/a.jpg')
+    
+    before = app_module.time.time()
+    queue.process(queue.claim())
+    status, attempts, error, available_at = job_state(job_id)
+    assert (status, attempts, error) == ('pending', 1, 'timeout')
+    assert available_at >= before + queue.RETRY_DELAY
+    assert queue.claim() is None
+    
+    for _ in range(2, queue.MAX_ATTEMPTS + 1):
+        make_available(job_id)
+        queue.process(queue.claim())
+    assert job_state(job_id)[:3] == ('failed', queue.MAX_ATTEMPTS, 'timeout')
+    assert len(calls) == queue.MAX_ATTEMPTS
+    
+    make_available(job_id)
+    assert queue.claim() is None
+
+
+def test_invalid_content_fails_without_retry(queue, food_id, monkeypatch):
+    download_result(monkeypatch, {'success': False, 'error': 'Fichier image invalide'})
+    job_id = queue.enqueue(food_id, 'http://x/a.jpg')
+    queue.process(queue.claim())
+    assert job_state(job_id)[:3] == ('failed', 1, 'Fichier image invalide')
+
+
+def test_success_records_image(queue, food_id, monkeypatch):
+    download_result(monkeypatch, {'success': True, 'image_id': 7})
+    job_id = queue.enqueue(food_id, 'http://x/a.jpg')
+    queue.process(queue.claim())
+    assert job_state(job_id)[:2] == ('done', 1)
+    assert queue.get_job(job_id)[7] == 7
+
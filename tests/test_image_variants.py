@@ -0,0 +1,65 @@
+"""Variantes d'images : tailles générées sans agrandissement, formats WebP/JPEG, ?size= négocié"""
+import io
+
+import pytest
+from PIL import Image
+
+import app as app_module
+
+
+def png_bytes(width, height, mode='RGB'):
+    buffer = io.BytesIO()
+    Image.new(mode, (width, height), (200, 30, 30, 128) if mode == 'RGBA' else (200, 30, 30)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def stored(media_folder):
+    file_path, _ = app_module.image_manager.store_bytes(png_bytes(800, 400), '.png')
+    return file_path
+
+
+def test_variants_never_upscale(stored):
+    variants = app_module.image_manager.generate_variants(stored)
+    sizes = {(v['size'], v['format']): (v['width'], v['height']) for v in variants}
+    assert sizes == {
+        ('thumb', 'webp'): (200, 100), ('thumb', 'jpeg'): (200, 100),
+        ('medium', 'webp'): (600, 300), ('medium', 'jpeg'): (600, 300),
+    }
+    assert all(Image.open(v['file_path']).format == ('WEBP' if v['format'] == 'webp' else 'JPEG')
+               for v in variants)
+    
+    # Même contenu : les fichiers déjà présents sont réutilisés
+    assert app_module.image_manager.generate_variants(stored) == variants
+
+
+def test_transparent_image_jpeg_variant(media_folder):
+    file_path, _ = app_module.image_manager.store_bytes(png_bytes(300, 300, 'RGBA'), '.png')
+    variants = app_module.image_manager.generate_variants(file_path)
+    jpeg = next(v for v in variants if v['format'] == 'jpeg')
+    assert Image.open(jpeg['file_path']).mode == 'RGB'
+
+
+def test_size_parameter_serves_variant(client, stored):
+    app_module.image_manager.generate_variants(stored)
+    url = app_module.media_url(stored)
+    
+    webp = client.get(f'{url}?size=thumb', headers={'Accept': 'image/webp,*/*'})
+    assert webp.mimetype == 'image/webp'
+    assert 'Accept' in webp.headers['Vary']
+    assert Image.open(io.BytesIO(webp.get_data())).size == (200, 100)
+    
+    jpeg = client.get(f'{url}?size=medium&format=jpeg')
+    assert jpeg.mimetype == 'image/jpeg'
+    assert 'Vary' not in jpeg.headers
+    
+    # Variante non générée (original plus petit) : l'original est servi
+    large = client.get(f'{url}?size=large&format=webp')
+    assert large.mimetype == 'image/png'
+    assert Image.open(io.BytesIO(large.get_data())).size == (800, 400)
+
+
+def test_unknown_size_or_format(client, stored):
+    url = app_module.media_url(stored)
+    assert client.get(f'{url}?size=huge').status_code == 400
+    assert client.get(f'{url}?size=thumb&format=bmp').status_code == 400
@@ -0,0 +1,78 @@
+"""Service de /api/media : GET conditionnel (304), Range (206) et cache longue durée"""
+import os
+
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def stored(media_folder):
+    file_path, content_hash = app_module.image_manager.store_bytes(bytes(range(256)) * 4, '.jpg')
+    return app_module.media_url(file_path), content_hash
+
+
+def test_content_addressed_file_is_immutable(client, stored):
+    url, content_hash = stored
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers['ETag'] == f'"{content_hash}.jpg"'
+    assert response.cache_control.public
+    assert response.cache_control.immutable
+    assert response.cache_control.max_age == app_module.MEDIA_IMMUTABLE_MAX_AGE
+
+
+def test_conditional_get(client, stored):
+    url, _ = stored
+    first = client.get(url)
+    
+    by_etag = client.get(url, headers={'If-None-Match': first.headers['ETag']})
+    assert by_etag.status_code == 304
+    assert by_etag.get_data() == b''
+    
+    by_date = client.get(url, headers={'If-Modified-Since': first.headers['Last-Modified']})
+    assert by_date.status_code == 304
+    
+    assert client.get(url, headers={'If-None-Match': '"autre"'}).status_code == 200
+
+
+def test_range_requests(client, stored):
+    url, _ = stored
+    body = client.get(url).get_data()
+    
+    partial = client.get(url, headers={'Range': 'bytes=10-19'})
+    assert partial.status_code == 206
+    assert partial.get_data() == body[10:20]
+    assert partial.headers['Content-Range'] == f'bytes 10-19/{len(body)}'
+    assert partial.headers['Accept-Ranges'] == 'bytes'
+    
+    suffix = client.get(url, headers={'Range': 'bytes=-4'})
+    assert suffix.status_code == 206
+    assert suffix.get_data() == body[-4:]
+    
+    assert client.get(url, headers={'Range': f'bytes={len(body)}-'}).status_code == 416
+
+
+def test_other_files_get_short_cache(client, media_folder):
+    with open(os.path.join(media_folder, 'legacy.jpg'), 'wb') as f:
+        f.write(b'ancien')
+    response = client.get('/api/media/legacy.jpg')
+    assert response.status_code == 200
+    assert response.cache_control.max_age == app_module.MEDIA_MAX_AGE
+    assert not response.cache_control.immutable
+    
+    assert client.get('/api/media/legacy.jpg', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+def test_missing_and_traversal(client, media_folder):
+    assert client.get('/api/media/ab/cd/absent.jpg').status_code == 404
+    assert client.get('/api/media/../app.py').status_code == 404
+
+
+def test_accel_redirect(client, stored, monkeypatch):
+    url, _ = stored
+    monkeypatch.setattr(app_module, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+    response = client.get(url)
+    assert response.headers['X-Accel-Redirect'] == '/protected-media/' + url[len('/api/media/'):]
+    assert response.get_data() == b''
+    assert response.cache_control.immutable
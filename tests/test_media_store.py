@@ -0,0 +1,86 @@
+"""Store de médias par contenu : une copie par contenu, fichiers orphelins récupérés"""
+import io
+import os
+
+import pytest
+from PIL import Image
+
+import app as app_module
+
+
+def png_bytes(color):
+    buffer = io.BytesIO()
+    Image.new('RGB', (300, 200), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def stored_files(folder):
+    return sorted(os.path.relpath(os.path.join(root, name), folder)
+                  for root, _, names in os.walk(folder) for name in names)
+
+
+@pytest.fixture
+def foods(app):
+    with app_module.db_dao.get_connection() as conn:
+        return [conn.execute("INSERT INTO foods (name, category) VALUES (?, 'Plat')", (name,)).lastrowid
+                for name in ('Ndolé', 'Eru')]
+
+
+def register(food_id, content):
+    manager = app_module.image_manager
+    file_path, content_hash = manager.store_bytes(content, '.jpg')
+    return file_path, manager.register_image(
+        food_id, file_path, 'http://x/a', file_size=len(content),
+        variants=manager.generate_variants(file_path), content_hash=content_hash
+    )
+
+
+def test_same_content_is_stored_once(media_folder):
+    content = png_bytes((200, 30, 30))
+    first = app_module.image_manager.store_bytes(content, '.png')
+    # Extension annoncée fausse : le contenu décide du chemin
+    second = app_module.image_manager.store_bytes(content, '.jpg')
+    assert first == second
+    assert first[0].endswith(first[1] + '.png')
+    assert stored_files(media_folder) == [os.path.relpath(first[0], media_folder)]
+
+
+def test_file_kept_while_referenced(media_folder, foods):
+    content = png_bytes((200, 30, 30))
+    file_path, first = register(foods[0], content)
+    _, second = register(foods[1], content)
+    files = stored_files(media_folder)
+    assert len(files) == 3    # original + thumb webp/jpeg
+    
+    assert app_module.image_manager.delete_image(first)
+    assert stored_files(media_folder) == files
+    
+    assert app_module.image_manager.delete_image(second)
+    assert stored_files(media_folder) == []
+    assert os.listdir(media_folder) == []    # répertoires de shard supprimés
+    with app_module.db_dao.get_connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM media_orphans").fetchone()[0] == 0
+
+
+def test_reregistered_orphan_is_not_reclaimed(media_folder, foods):
+    content = png_bytes((30, 200, 30))
+    file_path, image_id = register(foods[0], content)
+    with app_module.db_dao.get_connection() as conn:
+        conn.execute("DELETE FROM food_images WHERE id = ?", (image_id,))
+        assert conn.execute("SELECT file_path FROM media_orphans").fetchall() == [(file_path,)]
+    
+    # Le même contenu est réenregistré avant le passage de reclaim_orphans
+    register(foods[1], content)
+    assert app_module.image_manager.reclaim_orphans() == 0
+    assert os.path.exists(file_path)
+
+
+def test_reclaim_command(app, media_folder, foods):
+    file_path, _ = register(foods[0], png_bytes((30, 30, 200)))
+    with app_module.db_dao.get_connection() as conn:
+        conn.execute("DELETE FROM foods WHERE id = ?", (foods[0],))
+    assert os.path.exists(file_path)
+    
+    result = app.test_cli_runner().invoke(args=['reclaim-media'])
+    assert '3 fichier(s) supprimé(s)' in result.output
+    assert stored_files(media_folder) == []
@@ -0,0 +1,70 @@
+"""Répertoire des métriques multi-processus : seuls les fichiers metrics_* sont lus ou supprimés"""
+import importlib.util
+import os
+
+import pytest
+
+import app as app_module
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'gunicorn.conf.py')
+
+
+@pytest.fixture
+def metrics_dir(tmp_path):
+    directory = tmp_path / 'metrics'
+    directory.mkdir()
+    return directory
+
+
+@pytest.fixture
+def config(metrics_dir, monkeypatch):
+    monkeypatch.setenv('METRICS_DIR', str(metrics_dir))
+    spec = importlib.util.spec_from_file_location('gunicorn_conf', CONFIG_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def touch(directory, *names):
+    for name in names:
+        (directory / name).write_text('{}')
+
+
+def test_start_clears_only_snapshots(config, metrics_dir):
+    touch(metrics_dir, 'metrics_12.json', 'metrics_archive.json', 'metrics_13.json.tmp')
+    config.on_starting(None)
+    assert os.listdir(metrics_dir) == []
+    
+    config.on_exit(None)
+    assert not metrics_dir.exists()
+
+
+def test_foreign_files_are_never_deleted(config, metrics_dir):
+    touch(metrics_dir, 'metrics_12.json', 'notes.txt', 'metrics.db', 'metrics_12.json.bak')
+    (metrics_dir / 'metrics_dir').mkdir()
+    with pytest.raises(RuntimeError, match='notes.txt'):
+        config.on_starting(None)
+    assert sorted(os.listdir(metrics_dir)) == ['metrics.db', 'metrics_12.json.bak', 'metrics_dir', 'notes.txt']
+    
+    config.on_exit(None)
+    assert sorted(os.listdir(metrics_dir)) == ['metrics.db', 'metrics_12.json.bak', 'metrics_dir', 'notes.txt']
+
+
+def test_registry_reads_and_archives_snapshots(metrics_dir):
+    registry = app_module.MetricsRegistry(str(metrics_dir))
+    requests = registry.counter('requests_total', 'Requêtes', ('status',))
+    workers = registry.gauge('workers', 'Workers')
+    
+    requests.inc('200')
+    workers.set(1)
+    registry._write(registry._path(1), registry.snapshot())
+    registry.mark_process_dead(1)
+    assert sorted(os.listdir(metrics_dir)) == ['metrics_archive.json']
+    
+    touch(metrics_dir, 'notes.json')
+    requests.inc('200')
+    text = registry.render()
+    # Compteur du worker arrêté conservé, sa jauge retirée
+    assert 'requests_total{status="200"} 3' in text
+    assert 'workers 1' in text
+    assert (metrics_dir / 'notes.json').exists()
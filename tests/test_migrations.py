@@ -0,0 +1,49 @@
+"""Migrations : une base neuve obtient le même schéma sans créer d'index voués à disparaître"""
+import re
+
+import app
+
+
+def schema(path):
+    dao = app.DatabaseDAO(path)
+    try:
+        with dao.get_connection() as conn:
+            return sorted(conn.execute("SELECT type, name, sql FROM sqlite_master WHERE sql IS NOT NULL"))
+    finally:
+        dao.pool.close_all()
+
+
+def test_fresh_database_matches_step_by_step_upgrade(tmp_path, monkeypatch):
+    migrations = app.DatabaseDAO.MIGRATIONS
+    for count in range(1, len(migrations) + 1):
+        # Une seule migration en attente à chaque passe : aucune étape n'est sautée
+        monkeypatch.setattr(app.DatabaseDAO, 'MIGRATIONS', migrations[:count])
+        upgraded = schema(str(tmp_path / 'upgraded.db'))
+    monkeypatch.setattr(app.DatabaseDAO, 'MIGRATIONS', migrations)
+    
+    assert schema(str(tmp_path / 'fresh.db')) == upgraded
+
+
+def test_fresh_database_keeps_every_index_it_creates(tmp_path, monkeypatch):
+    statements = []
+    execute = app.TimedCursor.execute
+    
+    def recording_execute(self, sql, parameters=()):
+        statements.append(sql)
+        return execute(self, sql, parameters)
+    
+    monkeypatch.setattr(app.TimedCursor, 'execute', recording_execute)
+    dao = app.DatabaseDAO(str(tmp_path / 'fresh.db'))
+    try:
+        with dao.get_connection() as conn:
+            indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    finally:
+        dao.pool.close_all()
+    
+    created = {
+        match.group(1)
+        for sql in statements
+        for match in re.finditer(r"CREATE (?:UNIQUE )?INDEX (?:IF NOT EXISTS )?(\w+)", sql)
+    }
+    assert created and created <= indexes
+    assert not {'idx_meals_user_time', 'idx_symptoms_user_time'} & created
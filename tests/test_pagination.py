@@ -0,0 +1,83 @@
+"""Pagination des listes : /api/users (page ou curseur), plan hebdomadaire et événements buffet"""
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def users(app):
+    with app_module.db_dao.get_connection() as conn:
+        for i in range(5):
+            conn.execute("INSERT INTO users (username, email, created_at) VALUES (?, ?, ?)",
+                         (f'u{i}', f'u{i}@x', f'2026-01-0{i + 1} 10:00:00'))
+    return ['u4', 'u3', 'u2', 'u1', 'u0']
+
+
+def walk(client, url, key):
+    """Suivre next_cursor jusqu'à la dernière page"""
+    pages = []
+    response = client.get(url).get_json()
+    pages.append(response[key])
+    while response['next_cursor']:
+        response = client.get(f"{url}&cursor={response['next_cursor']}").get_json()
+        pages.append(response[key])
+    return pages
+
+
+def test_users_without_cursor_keep_page_shape(client, users):
+    body = client.get('/api/users?page=2&per_page=2').get_json()
+    assert [user['username'] for user in body['users']] == users[2:4]
+    assert body['pagination'] == {
+        'current_page': 2, 'per_page': 2, 'total_users': 5, 'total_pages': 3,
+        'has_next': True, 'has_prev': True
+    }
+    assert 'next_cursor' not in body
+    
+    body = client.get('/api/users').get_json()
+    assert body['pagination']['current_page'] == 1
+    assert body['pagination']['total_users'] == 5
+
+
+def test_users_keyset_round_trip(client, users):
+    pages = walk(client, '/api/users?limit=2', 'users')
+    assert [[user['username'] for user in page] for page in pages] == [users[:2], users[2:4], users[4:]]
+    
+    body = client.get('/api/users?limit=2').get_json()
+    assert body['pagination'] == {'limit': 2, 'has_next': True, 'has_prev': False}
+    assert 'total_users' not in body['pagination']
+
+
+def test_users_invalid_cursor(client, users):
+    assert client.get('/api/users?cursor=pas-un-curseur').status_code == 400
+
+
+def test_weekly_plan_pages(client, users):
+    with app_module.db_dao.get_connection() as conn:
+        food_id = conn.execute("INSERT INTO foods (name, category) VALUES ('Ndolé', 'Plat')").lastrowid
+    meals = [{'day_of_week': day, 'meal_type': meal_type, 'food_id': food_id}
+             for day in (2, 0, 1) for meal_type in ('soir', 'midi')]
+    client.post('/api/users/1/weekly-plan', json={'week_start_date': '2026-01-05', 'meals': meals})
+    
+    pages = walk(client, '/api/users/1/weekly-plan?week_start_date=2026-01-05&limit=4', 'weekly_plan')
+    assert [len(page) for page in pages] == [4, 2]
+    order = [(entry['day_of_week'], entry['meal_type']) for page in pages for entry in page]
+    assert order == [(day, meal_type) for day in (0, 1, 2) for meal_type in ('midi', 'soir')]
+    
+    body = client.get('/api/users/1/weekly-plan?week_start_date=2026-01-05').get_json()
+    assert len(body['weekly_plan']) == 6
+    assert body['next_cursor'] is None
+
+
+def test_buffet_events_pages(client, users):
+    dates = ['2026-03-01', None, '2026-05-01', '2026-03-01', '2026-04-01']
+    with app_module.db_dao.get_connection() as conn:
+        for i, date in enumerate(dates):
+            conn.execute("INSERT INTO buffet_events (event_name, event_date, created_by) VALUES (?, ?, 1)",
+                         (f'e{i}', date))
+    
+    pages = walk(client, '/api/buffet-events?limit=2', 'buffet_events')
+    assert [len(page) for page in pages] == [2, 2, 1]
+    names = [event['event_name'] for page in pages for event in page]
+    assert names == ['e2', 'e4', 'e3', 'e0', 'e1']
+    
+    assert client.get('/api/buffet-events?limit=0').status_code == 400
@@ -0,0 +1,66 @@
+"""Profilage à la demande : jeton lu uniquement dans l'en-tête X-Profile, réponses en flux couvertes"""
+import json
+import os
+
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def token(monkeypatch, tmp_path):
+    monkeypatch.setattr(app_module, 'PROFILE_TOKEN', 'secret')
+    monkeypatch.setattr(app_module, 'PROFILE_DIR', str(tmp_path / 'profiles'))
+    return 'secret'
+
+
+@pytest.fixture
+def user_id(app):
+    with app_module.db_dao.get_connection() as conn:
+        user_id = conn.execute("INSERT INTO users (username, email) VALUES ('a', 'a@x')").lastrowid
+        food_id = conn.execute("INSERT INTO foods (name, category) VALUES ('Ndolé', 'Plat')").lastrowid
+        conn.execute("INSERT INTO meals (user_id, food_id, meal_time, meal_ts, quantity) VALUES (?, ?, 'x', 0, 1)",
+                     (user_id, food_id))
+    return user_id
+
+
+def is_report(response):
+    return response.is_json and 'functions' in response.get_json()
+
+
+def test_disabled_without_token(client, user_id):
+    response = client.get(f'/api/users/{user_id}', headers={'X-Profile': 'secret'})
+    assert response.status_code == 200
+    assert not is_report(response)
+
+
+def test_token_only_from_header(client, user_id, token):
+    url = f'/api/users/{user_id}'
+    assert not is_report(client.get(f'{url}?X-Profile={token}&_profile={token}&profile={token}'))
+    assert not is_report(client.get(url, headers={'X-Profile': 'mauvais'}))
+    
+    report = client.get(url, headers={'X-Profile': token}).get_json()
+    assert report['endpoint'] == 'api.get_user'
+    assert report['status'] == 200
+    assert report['sql']['count'] >= 1
+    assert any('FROM users' in statement['sql'] for statement in report['sql']['statements'])
+
+
+def test_streamed_export_is_profiled(client, user_id, token):
+    report = client.get(f'/api/export/{user_id}/data?format=ndjson', headers={'X-Profile': token}).get_json()
+    assert report['endpoint'] == 'api.export_user_data'
+    # Les lectures faites par le générateur du corps figurent dans la trace
+    assert any('FROM meals' in statement['sql'] for statement in report['sql']['statements'])
+    assert any('stream_export' in function['function'] for function in report['functions'])
+
+
+def test_file_output_keeps_response(client, user_id, token):
+    plain = client.get(f'/api/export/{user_id}/data?format=csv')
+    response = client.get(f'/api/export/{user_id}/data?format=csv',
+                          headers={'X-Profile': token, 'X-Profile-Output': 'file'})
+    assert response.get_data() == plain.get_data()
+    
+    path = response.headers['X-Profile-File']
+    with open(path) as f:
+        assert json.load(f)['path'] == f'/api/export/{user_id}/data'
+    assert os.path.exists(path[:-len('.json')] + '.prof')
@@ -0,0 +1,43 @@
+"""Les requêtes fréquentes (HOT_QUERIES) doivent passer par un index"""
+import pytest
+
+import app
+
+
+@pytest.fixture
+def db_dao(tmp_path):
+    dao = app.DatabaseDAO(str(tmp_path / 'test.db'))
+    yield dao
+    dao.pool.close_all()
+
+
+def test_schema_is_fully_migrated(db_dao):
+    assert db_dao.get_schema_version() == max(version for version, _, _ in app.DatabaseDAO.MIGRATIONS)
+
+
+def test_every_hot_query_is_explained(db_dao):
+    names = [entry['name'] for entry in db_dao.explain_hot_queries()]
+    assert names == list(app.DatabaseDAO.HOT_QUERIES)
+
+
+@pytest.mark.parametrize('name', list(app.DatabaseDAO.HOT_QUERIES))
+def test_hot_query_does_not_scan_a_table(db_dao, name):
+    report = {entry['name']: entry for entry in db_dao.explain_hot_queries()}
+    assert not report[name]['full_scan'], f"{name} parcourt une table entière : {report[name]['plan']}"
+
+
+def test_hot_queries_are_the_dao_statements(db_dao):
+    explained = {' '.join(build()[0].split()) for build in app.DatabaseDAO.HOT_QUERIES.values()}
+    app.start_sql_trace()
+    try:
+        app.MealDAO(db_dao).get_user_meals_page(1, after=[1767225599999, 100], limit=50)
+        app.SymptomDAO(db_dao).get_symptom_times(1, 1735689600000, 1767225599999)
+        app.UserDAO(db_dao).get_users_page(after=['2025-12-31', 100], limit=50)
+        app.UserDAO(db_dao).get_deletion_stats(1)
+        app.FoodDAO(db_dao).get_catalog('Plat principal', 0, 50)
+        app.RiskStoreDAO(db_dao, None).get_scores(1)
+    finally:
+        statements = app.stop_sql_trace()
+    assert len(statements) == 6
+    for statement in statements:
+        assert statement['sql'] in explained, statement['sql']
@@ -0,0 +1,93 @@
+"""Statistiques en une requête, suppression par lots et migration des clés étrangères en cascade"""
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def user_id(app):
+    with app_module.db_dao.get_connection() as conn:
+        user_id = conn.execute("INSERT INTO users (username, email) VALUES ('a', 'a@x')").lastrowid
+        other = conn.execute("INSERT INTO users (username, email) VALUES ('b', 'b@x')").lastrowid
+        food_id = conn.execute("INSERT INTO foods (name, category) VALUES ('Ndolé', 'Plat')").lastrowid
+        for owner, meals in ((user_id, 5), (other, 1)):
+            conn.executemany("INSERT INTO meals (user_id, food_id, meal_time, meal_ts, quantity) VALUES (?, ?, 'x', ?, 1)",
+                             [(owner, food_id, i) for i in range(meals)])
+        conn.executemany("INSERT INTO symptoms (user_id, symptom_type, severity, occurrence_time, occurrence_ts) "
+                         "VALUES (?, 'urticaire', 2, 'x', ?)", [(user_id, i) for i in range(3)])
+        conn.execute("INSERT INTO weekly_plans (user_id, week_start_date, day_of_week, meal_type, food_id) "
+                     "VALUES (?, '2026-01-05', 0, 'midi', ?)", (user_id, food_id))
+        buffet_id = conn.execute("INSERT INTO buffet_events (event_name, created_by) VALUES ('fête', ?)",
+                                 (user_id,)).lastrowid
+        conn.executemany("INSERT INTO buffet_foods (buffet_id, food_id) VALUES (?, ?)",
+                         [(buffet_id, food_id)] * 2)
+    return user_id
+
+
+def counts():
+    with app_module.db_dao.get_connection() as conn:
+        return {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ('users', 'meals', 'symptoms', 'weekly_plans', 'buffet_events', 'buffet_foods')}
+
+
+def test_stats(client, user_id):
+    body = client.get(f'/api/users/{user_id}/stats').get_json()
+    assert body['username'] == 'a'
+    assert body['data_summary'] == {
+        'meals_recorded': 5, 'symptoms_logged': 3, 'weekly_plans': 1,
+        'buffet_events_created': 1, 'buffet_foods_planned': 2, 'total_records': 12
+    }
+    assert client.get('/api/users/999/stats').status_code == 404
+
+
+def test_delete_in_chunks(client, user_id, monkeypatch):
+    monkeypatch.setattr(app_module, 'USER_DELETE_CHUNK_SIZE', 2)
+    body = client.delete(f'/api/users/{user_id}?confirm=true').get_json()
+    assert body['deleted_records'] == {'meals': 5, 'symptoms': 3, 'weekly_plans': 1, 'buffet_events': 1}
+    # Aliments du buffet retirés par la cascade ; l'autre utilisateur est intact
+    assert counts() == {'users': 1, 'meals': 1, 'symptoms': 0, 'weekly_plans': 0,
+                        'buffet_events': 0, 'buffet_foods': 0}
+
+
+def test_raw_delete_cascades(user_id):
+    with app_module.db_dao.get_connection() as conn:
+        conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
+    assert counts() == {'users': 1, 'meals': 1, 'symptoms': 0, 'weekly_plans': 0,
+                        'buffet_events': 0, 'buffet_foods': 0}
+
+
+def test_migration_reports_orphans(tmp_path, monkeypatch, capsys):
+    path = str(tmp_path / 'legacy.db')
+    migrations = app_module.DatabaseDAO.MIGRATIONS
+    monkeypatch.setattr(app_module.DatabaseDAO, 'MIGRATIONS', [m for m in migrations if m[0] < 13])
+    dao = app_module.DatabaseDAO(path)
+    with dao.get_connection() as conn:
+        conn.execute("PRAGMA foreign_keys=OFF")
+        user_id = conn.execute("INSERT INTO users (username, email) VALUES ('a', 'a@x')").lastrowid
+        food_id = conn.execute("INSERT INTO foods (name, category) VALUES ('Ndolé', 'Plat')").lastrowid
+        # Lignes laissées par l'ancienne suppression (parent disparu)
+        conn.executemany("INSERT INTO meals (id, user_id, food_id, meal_time, quantity) VALUES (?, ?, ?, 'x', 1)",
+                         [(1, user_id, food_id), (2, 999, food_id), (3, 998, food_id), (40, user_id, food_id)])
+        conn.execute("DELETE FROM meals WHERE id = 40")
+        conn.execute("INSERT INTO buffet_events (id, event_name, created_by) VALUES (7, 'fête', 999)")
+        conn.execute("INSERT INTO buffet_foods (buffet_id, food_id) VALUES (7, ?)", (food_id,))
+    dao.pool.close_all()
+    capsys.readouterr()
+    
+    monkeypatch.setattr(app_module.DatabaseDAO, 'MIGRATIONS', migrations)
+    dao = app_module.DatabaseDAO(path)
+    try:
+        output = capsys.readouterr().out
+        assert 'meals : 2 ligne(s) sans users existant, non recopiée(s)' in output
+        assert 'buffet_events : 1 ligne(s) sans users existant' in output
+        assert 'buffet_foods : 1 ligne(s) sans buffet_events existant' in output
+        
+        with dao.get_connection() as conn:
+            assert [row[0] for row in conn.execute("SELECT id FROM meals")] == [1]
+            assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+            # Le compteur AUTOINCREMENT est conservé : l'id 40 n'est pas réattribué
+            new_id = conn.execute("INSERT INTO meals (user_id, food_id, meal_time, meal_ts, quantity) "
+                                  "VALUES (?, ?, 'x', 0, 1)", (user_id, food_id)).lastrowid
+            assert new_id == 41
+    finally:
+        dao.pool.close_all()